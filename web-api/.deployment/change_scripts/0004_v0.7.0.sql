@@ -0,0 +1,52 @@
+-- v0.7.0-0 (Aurora PostgreSQL)
+
+-- Add waveform peak scaling, segment transcripts and audio hashes to recordings.
+
+ALTER TABLE recordings ADD COLUMN IF NOT EXISTS waveform_peak_max INTEGER;
+ALTER TABLE recordings ADD COLUMN IF NOT EXISTS segment_transcripts TEXT;
+ALTER TABLE recordings ADD COLUMN IF NOT EXISTS audio_hash CHAR(64);
+
+-- Record whether transcriptions and generations were served from a cache.
+
+ALTER TABLE transcription_log ADD COLUMN IF NOT EXISTS cached BOOLEAN;
+ALTER TABLE generation_log ADD COLUMN IF NOT EXISTS cached BOOLEAN;
+ALTER TABLE generation_log ADD COLUMN IF NOT EXISTS cache_key CHAR(64);
+
+-- Add background transcription jobs.
+
+CREATE TABLE IF NOT EXISTS transcription_jobs (
+  id VARCHAR(12) PRIMARY KEY,
+  username VARCHAR(255) NOT NULL,
+  recording_id VARCHAR(12) NOT NULL,
+  status VARCHAR(20) NOT NULL,
+  segments_completed INTEGER NOT NULL DEFAULT 0,
+  segments_total INTEGER,
+  transcript TEXT,
+  error_id CHAR(36),
+  error_message TEXT,
+  created TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+  modified TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+  session_id CHAR(36)
+);
+
+-- Add the transcript and generation caches.
+
+CREATE TABLE IF NOT EXISTS transcript_cache (
+  audio_hash CHAR(64) NOT NULL,
+  service VARCHAR(50) NOT NULL,
+  model VARCHAR(100) NOT NULL,
+  transcript TEXT NOT NULL,
+  created TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (audio_hash, service, model)
+);
+
+CREATE TABLE IF NOT EXISTS generation_cache (
+  key CHAR(64) PRIMARY KEY,
+  service VARCHAR(50) NOT NULL,
+  model VARCHAR(100) NOT NULL,
+  text TEXT NOT NULL,
+  completion_tokens INTEGER NOT NULL,
+  prompt_tokens INTEGER NOT NULL,
+  created TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+  last_used TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
@@ -57,11 +57,28 @@ CREATE TABLE transcription_log (
   started TIMESTAMP_LTZ NOT NULL,
   time INTEGER NOT NULL,
   service VARCHAR(50) NOT NULL,
+  cached BOOLEAN,
   error_id CHAR(36),
   session_id CHAR(36),
   PRIMARY KEY (task_id) RELY
 );
 
+CREATE TABLE transcription_jobs (
+  id VARCHAR(12) NOT NULL,
+  username VARCHAR(255) NOT NULL,
+  recording_id VARCHAR(12) NOT NULL,
+  status VARCHAR(20) NOT NULL,
+  segments_completed INTEGER NOT NULL DEFAULT 0,
+  segments_total INTEGER,
+  transcript VARCHAR,
+  error_id CHAR(36),
+  error_message VARCHAR,
+  created TIMESTAMP_LTZ NOT NULL,
+  modified TIMESTAMP_LTZ NOT NULL,
+  session_id CHAR(36),
+  PRIMARY KEY (id) RELY
+);
+
 CREATE TABLE generation_log (
   task_id CHAR(36) NOT NULL,
   record_id VARCHAR(12) NOT NULL,
@@ -72,6 +89,8 @@ CREATE TABLE generation_log (
   model VARCHAR(50) NOT NULL,
   completion_tokens INTEGER NOT NULL,
   prompt_tokens INTEGER NOT NULL,
+  cached BOOLEAN,
+  cache_key CHAR(64),
   error_id CHAR(36),
   session_id CHAR(36),
   PRIMARY KEY (task_id) RELY
@@ -136,7 +155,10 @@ CREATE TABLE recordings (
   duration INTEGER,
   segments VARCHAR,
   waveform_peaks VARCHAR,
+  waveform_peak_max INTEGER,
   transcript VARCHAR,
+  segment_transcripts VARCHAR,
+  audio_hash CHAR(64),
   PRIMARY KEY (id) RELY,
   FOREIGN KEY (encounter_id) REFERENCES encounters (id) RELY
 );
@@ -159,6 +181,27 @@ CREATE TABLE draft_notes (
   FOREIGN KEY (definition_id, definition_version) REFERENCES note_definitions (id, version) RELY
 );
 
+CREATE TABLE transcript_cache (
+  audio_hash CHAR(64) NOT NULL,
+  service VARCHAR(50) NOT NULL,
+  model VARCHAR(100) NOT NULL,
+  transcript VARCHAR NOT NULL,
+  created TIMESTAMP_LTZ NOT NULL,
+  PRIMARY KEY (audio_hash, service, model) RELY
+);
+
+CREATE TABLE generation_cache (
+  key CHAR(64) NOT NULL,
+  service VARCHAR(50) NOT NULL,
+  model VARCHAR(100) NOT NULL,
+  text VARCHAR NOT NULL,
+  completion_tokens INTEGER NOT NULL,
+  prompt_tokens INTEGER NOT NULL,
+  created TIMESTAMP_LTZ NOT NULL,
+  last_used TIMESTAMP_LTZ NOT NULL,
+  PRIMARY KEY (key) RELY
+);
+
 CREATE SEQUENCE data_change_ids NOORDER;
 
 CREATE TABLE data_changes (
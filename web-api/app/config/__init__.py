@@ -31,6 +31,9 @@ class Settings(BaseSettings):
 
     DEFAULT_AUDIO_FORMAT: str = "mp3"
     DEFAULT_AUDIO_BITRATE: str = "96k"
+    AUDIO_SPOOL_MAX_SIZE: int = 8 * 1024 * 1024  # Bytes held in memory before spooling audio to disk
+    AUDIO_WORKERS: int = 2  # Processes dedicated to audio processing
+    AUDIO_QUEUE_LIMIT: int = 8  # Audio jobs that may wait for a worker before rejecting more
     LOGGING_LEVEL: str = "info"
     COOKIE_SECURE: bool = True
     COOKIE_DOMAIN: str | None = None  # Optional domain for cookies, set via env var
@@ -52,20 +55,67 @@ class Settings(BaseSettings):
     DEFAULT_NOTE_GENERATION_MODEL: str = "llama3.1:8b"
     LABEL_MODEL: str = "llama3.1:8b"
     
-    TRANSCRIPTION_SERVICE: Literal["OpenAI Whisper", "WhisperX", "AWS Transcribe", "Parakeet MLX"] = (
+    TRANSCRIPTION_SERVICE: Literal["OpenAI Whisper", "WhisperX", "Local Whisper", "AWS Transcribe", "Parakeet MLX"] = (
         "Parakeet MLX"
     )
     GENERATIVE_AI_SERVICE: Literal["Ollama", "OpenAI", "AWS Bedrock", "VLLM", "LM Studio", "LlamaCpp"] = "Ollama"
+    # Connections kept open to the generative AI service, shared by all
+    # generations; any more wait for a connection to be free.
+    GENERATION_MAX_CONNECTIONS: int = 64
+    # Self-hosted services (Ollama, VLLM, LM Studio and LlamaCpp) may be given
+    # several replicas as comma separated URLs. Replicas failing requests or
+    # health checks are ejected for a time, doubled for repeated failures.
+    GENERATION_HEALTH_CHECK_INTERVAL: float = 10  # Seconds
+    GENERATION_EJECTION_TIME: float = 30  # Seconds
+
+    OLLAMA_SERVER_URL: str = "http://localhost:11434"
+
+    # An OpenAI compatible ASR server, for the "Local Whisper" service.
     LOCAL_WHISPER_SERVICE_URL: str | None = None
+    LOCAL_WHISPER_MODEL: str = "large-v3"
+    LOCAL_WHISPER_MAX_CONNECTIONS: int = 8
+
+    # Long recordings are split and their segments transcribed concurrently.
+    # Segments can be prompted with the full preceding transcript ("chain",
+    # which transcribes them one at a time), the end of the preceding
+    # segment's transcript ("tail") or not at all ("none").
+    TRANSCRIPTION_SEGMENT_CONCURRENCY: int = 4
+    TRANSCRIPTION_SEGMENT_PROMPTS: Literal["chain", "tail", "none"] = "tail"
+
+    # Transcripts are cached in the database by the hash of the audio and the
+    # service and model used; this many are also held in memory (0 disables).
+    TRANSCRIPT_CACHE_SIZE: int = 128
+
+    # Generations (all at temperature 0) are cached by the hash of their
+    # service, model and messages: this many in memory, and this many in the
+    # database, evicting the least recently used (0 disables either).
+    GENERATION_CACHE_SIZE: int = 256
+    GENERATION_CACHE_DB_SIZE: int = 10000
+
+    # Transcripts and generations held in memory expire after this many
+    # seconds. Purging a recording's cached data clears only the memory of
+    # the replica purging it, so this bounds how long others may serve it.
+    CACHE_MEMORY_TTL: int = 300
 
     # WhisperX Configuration
     WHISPERX_DEVICE: str = "cpu"  # Can be "cpu" or "cuda" or "cuda:0", "cuda:1", etc.
+    # Batches mix audio from several requests, so one language is used for all.
+    WHISPERX_LANGUAGE: str = "en"
+    # A performance profile (model size and quantization, as listed in
+    # app/services/whisperx_profiles.py), or "auto" to benchmark the profiles
+    # meeting the accuracy tier at startup and use the fastest.
+    WHISPERX_PROFILE: str = "large-v3-float32"
+    WHISPERX_ACCURACY_TIER: Literal["high", "medium", "low"] = "high"
+    WHISPERX_CPU_THREADS: int = 0  # 0 uses every physical core
 
     AWS_ACCESS_KEY_ID: str | None = None
     AWS_SECRET_ACCESS_KEY: str | None = None
     AWS_REGION: str = "us-west-2"
     S3_BUCKET_NAME: str = "berta"
     AWS_SECRET_NAME: str | None = None
+    # An SQS queue receiving Transcribe job state change events (routed by an
+    # EventBridge rule), to await jobs without polling their status.
+    AWS_TRANSCRIBE_EVENTS_QUEUE_URL: str | None = None
 
     USE_GOOGLE_AUTH: bool = False
     GOOGLE_CLIENT_ID: str | None = None
@@ -92,13 +142,15 @@ class Settings(BaseSettings):
 
     VLLM_SERVER_NAME: str = "localhost"
     VLLM_SERVER_PORT: int = 8080
+    VLLM_SERVER_URLS: str | None = None  # Replica URLs, in place of the name and port
     HUGGINGFACE_TOKEN: str | None = None
     VLLM_MODEL_NAME: str | None = None  # Optional model name for downloading from Hugging Face
 
-    # LM Studio defaults to http://localhost:1234
+    # LM Studio defaults to http://localhost:1234 (comma separate replicas)
     LM_STUDIO_SERVER_URL: str | None = "http://localhost:1234"
 
-    # LlamaCpp server (llama-server) defaults to http://localhost:8080
+    # LlamaCpp server (llama-server) defaults to http://localhost:8080 (comma
+    # separate replicas)
     LLAMA_CPP_SERVER_URL: str | None = "http://localhost:8080"
 
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=True)
@@ -134,14 +186,19 @@ is_llama_cpp_supported: bool = settings.LLAMA_CPP_SERVER_URL is not None
 
 def get_available_services() -> dict:
     """Get a dictionary of all available services and their options."""
+    from app.services.whisperx_profiles import profile_models
+
     return {
         "TRANSCRIPTION_SERVICE": {
             "description": "Service for transcribing audio to text",
-            "options": ["OpenAI Whisper", "WhisperX", "AWS Transcribe", "Parakeet MLX"],
+            "options": ["OpenAI Whisper", "WhisperX", "Local Whisper", "AWS Transcribe", "Parakeet MLX"],
             "default": "Parakeet MLX",
             "models": {
                 "OpenAI Whisper": ["whisper-1"],
-                "WhisperX": ["large-v3"],
+                "WhisperX": profile_models(
+                    settings.WHISPERX_PROFILE, settings.WHISPERX_ACCURACY_TIER
+                ),
+                "Local Whisper": [settings.LOCAL_WHISPER_MODEL],
                 "AWS Transcribe": ["default"],
                 "Parakeet MLX": ["mlx-large"]
             }
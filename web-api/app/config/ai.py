@@ -25,6 +25,7 @@ from app.services.adapters import GenerativeAIService, TranscriptionService
 from app.services.openai import OpenAIGenerativeAIService, OpenAITranscriptionService
 from app.services.prompt_service import prompt_service
 from app.services.whisperx import WhisperXTranscriptionService
+from app.services.local_whisper import LocalWhisperTranscriptionService
 from app.services.amazon_transcribe import AmazonTranscribeService
 from app.services.aws_bedrock import BedrockGenerativeAIService
 from app.services.ollama import OllamaGenerativeAIService
@@ -48,11 +49,14 @@ match settings.TRANSCRIPTION_SERVICE:
         transcription_service = OpenAITranscriptionService()
     case "WhisperX":
         transcription_service = WhisperXTranscriptionService()
+    case "Local Whisper":
+        transcription_service = LocalWhisperTranscriptionService()
     case "AWS Transcribe":
         transcription_service = AmazonTranscribeService(
             region_name=settings.AWS_REGION,
             aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
             aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+            events_queue_url=settings.AWS_TRANSCRIBE_EVENTS_QUEUE_URL,
         )
     case "Parakeet MLX":
         from app.services.parakeet_mlx import ParakeetMLXTranscriptionService
@@ -66,7 +70,9 @@ generative_ai_services: list[GenerativeAIService] = []
 
 match settings.GENERATIVE_AI_SERVICE:
     case "Ollama":
-        generative_ai_services.append(OllamaGenerativeAIService())
+        generative_ai_services.append(
+            OllamaGenerativeAIService(service_url=settings.OLLAMA_SERVER_URL)
+        )
     case "OpenAI":
         if is_openai_supported:
             generative_ai_services.append(OpenAIGenerativeAIService())
@@ -79,7 +85,10 @@ match settings.GENERATIVE_AI_SERVICE:
         if is_vllm_supported:
             try:
                 from app.services.vllm_service import VLLMService  # lazy import
-                api_url = f"http://{settings.VLLM_SERVER_NAME}:{settings.VLLM_SERVER_PORT}"
+                api_url = (
+                    settings.VLLM_SERVER_URLS
+                    or f"http://{settings.VLLM_SERVER_NAME}:{settings.VLLM_SERVER_PORT}"
+                )
                 service = VLLMService(api_url=api_url)
                 if settings.VLLM_MODEL_NAME and settings.HUGGINGFACE_TOKEN:
                     try:
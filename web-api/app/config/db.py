@@ -16,6 +16,7 @@ from sqlalchemy import (
     ForeignKeyConstraint,
     Sequence,
     func,
+    inspect,
     select,
     text,
 )
@@ -139,10 +140,28 @@ class TranscriptionTask(Base):
     started: Mapped[datetime] = mapped_column(DATETIME_TYPE)
     time: Mapped[int]
     service: Mapped[str] = mapped_column(VARCHAR(50))
+    cached: Mapped[bool | None]
     error_id: Mapped[str | None] = uuid_column()
     session_id: Mapped[str | None] = uuid_column()
 
 
+class TranscriptionJob(Base):
+    __tablename__ = "transcription_jobs"
+
+    id: Mapped[str] = sqid_column(primary_key=True)
+    username: Mapped[str] = mapped_column(VARCHAR(255))
+    recording_id: Mapped[str] = sqid_column()
+    status: Mapped[str] = mapped_column(VARCHAR(20))
+    segments_completed: Mapped[int] = mapped_column(default=0)
+    segments_total: Mapped[int | None]
+    transcript: Mapped[str | None]
+    error_id: Mapped[str | None] = uuid_column()
+    error_message: Mapped[str | None]
+    created: Mapped[datetime] = mapped_column(DATETIME_TYPE)
+    modified: Mapped[datetime] = mapped_column(DATETIME_TYPE)
+    session_id: Mapped[str | None] = uuid_column()
+
+
 class GenerationTask(Base):
     __tablename__ = "generation_log"
 
@@ -155,6 +174,8 @@ class GenerationTask(Base):
     model: Mapped[str] = mapped_column(VARCHAR(50))
     completion_tokens: Mapped[int]
     prompt_tokens: Mapped[int]
+    cached: Mapped[bool | None]
+    cache_key: Mapped[str | None] = mapped_column(CHAR(64))
     error_id: Mapped[str | None] = uuid_column()
     session_id: Mapped[str | None] = uuid_column()
 
@@ -239,8 +260,13 @@ class Recording(Base):
     file_size: Mapped[int | None]
     duration: Mapped[int]
     waveform_peaks: Mapped[str | None]
+    waveform_peak_max: Mapped[int | None]
     segments: Mapped[str | None]
     transcript: Mapped[str | None]
+    # A JSON list of the transcripts of each segment, where a transcript
+    # spanning several segments is held by the first and the rest are empty.
+    segment_transcripts: Mapped[str | None]
+    audio_hash: Mapped[str | None] = mapped_column(CHAR(64))
 
     encounter: Mapped["Encounter"] = relationship(back_populates="recording")
 
@@ -272,6 +298,33 @@ class DraftNote(Base):
     note_definition: Mapped["NoteDefinition"] = relationship()
 
 
+# ----------------------------------
+# CACHES
+
+
+class CachedTranscript(Base):
+    __tablename__ = "transcript_cache"
+
+    audio_hash: Mapped[str] = mapped_column(CHAR(64), primary_key=True)
+    service: Mapped[str] = mapped_column(VARCHAR(50), primary_key=True)
+    model: Mapped[str] = mapped_column(VARCHAR(100), primary_key=True)
+    transcript: Mapped[str]
+    created: Mapped[datetime] = mapped_column(DATETIME_TYPE)
+
+
+class CachedGeneration(Base):
+    __tablename__ = "generation_cache"
+
+    key: Mapped[str] = mapped_column(CHAR(64), primary_key=True)
+    service: Mapped[str] = mapped_column(VARCHAR(50))
+    model: Mapped[str] = mapped_column(VARCHAR(100))
+    text: Mapped[str]
+    completion_tokens: Mapped[int]
+    prompt_tokens: Mapped[int]
+    created: Mapped[datetime] = mapped_column(DATETIME_TYPE)
+    last_used: Mapped[datetime] = mapped_column(DATETIME_TYPE)
+
+
 # ----------------------------------
 # CHANGE TRACKING
 
@@ -367,6 +420,47 @@ def is_datafolder_initialized() -> bool:
             return False
 
 
+def ensure_schema_updates():
+    """
+    Brings an existing local SQLite database up to date with the models,
+    creating any missing tables and adding any missing nullable columns.
+
+    Not for Aurora, whose schema is changed by the scripts in
+    `.deployment/change_scripts`.
+    """
+    inspector = inspect(engine)
+
+    missing_tables = [
+        table
+        for table in Base.metadata.sorted_tables
+        if not inspector.has_table(table.name)
+    ]
+
+    if len(missing_tables) > 0:
+        logger.info(f"Creating tables: {', '.join(t.name for t in missing_tables)}")
+        Base.metadata.create_all(engine, tables=missing_tables)
+
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if table.name in (t.name for t in missing_tables):
+                continue
+
+            existing_columns = {c["name"] for c in inspector.get_columns(table.name)}
+
+            for column in table.columns:
+                if column.name in existing_columns or not column.nullable:
+                    continue
+
+                column_type = column.type.compile(dialect=engine.dialect)
+                logger.info(f"Adding column {table.name}.{column.name}")
+                connection.execute(
+                    text(
+                        f"ALTER TABLE {table.name}"
+                        f" ADD COLUMN {column.name} {column_type}"
+                    )
+                )
+
+
 def initialize_dev_datafolder():
     """Initialize the development data folder and database."""
     if settings.USE_AURORA:
@@ -1,3 +1,6 @@
+import tempfile
+from typing import BinaryIO, cast
+
 from app.config import settings
 from app.services.adapters import StorageProvider
 from app.services.local_storage import local_storage
@@ -34,6 +37,29 @@ def delete_recording(username: str, filename: str) -> None:
     storage_provider.delete_recording(username, filename)
 
 
+def recording_exists(username: str, filename: str) -> bool:
+    """Checks whether a file is in the storage system."""
+    return storage_provider.recording_exists(username, filename)
+
+
+def open_recording(username: str, filename: str) -> BinaryIO:
+    """
+    Returns a temporary copy of a file from the storage system,
+    kept in memory unless it is large.
+    """
+    file = tempfile.SpooledTemporaryFile(max_size=settings.AUDIO_SPOOL_MAX_SIZE)
+
+    try:
+        for chunk in storage_provider.stream_recording(username, filename):
+            file.write(chunk)
+    except Exception:
+        file.close()
+        raise
+
+    file.seek(0)
+    return cast(BinaryIO, file)
+
+
 def get_sample_recording(filename: str):
     """Streams a sample recording file from the storage system."""
     return storage_provider.get_sample_recording(filename)
@@ -101,6 +101,20 @@ class AudioProcessingError(WebAPIException):
     fatal = True
 
 
+class ServiceBusy(WebAPIException):
+    """
+    Represents an error that occurred due to the service being at capacity.
+    This error is temporary and the operation should be retried.
+
+    - **HTTP Status Code:** 503 Service Unavailable
+    """
+
+    name = "Service Busy"
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    headers = {"Retry-After": "10"}
+    fatal = False
+
+
 class DatabaseError(WebAPIException):
     """
     Represents an error that occurred while saving or loading data.
@@ -261,6 +261,7 @@ def log_transcription(
     recording_id: str,
     timer: ExecutionTimer,
     service: str,
+    cached: bool = False,
     error: Exception | None = None,
     session: WebAPISession | None = None,
 ):
@@ -272,6 +273,7 @@ def log_transcription(
         started=timer.started_at,
         time=timer.elapsed_ms,
         service=service,
+        cached=cached,
         error_id=error.uuid if isinstance(error, WebAPIException) else None,
         session_id=session.sessionId if session is not None else None,
     )
@@ -293,6 +295,7 @@ def log_generation(
     record_id: str,
     task_type: str,
     generation_output: GenerationOutput,
+    cached: bool = False,
     error: Exception | None = None,
     session: WebAPISession | None = None,
 ):
@@ -308,6 +311,8 @@ def log_generation(
         model=generation_output.model,
         completion_tokens=generation_output.completionTokens,
         prompt_tokens=generation_output.promptTokens,
+        cached=cached,
+        cache_key=generation_output.cacheKey,
         error_id=error.uuid if isinstance(error, WebAPIException) else None,
         session_id=session.sessionId if session is not None else None,
     )
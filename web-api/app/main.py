@@ -49,6 +49,7 @@ from app.logging import (
 from app.routers import (
     authorization,
     encounters,
+    live_transcription,
     monitoring,
     note_definitions,
     recordings,
@@ -64,6 +65,9 @@ from app.schemas import SimpleMessage, WebAPIError, WebAPIErrorDetail
 from app.security import WebAPISession, decode_token
 from app.utility.timing import ExecutionTimer
 from app.config.storage import USE_S3_STORAGE
+from app.config.ai import generative_ai_services, transcription_service
+from app.services.audio_workers import audio_worker_pool
+from app.tasks import cancel_transcription_jobs
 from app.services.s3_storage import s3_storage
 # Rate limiting disabled - import removed
 # from app.middleware.rate_limiter import rate_limit_middleware
@@ -75,15 +79,27 @@ configure_logging()
 async def lifespan(_: FastAPI):
     if settings.ENVIRONMENT == "development" and not db.is_datafolder_initialized():
         db.initialize_dev_datafolder()
-        db.update_builtin_notetypes()
-    else:
-        # Always update built-in note types in production too
-        db.update_builtin_notetypes()
+
+    # Apply schema additions to local SQLite databases before anything
+    # queries the models. Aurora schemas are changed by the deployment's
+    # change scripts instead, never by replicas as they start.
+    if not settings.USE_AURORA:
+        db.ensure_schema_updates()
+
+    # Always update built-in note types (in production too).
+    db.update_builtin_notetypes()
 
     # Run the app.
     yield
 
-    # Shutdown: Dispose of the sql alchemy engine.
+    # Shutdown: Stop any transcription jobs and the audio workers, close
+    # connections to the transcription and generative AI services, and
+    # dispose of the sql alchemy engine.
+    await cancel_transcription_jobs()
+    await transcription_service.aclose()
+    for service in generative_ai_services:
+        await service.aclose()
+    audio_worker_pool.shutdown()
     db.engine.dispose()
 
 
@@ -416,6 +432,9 @@ app.include_router(
 app.include_router(
     tasks.router, prefix="/tasks", tags=["Tasks"]
 )
+app.include_router(
+    live_transcription.router, prefix="/tasks", tags=["Tasks"]
+)
 app.include_router(
     monitoring.router, prefix="/monitoring", tags=["Monitoring"]
 )
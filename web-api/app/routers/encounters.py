@@ -2,9 +2,10 @@ import json
 import os
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Annotated
+from typing import Annotated, BinaryIO
 
 from fastapi import APIRouter, BackgroundTasks, Body, Depends, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import and_, or_, select
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.orm import selectinload
@@ -12,16 +13,32 @@ from sqlalchemy.orm import selectinload
 import app.config.db as db
 import app.errors as errors
 import app.schemas as sch
-from app.config import settings
+from app.config import settings, storage
 from app.config.db import useDatabase
 from app.services.file_validation import file_validator
-from app.logging import log_audio_conversion, log_data_change, log_generation
+from app.logging import (
+    WebAPILogger,
+    log_audio_conversion,
+    log_data_change,
+    log_generation,
+)
 from app.security import authenticate_session, useUserSession
-from app.services.audio_processing import append_audio, compute_peaks, reformat_audio
-from app.tasks import generate_transcript_label
+from app.services.audio_workers import (
+    append_audio,
+    append_peaks,
+    append_transcription_audio,
+    ingest_audio,
+)
+from app.tasks import (
+    generate_transcript_label,
+    invalidate_cached_generations,
+    invalidate_cached_transcripts,
+)
 from app.utility.conversion import ConvertToSchema, get_file_size
 from app.utility.timing import ExecutionTimer
 
+log = WebAPILogger(__name__)
+
 router = APIRouter(dependencies=[Depends(authenticate_session)])
 
 
@@ -98,12 +115,20 @@ def create_encounter(
     reformatted_media_type = "audio/mpeg"
 
     try:
-        # Standardize all audio into mp3 at the default bitrate.
+        # Standardize all audio into mp3 at the default bitrate,
+        # measuring its duration and waveform and preparing the audio
+        # for transcription from the same decode.
         with ExecutionTimer() as timer:
-            (reformatted, duration) = reformat_audio(
-                audio.file, format="mp3", bitrate=settings.DEFAULT_AUDIO_BITRATE
+            ingested = ingest_audio(
+                audio.file,
+                format="mp3",
+                bitrate=settings.DEFAULT_AUDIO_BITRATE,
+                transcription_audio=True,
             )
 
+        (reformatted, duration) = (ingested.audio, ingested.duration)
+        transcription_audio = ingested.transcription_audio
+
         reformatted_file_size = get_file_size(reformatted)
 
         backgroundTasks.add_task(
@@ -116,8 +141,9 @@ def create_encounter(
             session=userSession,
             task_type="NEW RECORDING",
         )
-
-        peaks = compute_peaks(reformatted)
+    except errors.ServiceBusy:
+        # Nothing was converted; the client is to retry once the pool frees up.
+        raise
     except Exception as e:
         audio_error = errors.AudioProcessingError(str(e))
 
@@ -140,8 +166,10 @@ def create_encounter(
             media_type=reformatted_media_type,
             file_size=reformatted_file_size,
             duration=duration,
-            waveform_peaks=json.dumps(peaks),
+            waveform_peaks=json.dumps(ingested.peaks),
+            waveform_peak_max=ingested.peak_max,
             segments=json.dumps([0]),
+            audio_hash=ingested.content_hash,
         )
 
         encounter = db.Encounter(
@@ -159,12 +187,20 @@ def create_encounter(
         try:
             filename = f"{recording_id}.mp3"
             db.save_recording(reformatted, userSession.username, filename)
+
+            if transcription_audio is not None:
+                filename = f"{recording_id}.flac"
+                db.save_recording(transcription_audio, userSession.username, filename)
         finally:
             reformatted.close()
+            if transcription_audio is not None:
+                transcription_audio.close()
 
         database.commit()
     except Exception as e:
         reformatted.close()
+        if transcription_audio is not None:
+            transcription_audio.close()
         raise errors.DatabaseError(str(e))
 
     backgroundTasks.add_task(
@@ -231,6 +267,9 @@ def append_recording(
     if not os.path.isfile(recording_path):
         raise errors.NotFound("Recording not found")
 
+    combined: BinaryIO | None = None
+    transcription_audio: BinaryIO | None = None
+
     try:
         # Standardize all audio into mp3 at the default bitrate.
         with ExecutionTimer() as timer, open(recording_path, "rb") as original_file:
@@ -255,8 +294,25 @@ def append_recording(
             task_type="APPEND AUDIO",
         )
 
-        # Compute waveform peaks.
-        peaks = compute_peaks(combined)
+        # Extend the waveform peaks with those of the appended audio.
+        recording = encounter.recording
+        (peaks, peak_max) = append_peaks(
+            combined,
+            (
+                json.loads(recording.waveform_peaks)
+                if recording.waveform_peaks is not None
+                else None
+            ),
+            recording.waveform_peak_max,
+            recording.duration,
+        )
+
+        # Extend the audio used for transcription to match.
+        transcription_audio = _append_transcription_audio(
+            userSession.username, recording_id, combined, audio.file
+        )
+
+        audio_hash = file_validator.calculate_file_hash(combined)
 
         if encounter.recording.segments is not None:
             segments: list[int] = json.loads(encounter.recording.segments)
@@ -265,6 +321,15 @@ def append_recording(
 
         segments.append(encounter.recording.duration)
     except Exception as e:
+        if combined is not None:
+            combined.close()
+        if transcription_audio is not None:
+            transcription_audio.close()
+
+        if isinstance(e, errors.ServiceBusy):
+            # The recording is unchanged; the client is to retry shortly.
+            raise
+
         audio_error = errors.AudioProcessingError(str(e))
 
         backgroundTasks.add_task(
@@ -281,20 +346,48 @@ def append_recording(
 
     try:
         encounter.modified = modified
+
+        # The transcript as it stands, with any edits, becomes that of the
+        # audio before this append. Only the appended audio is then
+        # transcribed, and joined to it.
+        if encounter.recording.transcript:
+            encounter.recording.segment_transcripts = json.dumps(
+                [encounter.recording.transcript] + [""] * (len(segments) - 2)
+            )
+
         encounter.recording.transcript = None
+        # Cached transcripts are keyed by the audio's hash, so the combined
+        # audio has its own; those of the audio as it was are left for any
+        # other recordings of the same audio.
+        encounter.recording.audio_hash = audio_hash
         encounter.recording.duration = duration
         encounter.recording.waveform_peaks = json.dumps(peaks)
+        encounter.recording.waveform_peak_max = peak_max
         encounter.recording.segments = json.dumps(segments)
         database.commit()
     except Exception as e:
         combined.close()
+        if transcription_audio is not None:
+            transcription_audio.close()
         raise errors.DatabaseError(str(e))
 
     try:
         filename = f"{recording_id}.mp3"
         db.save_recording(combined, userSession.username, filename)
+
+        filename = f"{recording_id}.flac"
+        if transcription_audio is not None:
+            db.save_recording(transcription_audio, userSession.username, filename)
+        else:
+            # Never leave stale audio to be transcribed.
+            try:
+                db.delete_recording(userSession.username, filename)
+            except OSError:
+                pass
     finally:
         combined.close()
+        if transcription_audio is not None:
+            transcription_audio.close()
 
     backgroundTasks.add_task(
         log_data_change,
@@ -309,6 +402,30 @@ def append_recording(
     return ConvertToSchema.encounter(encounter)
 
 
+def _append_transcription_audio(
+    username: str, recording_id: str, combined: BinaryIO, new: BinaryIO
+) -> BinaryIO | None:
+    """
+    Returns the transcription audio of a recording extended with newly
+    appended audio, or None if it could not be prepared (transcription then
+    falls back to the stored recording).
+    """
+    filename = f"{recording_id}.flac"
+    transcription_audio = None
+
+    try:
+        if storage.recording_exists(username, filename):
+            transcription_audio = storage.open_recording(username, filename)
+
+        return append_transcription_audio(combined, transcription_audio, new)
+    except Exception as e:
+        log.warning(f"Unable to prepare audio for transcription: {str(e)}")
+        return None
+    finally:
+        if transcription_audio is not None:
+            transcription_audio.close()
+
+
 @router.patch("/{encounterId}")
 def update_encounter(
     userSession: useUserSession,
@@ -348,9 +465,11 @@ def update_encounter(
     if transcript is not None:
         encounter.recording.transcript = transcript
 
-        def auto_label_transcript():
+        async def auto_label_transcript():
             try:
-                generation = generate_transcript_label(settings.LABEL_MODEL, transcript)
+                (generation, cached) = await generate_transcript_label(
+                    database, settings.LABEL_MODEL, transcript
+                )
                 autolabel = generation.text.split("\n")[-1][0:100]
             except Exception as e:
                 if settings.ENVIRONMENT == "development":
@@ -358,6 +477,11 @@ def update_encounter(
 
                 raise e
 
+            await run_in_threadpool(save_autolabel, generation, autolabel, cached)
+
+        def save_autolabel(
+            generation: sch.GenerationOutput, autolabel: str, cached: bool
+        ):
             labelled_encounter = database.get_one(db.Encounter, encounterId)
             labelled_encounter.autolabel = autolabel
             labelled_encounter.modified = datetime.now(timezone.utc).astimezone()
@@ -375,6 +499,7 @@ def update_encounter(
                 record_id=encounter.recording.id,
                 task_type="LABEL TRANSCRIPT",
                 generation_output=generation,
+                cached=cached,
                 session=userSession,
             )
 
@@ -447,18 +572,32 @@ def delete_encounter(
         raise errors.NotFound("Record not found")
 
     deleted = datetime.now(timezone.utc).astimezone()
-    filename = f"{encounter.recording.id}.mp3"
 
     try:
-        try:
-            db.delete_recording(userSession.username, filename)
-        except OSError:
-            pass
+        for filename in [
+            f"{encounter.recording.id}.mp3",
+            f"{encounter.recording.id}.flac",
+        ]:
+            try:
+                db.delete_recording(userSession.username, filename)
+            except OSError:
+                pass
 
         encounter.recording.transcript = ""
+        encounter.recording.segment_transcripts = None
+
+        if encounter.recording.audio_hash is not None:
+            invalidate_cached_transcripts(database, encounter.recording.audio_hash)
+            encounter.recording.audio_hash = None
 
         encounter.context = ""
 
+        # Generated labels are logged against the recording, notes by their ID.
+        invalidate_cached_generations(
+            database,
+            [encounter.recording.id, *(n.id for n in encounter.draft_notes)],
+        )
+
         for draft_note in encounter.draft_notes:
             draft_note.content = ""
             draft_note.inactivated = deleted
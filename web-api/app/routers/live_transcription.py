@@ -0,0 +1,75 @@
+import json
+from typing import Annotated
+
+from fastapi import APIRouter, Cookie, WebSocket, WebSocketDisconnect, status
+from fastapi.exceptions import WebSocketException
+
+import app.errors as errors
+from app.logging import WebAPILogger
+from app.security import decode_token
+from app.tasks.live_transcription import LiveTranscription
+
+log = WebAPILogger(__name__)
+
+router = APIRouter()
+
+
+@router.websocket("/live-transcription")
+async def live_transcription(
+    websocket: WebSocket,
+    berta_session: Annotated[str | None, Cookie()] = None,
+):
+    """
+    Transcribes audio while it is being recorded.
+
+    The client sends the recorded audio as binary messages, in any format
+    ffmpeg can decode as a stream (such as the chunks of a MediaRecorder),
+    and a `{"type": "stop"}` message once recording stops. Each window of
+    speech is transcribed as it ends, and sent back as
+    `{"type": "partial", "index": n, "text": "..."}`, followed by
+    `{"type": "final", "transcript": "..."}` once the recording is complete.
+    """
+    # Browsers cannot set headers on WebSockets, so the session cookie is used.
+    try:
+        userSession = decode_token(berta_session or "")
+    except errors.WebAPIException:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION)
+
+    await websocket.accept()
+
+    async def send_partial(index: int, text: str):
+        await websocket.send_json({"type": "partial", "index": index, "text": text})
+
+    transcription = LiveTranscription(on_partial=send_partial)
+
+    try:
+        await transcription.start()
+
+        while True:
+            message = await websocket.receive()
+
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes"):
+                await transcription.add_audio(message["bytes"])
+            elif message.get("text"):
+                if json.loads(message["text"]).get("type") == "stop":
+                    break
+
+        transcript = await transcription.finish()
+
+        await websocket.send_json({"type": "final", "transcript": transcript})
+        await websocket.close()
+    except WebSocketDisconnect:
+        transcription.abort()
+    except Exception as e:
+        transcription.abort()
+        log.error(f"Live transcription failed: {str(e)}", userSession)
+
+        error = (
+            e
+            if isinstance(e, errors.WebAPIException)
+            else errors.WebAPIException(str(e))
+        )
+        await websocket.send_json({"type": "error", "message": error.message})
+        await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
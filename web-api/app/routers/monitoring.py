@@ -10,6 +10,7 @@ import app.errors as errors
 import app.schemas as sch
 from app.config.db import useDatabase
 from app.security import authenticate_session, useUserSession
+from app.services.audio_workers import audio_worker_pool
 from app.utility.conversion import ConvertToSchema
 
 router = APIRouter(dependencies=[Depends(authenticate_session)])
@@ -177,3 +178,11 @@ def get_updates(
             ],
         ),
     )
+
+
+@router.get("/audio-workers")
+def get_audio_worker_metrics() -> sch.AudioWorkerMetrics:
+    """
+    Gets the current load on the audio processing workers.
+    """
+    return audio_worker_pool.metrics()
@@ -1,16 +1,17 @@
 from pathlib import Path
 from typing import Annotated
-import io
 
 from fastapi import APIRouter, BackgroundTasks, Body, Depends, status
+from fastapi.responses import StreamingResponse
 
 import app.errors as errors
 import app.schemas as sch
 import app.tasks as tasks
-from app.config import settings, storage
+from app.config import settings
 from app.config.db import next_sqid, useDatabase
 from app.logging import WebAPILogger, log_generation, log_transcription
 from app.security import authenticate_session, useUserSession
+from app.utility.conversion import ConvertToSchema
 from app.utility.timing import ExecutionTimer
 
 log = WebAPILogger(__name__)
@@ -50,27 +51,10 @@ async def transcribe_audio(
 ) -> sch.TextResponse:
     timer = ExecutionTimer()
     try:
-        media_type = "audio/mpeg"
-        filename = f"{recordingId}.mp3"
-        
         with timer:
-            # Use the storage provider to get the recording file
-            # We need to collect all the streamed chunks into a file-like object
-            file_data = io.BytesIO()
-            try:
-                for chunk in storage.stream_recording(userSession.username, filename):
-                    file_data.write(chunk)
-                
-                # Reset file pointer to beginning
-                file_data.seek(0)
-                
-                # Transcribe the audio
-                transcription_output = await tasks.transcribe_audio(
-                    file_data, filename, media_type
-                )
-            except Exception as e:
-                log.error(f"Error accessing recording file: {str(e)}")
-                raise errors.NotFound(f"Recording file not found: {str(e)}")
+            (transcription_output, cached) = await tasks.transcribe_recording(
+                database, userSession.username, recordingId
+            )
 
         backgroundTasks.add_task(
             log_transcription,
@@ -78,6 +62,7 @@ async def transcribe_audio(
             recording_id=recordingId,
             timer=timer,
             service=settings.TRANSCRIPTION_SERVICE,
+            cached=cached,
             session=userSession,
         )
     except Exception as ex:
@@ -102,8 +87,71 @@ async def transcribe_audio(
     return sch.TextResponse(text=transcription_output.transcript)
 
 
+@router.post(
+    "/transcription-jobs",
+    status_code=status.HTTP_202_ACCEPTED,
+    generate_unique_id_function=(lambda _: "StartTranscriptionJob"),
+)
+async def start_transcription_job(
+    userSession: useUserSession,
+    database: useDatabase,
+    *,
+    recordingId: Annotated[str, Body()],
+) -> sch.TranscriptionJob:
+    """
+    Starts transcribing a saved recording in the background, returning the
+    job to follow its progress by.
+    """
+    job = tasks.start_transcription_job(database, userSession, recordingId)
+
+    return ConvertToSchema.transcription_job(job)
+
+
+@router.get(
+    "/transcription-jobs/{jobId}",
+    generate_unique_id_function=(lambda _: "GetTranscriptionJob"),
+)
+def get_transcription_job(
+    userSession: useUserSession,
+    database: useDatabase,
+    *,
+    jobId: str,
+) -> sch.TranscriptionJob:
+    """
+    Gets the status of a transcription job, including its transcript once
+    it has completed.
+    """
+    job = tasks.get_transcription_job(database, userSession.username, jobId)
+
+    return ConvertToSchema.transcription_job(job)
+
+
+@router.get(
+    "/transcription-jobs/{jobId}/events",
+    response_class=StreamingResponse,
+    generate_unique_id_function=(lambda _: "StreamTranscriptionJobEvents"),
+)
+def stream_transcription_job_events(
+    userSession: useUserSession,
+    database: useDatabase,
+    *,
+    jobId: str,
+):
+    """
+    Streams the progress of a transcription job as Server-Sent Events,
+    ending with a "completed" or "failed" event.
+    """
+    tasks.get_transcription_job(database, userSession.username, jobId)
+
+    return StreamingResponse(
+        tasks.transcription_job_events(userSession.username, jobId),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/generate-draft-note")
-def generate_draft_note(
+async def generate_draft_note(
     database: useDatabase,
     userSession: useUserSession,
     backgroundTasks: BackgroundTasks,
@@ -118,8 +166,8 @@ def generate_draft_note(
     try:
         noteId = next_sqid(database)
 
-        generation_output = tasks.generate_note(
-            model, instructions, context, transcript, outputType
+        (generation_output, cached) = await tasks.generate_note(
+            database, model, instructions, context, transcript, outputType
         )
 
         backgroundTasks.add_task(
@@ -128,6 +176,7 @@ def generate_draft_note(
             record_id=noteId,
             task_type="GENERATE NOTE",
             generation_output=generation_output,
+            cached=cached,
             session=userSession,
         )
     except errors.ExternalServiceError as e:
@@ -136,3 +185,93 @@ def generate_draft_note(
         raise errors.WebAPIException(str(e))
 
     return sch.GenerationResponse(text=generation_output.text, noteId=noteId)
+
+
+@router.post("/generate-draft-notes")
+async def generate_draft_notes(
+    database: useDatabase,
+    userSession: useUserSession,
+    backgroundTasks: BackgroundTasks,
+    *,
+    model: Annotated[str, Body()] = settings.DEFAULT_NOTE_GENERATION_MODEL,
+    notes: Annotated[list[sch.DraftNoteRequest], Body()],
+    context: Annotated[str | None, Body()] = None,
+    transcript: Annotated[str, Body()],
+) -> list[sch.GenerationResponse]:
+    """
+    Generates several draft notes for one transcript together, returning
+    them in the order requested. Should any note fail, the request fails,
+    though the notes generated are cached for it to be retried.
+    """
+    try:
+        results = await tasks.generate_notes(
+            database, model, notes, context, transcript
+        )
+
+        responses: list[sch.GenerationResponse] = []
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+
+            (generation_output, cached) = result
+            noteId = next_sqid(database)
+
+            backgroundTasks.add_task(
+                log_generation,
+                database=database,
+                record_id=noteId,
+                task_type="GENERATE NOTE",
+                generation_output=generation_output,
+                cached=cached,
+                session=userSession,
+            )
+
+            responses.append(
+                sch.GenerationResponse(text=generation_output.text, noteId=noteId)
+            )
+    except errors.ExternalServiceError as e:
+        raise e
+    except Exception as e:
+        raise errors.WebAPIException(str(e))
+
+    return responses
+
+
+@router.post(
+    "/generate-draft-note/stream",
+    response_class=StreamingResponse,
+    generate_unique_id_function=(lambda _: "StreamDraftNote"),
+)
+async def stream_draft_note(
+    database: useDatabase,
+    userSession: useUserSession,
+    *,
+    model: Annotated[str, Body()] = settings.DEFAULT_NOTE_GENERATION_MODEL,
+    instructions: Annotated[str, Body()],
+    context: Annotated[str | None, Body()] = None,
+    transcript: Annotated[str, Body()],
+    outputType: Annotated[sch.NoteOutputType, Body()],
+):
+    """
+    Generates a draft note as Server-Sent Events, sending each piece of text
+    in a "token" event as soon as it is generated, and ending with a
+    "completed" event with the whole note or a "failed" event.
+    """
+    try:
+        noteId = next_sqid(database)
+
+        # Generation starts before responding, so an unavailable model or
+        # service fails the request itself.
+        (stream, cached) = await tasks.stream_note(
+            database, model, instructions, context, transcript, outputType
+        )
+    except errors.ExternalServiceError as e:
+        raise e
+    except Exception as e:
+        raise errors.WebAPIException(str(e))
+
+    return StreamingResponse(
+        tasks.draft_note_events(noteId, stream, cached, userSession),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
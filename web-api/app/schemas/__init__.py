@@ -1,4 +1,6 @@
+from .audio_worker_metrics import AudioWorkerMetrics
 from .draft_note import DraftNote
+from .draft_note_request import DraftNoteRequest
 from .encounter import Encounter
 from .external_changes import ExternalChanges, ExternalChangeUpdate
 from .generation_output import GenerationOutput
@@ -13,6 +15,7 @@ from .sample_recording import SampleRecording
 from .simple_message import SimpleMessage
 from .text_response import TextResponse
 from .token import Token
+from .transcription_job import TranscriptionJob, TranscriptionJobStatus
 from .transcription_output import TranscriptionOutput
 from .user_feedback import UserFeedback
 from .user_info import UserInfo
@@ -21,7 +24,9 @@ from .web_api_error_detail import WebAPIErrorDetail
 from .web_api_session import WebAPISession
 
 __all__ = [
+    "AudioWorkerMetrics",
     "DraftNote",
+    "DraftNoteRequest",
     "Encounter",
     "ExternalChanges",
     "ExternalChangeUpdate",
@@ -37,6 +42,8 @@ __all__ = [
     "SimpleMessage",
     "TextResponse",
     "Token",
+    "TranscriptionJob",
+    "TranscriptionJobStatus",
     "TranscriptionOutput",
     "UserFeedback",
     "UserInfo",
@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+
+
+class AudioWorkerMetrics(BaseModel):
+    workers: int
+    queueLimit: int
+    running: int
+    queued: int
+    completed: int
+    failed: int
+    rejected: int
+    averageWaitTime: float | None
+    averageRunTime: float | None
@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+
+from .note_output_types import NoteOutputType
+
+
+class DraftNoteRequest(BaseModel):
+    instructions: str
+    outputType: NoteOutputType
+    model: str | None = None
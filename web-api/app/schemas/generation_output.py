@@ -11,3 +11,6 @@ class GenerationOutput(BaseModel):
     completionTokens: int
     promptTokens: int
     timeToGenerate: int
+    # The generation cache key, by which cached output is purged with the
+    # records generated from it.
+    cacheKey: str | None = None
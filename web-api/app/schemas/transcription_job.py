@@ -0,0 +1,19 @@
+from datetime import datetime
+from typing import Literal
+
+from pydantic import BaseModel
+
+TranscriptionJobStatus = Literal["QUEUED", "RUNNING", "COMPLETED", "FAILED"]
+
+
+class TranscriptionJob(BaseModel):
+    id: str
+    recordingId: str
+    status: TranscriptionJobStatus
+    segmentsCompleted: int
+    segmentsTotal: int | None
+    transcript: str | None
+    errorId: str | None
+    errorMessage: str | None
+    created: datetime
+    modified: datetime
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
 from typing import BinaryIO, Generator, Any
 
 from sqlalchemy import Engine as SqlAlchemyEngine
@@ -41,6 +42,11 @@ class StorageProvider(ABC):
     def delete_recording(self, username: str, filename: str) -> None:
         """Deletes a recording file from storage."""
         pass
+
+    @abstractmethod
+    def recording_exists(self, username: str, filename: str) -> bool:
+        """Checks whether a recording file is in storage."""
+        pass
     
     @abstractmethod
     def get_sample_recording(self, filename: str) -> Generator[bytes, Any, None]:
@@ -69,6 +75,12 @@ class TranscriptionService(ABC):
     def service_name(self) -> str:
         pass
 
+    @property
+    @abstractmethod
+    def model_name(self) -> str:
+        """The model transcripts are produced by, identifying them in caches."""
+        pass
+
     @abstractmethod
     async def transcribe(
         self,
@@ -79,6 +91,10 @@ class TranscriptionService(ABC):
     ) -> TranscriptionOutput:
         pass
 
+    async def aclose(self) -> None:
+        """Releases any connections held by the service, on shutdown."""
+        pass
+
 
 class GenerativeAIService(ABC):
     @property
@@ -92,10 +108,29 @@ class GenerativeAIService(ABC):
         pass
 
     @abstractmethod
-    def complete(
+    async def complete(
         self,
         model: str,
         messages: str | list[dict[str, str]],
         temperature: int = 0,
     ) -> GenerationOutput:
         pass
+
+    async def stream(
+        self,
+        model: str,
+        messages: str | list[dict[str, str]],
+        temperature: int = 0,
+    ) -> AsyncIterator[str | GenerationOutput]:
+        """
+        Yields the text of the completion as it is generated, then the
+        complete output when finished. Services without streaming yield the
+        whole text at once.
+        """
+        output = await self.complete(model, messages, temperature)
+        yield output.text
+        yield output
+
+    async def aclose(self) -> None:
+        """Releases any connections held by the service, on shutdown."""
+        pass
@@ -1,15 +1,13 @@
 import json
+import time
 import uuid
 import asyncio
 from typing import BinaryIO, List
-import io
-import os
 from pathlib import Path
 
 import aiohttp
 import boto3
 import botocore.exceptions
-from pydub import AudioSegment
 from botocore.config import Config
 
 from app.errors import (
@@ -18,15 +16,33 @@ from app.errors import (
     ExternalServiceTimeout,
 )
 from app.schemas import TranscriptionOutput
+from app.services import audio_processing, audio_workers
 from app.services.adapters import TranscriptionService
+from app.services.audio_pipeline import (
+    TRANSCRIPTION_AUDIO_FORMAT,
+    TRANSCRIPTION_MEDIA_TYPE,
+)
 from app.logging import WebAPILogger
 
 log = WebAPILogger(__name__)
 
+NOTIFICATION_TIMEOUT = 60  # Seconds to wait for a notification before checking
+
+# Names the transcription jobs of this app, among any others in the account.
+JOB_NAME_PREFIX = "berta-"
+# Seconds before an event of a job not watched here is received again.
+UNWATCHED_EVENT_VISIBILITY = 5
+
 
 class AmazonTranscribeService(TranscriptionService):
     
-    def __init__(self, region_name, aws_access_key_id=None, aws_secret_access_key=None):
+    def __init__(
+        self,
+        region_name,
+        aws_access_key_id=None,
+        aws_secret_access_key=None,
+        events_queue_url=None,
+    ):
         self._region_name = region_name
         self._aws_access_key_id = aws_access_key_id
         self._aws_secret_access_key = aws_secret_access_key
@@ -53,7 +69,30 @@ class AmazonTranscribeService(TranscriptionService):
             aws_secret_access_key=self._aws_secret_access_key,
             config=client_config
         )
-        
+
+        self._transfer_config = boto3.s3.transfer.TransferConfig(
+            multipart_threshold=8 * 1024 * 1024,  # 8MB
+            max_concurrency=10,
+            use_threads=True
+        )
+
+        # Job completion is awaited from notifications when a queue is given,
+        # otherwise by polling the job's status.
+        self._notifications = None
+        if events_queue_url:
+            sqs_client = boto3.client(
+                "sqs",
+                region_name=self._region_name,
+                aws_access_key_id=self._aws_access_key_id,
+                aws_secret_access_key=self._aws_secret_access_key,
+                config=client_config
+            )
+            self._notifications = TranscriptionJobNotifications(
+                sqs_client, events_queue_url
+            )
+
+        # Transcripts are downloaded over one shared session, opened on first use.
+        self._http_session: aiohttp.ClientSession | None = None
 
         self._bucket_name = None
 
@@ -61,42 +100,18 @@ class AmazonTranscribeService(TranscriptionService):
     def service_name(self):
         return "AmazonTranscribe"
 
+    @property
+    def model_name(self):
+        return "standard"
+
     async def optimize_audio(self, audio_file: BinaryIO, filename: str) -> tuple[BinaryIO, str]:
         try:
-            audio_copy = io.BytesIO()
-            audio_file.seek(0)
-            audio_copy.write(audio_file.read())
-            audio_file.seek(0)
-            audio_copy.seek(0)
-            
-            # Load with pydub
-            audio = AudioSegment.from_file(audio_copy)
-            
-            # Convert to mono if stereo
-            if audio.channels > 1:
-                log.info("Converting stereo to mono for transcription optimization")
-                audio = audio.set_channels(1)
-                
-            # Convert to 16kHz sample rate
-            if audio.frame_rate != 16000:
-                log.info(f"Converting {audio.frame_rate}Hz to 16kHz for transcription optimization")
-                audio = audio.set_frame_rate(16000)
-                
-            # Normalize audio levels
-            audio = audio.normalize()
-            log.info("Audio normalized for optimal transcription")
-            
-            # Export as WAV
-            output = io.BytesIO()
-            audio.export(
-                output, 
-                format="wav",
-                parameters=["-ar", "16000", "-ac", "1"]
-            )
-            output.seek(0)
+            # Encoded by ffmpeg straight from the decoded stream to lossless
+            # 16kHz mono FLAC, which is far smaller to upload than WAV.
+            optimized = await audio_workers.create_transcription_audio(audio_file)
             log.info("Audio optimized for AWS Transcribe")
-            
-            return output, "wav"
+
+            return optimized, TRANSCRIPTION_AUDIO_FORMAT
         except Exception as e:
             log.warning(f"Audio optimization failed: {str(e)}. Using original file.")
             audio_file.seek(0)
@@ -104,17 +119,9 @@ class AmazonTranscribeService(TranscriptionService):
 
     async def split_long_audio(self, audio_file: BinaryIO, filename: str, max_segments: int = 8) -> List[tuple[BinaryIO, str]]:
         try:
-            
-            audio_copy = io.BytesIO()
-            audio_file.seek(0)
-            audio_copy.write(audio_file.read())
-            audio_file.seek(0)
-            audio_copy.seek(0)
-            
-            # Load the audio
-            audio = AudioSegment.from_file(audio_copy)
-            total_duration = len(audio)
-            
+            total_duration = await asyncio.to_thread(
+                audio_processing.get_duration, audio_file
+            )
           
             if total_duration < 60000:  
                 return [await self.optimize_audio(audio_file, filename)]
@@ -128,25 +135,17 @@ class AmazonTranscribeService(TranscriptionService):
             log.info(f"Splitting {total_duration/1000:.1f}s audio into {segment_count} segments for parallel processing")
             
             segment_duration = total_duration // segment_count
-            segments = []
-            
-            for i in range(segment_count):
-                start_time = i * segment_duration
-                end_time = min((i + 1) * segment_duration, total_duration)
-                
-                segment = audio[start_time:end_time]
-                
-                if segment.channels > 1:
-                    segment = segment.set_channels(1)
-                if segment.frame_rate != 16000:
-                    segment = segment.set_frame_rate(16000)
-                segment = segment.normalize()
-                
-                segment_file = io.BytesIO()
-                segment.export(segment_file, format="wav")
-                segment_file.seek(0)
-                
-                segments.append((segment_file, "wav"))
+            # The last segment runs to the end, whatever the rounding.
+            bounds = [
+                (i * segment_duration, (i + 1) * segment_duration)
+                for i in range(segment_count - 1)
+            ]
+            bounds.append(((segment_count - 1) * segment_duration, None))
+
+            segment_files = await audio_workers.create_transcription_segments(
+                audio_file, bounds
+            )
+            segments = [(f, TRANSCRIPTION_AUDIO_FORMAT) for f in segment_files]
                 
             log.info(f"Created {len(segments)} optimized audio segments")
             return segments
@@ -172,6 +171,7 @@ class AmazonTranscribeService(TranscriptionService):
             
         # Track cleanup items
         cleanup_items = []
+        optimized_audio = audio_file
         
         try:
             audio_file.seek(0, 2)  
@@ -185,9 +185,13 @@ class AmazonTranscribeService(TranscriptionService):
                     audio_file, filename, content_type, language_code
                 )
             
-            optimized_audio, format_extension = await self.optimize_audio(audio_file, filename)
+            if content_type == TRANSCRIPTION_MEDIA_TYPE:
+                # Already prepared as 16kHz mono for transcription.
+                optimized_audio, format_extension = audio_file, TRANSCRIPTION_AUDIO_FORMAT
+            else:
+                optimized_audio, format_extension = await self.optimize_audio(audio_file, filename)
             
-            job_name = f"transcription-{uuid.uuid4()}"
+            job_name = f"{JOB_NAME_PREFIX}transcription-{uuid.uuid4()}"
             s3_key = f"{job_name}/audio.{format_extension}"
             
             cleanup_items.append(s3_key)
@@ -195,17 +199,13 @@ class AmazonTranscribeService(TranscriptionService):
             log.info(f"Uploading audio to S3: bucket={self._bucket_name}, key={s3_key}")
 
             
-            transfer_config = boto3.s3.transfer.TransferConfig(
-                multipart_threshold=8 * 1024 * 1024,  # 8MB
-                max_concurrency=10,
-                use_threads=True
-            )
-            
-            self._s3_client.upload_fileobj(
+            # boto3 blocks, so its calls are run off the event loop.
+            await asyncio.to_thread(
+                self._s3_client.upload_fileobj,
                 optimized_audio, 
                 self._bucket_name, 
                 s3_key,
-                Config=transfer_config
+                Config=self._transfer_config
             )
 
             
@@ -213,7 +213,8 @@ class AmazonTranscribeService(TranscriptionService):
 
             
             log.info(f"Starting AWS Transcribe job: {job_name}, media_uri={media_uri}")
-            response = self._client.start_transcription_job(
+            await asyncio.to_thread(
+                self._client.start_transcription_job,
                 TranscriptionJobName=job_name,
                 Media={"MediaFileUri": media_uri},
                 MediaFormat=format_extension,
@@ -254,10 +255,17 @@ class AmazonTranscribeService(TranscriptionService):
             log.error(f"Exception in transcribe: {e}\n{traceback.format_exc()}")
             raise ExternalServiceError(self.service_name, str(e))
         finally:
+            if optimized_audio is not audio_file:
+                optimized_audio.close()
+
             for s3_key in cleanup_items:
                 try:
                     log.info(f"Cleaning up S3 object: bucket={self._bucket_name}, key={s3_key}")
-                    self._s3_client.delete_object(Bucket=self._bucket_name, Key=s3_key)
+                    await asyncio.to_thread(
+                        self._s3_client.delete_object,
+                        Bucket=self._bucket_name,
+                        Key=s3_key,
+                    )
                     log.info(f"Successfully deleted S3 object: {s3_key}")
                 except Exception as cleanup_error:
                     log.error(f"Failed to cleanup S3 object {s3_key}: {str(cleanup_error)}")
@@ -272,39 +280,35 @@ class AmazonTranscribeService(TranscriptionService):
         
         segments = await self.split_long_audio(audio_file, filename)
         
-        if len(segments) == 1:
-            return await self.transcribe(
-                segments[0][0], 
-                f"{Path(filename).stem}.{segments[0][1]}", 
-                f"audio/{segments[0][1]}",
-                None, 
-                language_code
-            )
-        
         tasks = []
         cleanup_items = []  
         
         try:
+            if len(segments) == 1:
+                return await self.transcribe(
+                    segments[0][0], 
+                    f"{Path(filename).stem}.{segments[0][1]}", 
+                    f"audio/{segments[0][1]}",
+                    None, 
+                    language_code
+                )
+
+
             log.info(f"Starting parallel transcription of {len(segments)} segments")
             
             for i, (segment_file, format_ext) in enumerate(segments):
-                job_name = f"segment-{uuid.uuid4()}"
+                job_name = f"{JOB_NAME_PREFIX}segment-{uuid.uuid4()}"
                 s3_key = f"{job_name}/segment-{i}.{format_ext}"
                 cleanup_items.append(s3_key)
                 
                 log.info(f"Uploading segment {i} to S3: bucket={self._bucket_name}, key={s3_key}")
                 
-                transfer_config = boto3.s3.transfer.TransferConfig(
-                    multipart_threshold=8 * 1024 * 1024,
-                    max_concurrency=10,
-                    use_threads=True
-                )
-                
-                self._s3_client.upload_fileobj(
+                await asyncio.to_thread(
+                    self._s3_client.upload_fileobj,
                     segment_file,
                     self._bucket_name,
                     s3_key,
-                    Config=transfer_config
+                    Config=self._transfer_config
                 )
                 
                 media_uri = f"s3://{self._bucket_name}/{s3_key}"
@@ -312,7 +316,8 @@ class AmazonTranscribeService(TranscriptionService):
                 log.info(f"Starting transcription job for segment {i}: {job_name}")
                 
                 
-                self._client.start_transcription_job(
+                await asyncio.to_thread(
+                    self._client.start_transcription_job,
                     TranscriptionJobName=job_name,
                     Media={"MediaFileUri": media_uri},
                     MediaFormat=format_ext,
@@ -343,11 +348,19 @@ class AmazonTranscribeService(TranscriptionService):
             log.error(f"Error in parallel transcription: {str(e)}")
             raise
         finally:
+            for segment_file, _ in segments:
+                if segment_file is not audio_file:
+                    segment_file.close()
+
             log.info(f"Starting cleanup of {len(cleanup_items)} S3 objects")
             for s3_key in cleanup_items:
                 try:
                     log.info(f"Cleaning up S3 object: bucket={self._bucket_name}, key={s3_key}")
-                    self._s3_client.delete_object(Bucket=self._bucket_name, Key=s3_key)
+                    await asyncio.to_thread(
+                        self._s3_client.delete_object,
+                        Bucket=self._bucket_name,
+                        Key=s3_key,
+                    )
                     log.info(f"Successfully deleted S3 object: {s3_key}")
                 except Exception as cleanup_error:
                     log.error(f"Failed to cleanup S3 object {s3_key}: {str(cleanup_error)}")
@@ -359,65 +372,93 @@ class AmazonTranscribeService(TranscriptionService):
         max_delay = 20
         
         log.info(f"Waiting for transcription job to complete: {job_name}")
-        
-        while attempts < max_attempts:
-            try:
-                status = self._client.get_transcription_job(
-                    TranscriptionJobName=job_name
-                )
-                
-                job_status = status["TranscriptionJob"]["TranscriptionJobStatus"]
-                
-                if job_status == "COMPLETED":
-                    log.info(f"Transcription job completed: {job_name}")
-                    # Get the transcript URL
-                    transcript_uri = status["TranscriptionJob"]["Transcript"]["TranscriptFileUri"]
-                    
-                    async with aiohttp.ClientSession() as session:
-                        async with session.get(transcript_uri) as response:
-                            if response.status == 200:
-                                content = await response.read()
-                                try:
-                                    # Parse the transcript JSON
-                                    transcript_json = json.loads(content)
-                                    return transcript_json["results"]["transcripts"][0]["transcript"]
-                                except (json.JSONDecodeError, KeyError) as e:
-                                    # Fallback parsing approach
-                                    content_text = content.decode("utf-8")
-                                    transcript_json = json.loads(content_text)
-                                    return transcript_json["results"]["transcripts"][0]["transcript"]
-                            else:
-                                raise ExternalServiceError(
-                                    self.service_name,
-                                    f"Failed to download transcript: {response.status}"
-                                )
-                elif job_status == "FAILED":
-                    error_reason = status["TranscriptionJob"].get("FailureReason", "Unknown error")
-                    log.error(f"Transcription job failed: {job_name}, reason: {error_reason}")
-                    raise ExternalServiceError(
-                        self.service_name,
-                        f"Transcription job failed: {error_reason}"
+
+        # Watch for notifications before the first status check, so that
+        # a change in between is not missed.
+        notifications = self._notifications
+        changed = notifications.watch(job_name) if notifications else None
+
+        try:
+            while attempts < max_attempts:
+                try:
+                    status = await asyncio.to_thread(
+                        self._client.get_transcription_job,
+                        TranscriptionJobName=job_name
                     )
-                elif job_status in ["IN_PROGRESS", "QUEUED"]:
-                    log.debug(f"Transcription job {job_name} status: {job_status}, attempt {attempts + 1}")
-                
-                delay = min(max_delay, base_delay * (1.5 ** min(attempts, 8)))
-                await asyncio.sleep(delay)
-                attempts += 1
-                
-            except Exception as e:
-                log.error(f"Error checking transcription job status: {job_name}, {str(e)}")
-                attempts += 1
-                if attempts < max_attempts:
-                    await asyncio.sleep(base_delay)
-                else:
+                    
+                    job_status = status["TranscriptionJob"]["TranscriptionJobStatus"]
+                    
+                    if job_status == "COMPLETED":
+                        log.info(f"Transcription job completed: {job_name}")
+                        # Get the transcript URL
+                        transcript_uri = status["TranscriptionJob"]["Transcript"]["TranscriptFileUri"]
+                        return await self._download_transcript(transcript_uri)
+                    elif job_status == "FAILED":
+                        error_reason = status["TranscriptionJob"].get("FailureReason", "Unknown error")
+                        log.error(f"Transcription job failed: {job_name}, reason: {error_reason}")
+                        raise ExternalServiceError(
+                            self.service_name,
+                            f"Transcription job failed: {error_reason}"
+                        )
+                    elif job_status in ["IN_PROGRESS", "QUEUED"]:
+                        log.debug(f"Transcription job {job_name} status: {job_status}, attempt {attempts + 1}")
+                    
+                    if changed is not None:
+                        # Status is checked again on a notification, or after
+                        # a while in case one was lost.
+                        await notifications.wait(changed, NOTIFICATION_TIMEOUT)
+                        if changed.done():
+                            changed = notifications.watch(job_name)
+                    else:
+                        delay = min(max_delay, base_delay * (1.5 ** min(attempts, 8)))
+                        await asyncio.sleep(delay)
+                    attempts += 1
+                    
+                except ExternalServiceError:
                     raise
+                except Exception as e:
+                    log.error(f"Error checking transcription job status: {job_name}, {str(e)}")
+                    attempts += 1
+                    if attempts < max_attempts:
+                        await asyncio.sleep(base_delay)
+                    else:
+                        raise
+        finally:
+            if notifications:
+                notifications.unwatch(job_name)
             
         log.error(f"Transcription job timed out: {job_name}")
         raise ExternalServiceTimeout(
             self.service_name,
             f"Transcription job {job_name} timed out after {max_attempts} attempts"
         )
+
+    async def _download_transcript(self, transcript_uri: str) -> str:
+        if self._http_session is None or self._http_session.closed:
+            self._http_session = aiohttp.ClientSession()
+
+        async with self._http_session.get(transcript_uri) as response:
+            if response.status != 200:
+                raise ExternalServiceError(
+                    self.service_name,
+                    f"Failed to download transcript: {response.status}"
+                )
+
+            content = await response.read()
+
+        try:
+            transcript_json = json.loads(content)
+            return transcript_json["results"]["transcripts"][0]["transcript"]
+        except (json.JSONDecodeError, KeyError, IndexError) as e:
+            raise ExternalServiceError(
+                self.service_name, f"Invalid transcript: {str(e)}"
+            )
+
+    async def aclose(self) -> None:
+        if self._notifications:
+            await self._notifications.aclose()
+        if self._http_session is not None:
+            await self._http_session.close()
         
     def _combine_transcripts(self, transcripts: List[str]) -> str:
         """
@@ -475,4 +516,121 @@ class AmazonTranscribeService(TranscriptionService):
 
         return format_mapping.get(
             extension, "mp3"
-        )
\ No newline at end of file
+        )
+
+
+class TranscriptionJobNotifications:
+    """
+    Receives the state changes of transcription jobs from an SQS queue, to
+    which EventBridge routes the "Transcribe Job State Change" events (either
+    directly or through an SNS topic).
+
+    The queue is long polled only while jobs are being watched. Events of
+    this app's jobs not watched here (e.g. those of another API instance
+    sharing the queue) are soon made visible again for others to receive,
+    until older than the notification timeout: any instance watching the job
+    will by then have checked its status itself. Stale events, and any
+    other messages, are deleted so they are not redelivered forever.
+    """
+
+    def __init__(self, sqs_client, queue_url: str):
+        self._sqs_client = sqs_client
+        self._queue_url = queue_url
+        self._watched: dict[str, asyncio.Future[str]] = {}
+        self._receiver: asyncio.Task | None = None
+
+    def watch(self, job_name: str) -> asyncio.Future[str]:
+        "Returns a future of the job's next status."
+        changed = asyncio.get_running_loop().create_future()
+        self._watched[job_name] = changed
+
+        if self._receiver is None or self._receiver.done():
+            self._receiver = asyncio.create_task(self._receive())
+
+        return changed
+
+    def unwatch(self, job_name: str) -> None:
+        self._watched.pop(job_name, None)
+
+    async def wait(self, changed: asyncio.Future[str], timeout: float) -> None:
+        "Waits for the job's status to change, for at most the timeout."
+        try:
+            await asyncio.wait_for(asyncio.shield(changed), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def aclose(self) -> None:
+        if self._receiver is not None:
+            self._receiver.cancel()
+
+    async def _receive(self) -> None:
+        while self._watched:
+            try:
+                response = await asyncio.to_thread(
+                    self._sqs_client.receive_message,
+                    QueueUrl=self._queue_url,
+                    MaxNumberOfMessages=10,
+                    WaitTimeSeconds=20,
+                    AttributeNames=["SentTimestamp"],
+                )
+            except Exception as e:
+                log.error(f"Failed to receive transcription job events: {str(e)}")
+                await asyncio.sleep(5)
+                continue
+
+            for message in response.get("Messages", []):
+                await self._handle(message)
+
+    async def _handle(self, message: dict) -> None:
+        event = self._parse_event(message["Body"])
+        (job_name, job_status) = event if event is not None else ("", "")
+        changed = self._watched.get(job_name)
+
+        if (
+            changed is None
+            and job_name.startswith(JOB_NAME_PREFIX)
+            and not self._expired(message)
+        ):
+            # Another instance may be watching the job.
+            await self._call(
+                self._sqs_client.change_message_visibility,
+                ReceiptHandle=message["ReceiptHandle"],
+                VisibilityTimeout=UNWATCHED_EVENT_VISIBILITY,
+            )
+            return
+
+        await self._call(
+            self._sqs_client.delete_message, ReceiptHandle=message["ReceiptHandle"]
+        )
+
+        if changed is not None and not changed.done():
+            changed.set_result(job_status)
+
+    async def _call(self, operation, **kwargs) -> None:
+        try:
+            await asyncio.to_thread(operation, QueueUrl=self._queue_url, **kwargs)
+        except Exception as e:
+            log.warning(f"Failed to update transcription job event: {str(e)}")
+
+    @staticmethod
+    def _expired(message: dict) -> bool:
+        "Whether the message was sent longer ago than the notification timeout."
+        sent = message.get("Attributes", {}).get("SentTimestamp")
+        if sent is None:
+            return False
+
+        return time.time() - int(sent) / 1000 > NOTIFICATION_TIMEOUT
+
+    @staticmethod
+    def _parse_event(body: str) -> tuple[str, str] | None:
+        "Returns the job name and status of an event, if it is one."
+        try:
+            event = json.loads(body)
+            # Events delivered through SNS are wrapped in a notification.
+            if "Message" in event and "detail" not in event:
+                event = json.loads(event["Message"])
+
+            detail = event["detail"]
+            return (detail["TranscriptionJobName"], detail["TranscriptionJobStatus"])
+        except (json.JSONDecodeError, KeyError, TypeError):
+            return None
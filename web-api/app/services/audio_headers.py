@@ -0,0 +1,445 @@
+"""
+Reads audio metadata directly from container and frame headers,
+without decoding any audio.
+"""
+
+import struct
+from collections.abc import Iterator
+from typing import BinaryIO, NamedTuple
+
+ID3V2_HEADER_SIZE = 10
+MP3_HEADER_SIZE = 4
+
+# Matroska/WebM metadata is expected near the start of the file.
+MATROSKA_PROBE_SIZE = 64 * 1024
+
+# Bitrates (kbps) of MPEG Layer III, by bitrate index.
+_MPEG1_BITRATES = [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320]
+_MPEG2_BITRATES = [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160]
+
+# Sample rates by MPEG version bits, then sample rate index.
+_SAMPLE_RATES = {
+    0b11: [44100, 48000, 32000],  # MPEG 1
+    0b10: [22050, 24000, 16000],  # MPEG 2
+    0b00: [11025, 12000, 8000],  # MPEG 2.5
+}
+
+# Tags that mark a leading frame as metadata rather than audio.
+_INFO_TAGS = (b"Xing", b"Info")
+_VBRI_TAG_OFFSET = MP3_HEADER_SIZE + 32
+_VBRI_FRAMES_OFFSET = _VBRI_TAG_OFFSET + 14
+_XING_FRAMES_FLAG = 0x1
+
+# EBML element IDs used to find the duration of Matroska/WebM files.
+_EBML_HEADER = 0x1A45DFA3
+_MATROSKA_SEGMENT = 0x18538067
+_MATROSKA_INFO = 0x1549A966
+_MATROSKA_CLUSTER = 0x1F43B675
+_MATROSKA_TIMECODE_SCALE = 0x2AD7B1
+_MATROSKA_DURATION = 0x4489
+
+
+class Mp3Frame(NamedTuple):
+    "The properties of an MPEG Layer III frame, as read from its header."
+
+    offset: int
+    size: int
+    sample_rate: int
+    channels: int
+    samples: int
+    bitrate: int
+    mpeg1: bool
+
+
+class Mp3Stream(NamedTuple):
+    "The contiguous run of audio frames within an MP3 file."
+
+    start: int
+    end: int
+    sample_rate: int
+    channels: int
+    frame_count: int
+    samples: int
+
+    @property
+    def duration(self) -> int:
+        "The duration of the audio in ms."
+        return self.samples * 1000 // self.sample_rate
+
+
+def parse_mp3_frame_header(header: bytes, offset: int = 0) -> Mp3Frame | None:
+    "Parses an MPEG Layer III frame header, if the bytes are one."
+    if len(header) < MP3_HEADER_SIZE or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+
+    version = (header[1] >> 3) & 0b11
+    layer = (header[1] >> 1) & 0b11
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 0b11
+    padding = (header[2] >> 1) & 0b1
+    channel_mode = header[3] >> 6
+
+    if (
+        version not in _SAMPLE_RATES
+        or layer != 0b01
+        or bitrate_index in (0, 15)
+        or sample_rate_index == 3
+    ):
+        return None
+
+    mpeg1 = version == 0b11
+    bitrate = (_MPEG1_BITRATES if mpeg1 else _MPEG2_BITRATES)[bitrate_index]
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+    samples = 1152 if mpeg1 else 576
+
+    return Mp3Frame(
+        offset=offset,
+        size=(samples // 8) * bitrate * 1000 // sample_rate + padding,
+        sample_rate=sample_rate,
+        channels=1 if channel_mode == 0b11 else 2,
+        samples=samples,
+        bitrate=bitrate,
+        mpeg1=mpeg1,
+    )
+
+
+def _id3v2_size(header: bytes) -> int:
+    "Returns the size of an ID3v2 tag from its header, or 0 if there is none."
+    if len(header) < ID3V2_HEADER_SIZE or header[:3] != b"ID3":
+        return 0
+
+    # The tag size is a 28-bit "synchsafe" integer, excluding the header.
+    size = 0
+    for byte in header[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+
+    has_footer = header[5] & 0x10
+    return ID3V2_HEADER_SIZE + size + (ID3V2_HEADER_SIZE if has_footer else 0)
+
+
+def _xing_tag_offset(frame: Mp3Frame) -> int:
+    "The offset within a frame of a Xing or Info tag, after the side information."
+    if frame.mpeg1:
+        side_info_size = 17 if frame.channels == 1 else 32
+    else:
+        side_info_size = 9 if frame.channels == 1 else 17
+
+    return MP3_HEADER_SIZE + side_info_size
+
+
+def _is_info_frame(frame: Mp3Frame, data: bytes) -> bool:
+    "Whether a frame holds a Xing, Info or VBRI tag rather than audio."
+    tag_offset = _xing_tag_offset(frame)
+
+    return (
+        data[tag_offset : tag_offset + 4] in _INFO_TAGS
+        or data[_VBRI_TAG_OFFSET : _VBRI_TAG_OFFSET + 4] == b"VBRI"
+    )
+
+
+def _info_frame_count(frame: Mp3Frame, data: bytes) -> int | None:
+    "Returns the number of audio frames recorded by a Xing, Info or VBRI tag."
+    tag_offset = _xing_tag_offset(frame)
+
+    if data[tag_offset : tag_offset + 4] in _INFO_TAGS:
+        flags_offset = tag_offset + 4
+        frames_offset = flags_offset + 4
+        if len(data) < frames_offset + 4:
+            return None
+
+        (flags,) = struct.unpack_from(">I", data, flags_offset)
+        if not flags & _XING_FRAMES_FLAG:
+            return None
+
+        (frame_count,) = struct.unpack_from(">I", data, frames_offset)
+        return frame_count
+
+    if data[_VBRI_TAG_OFFSET : _VBRI_TAG_OFFSET + 4] == b"VBRI":
+        if len(data) < _VBRI_FRAMES_OFFSET + 4:
+            return None
+
+        (frame_count,) = struct.unpack_from(">I", data, _VBRI_FRAMES_OFFSET)
+        return frame_count
+
+    return None
+
+
+def iter_mp3_frames(file: BinaryIO) -> Iterator[Mp3Frame]:
+    """
+    Yields the audio frames of an MP3 file, reading only frame headers.
+
+    A leading ID3v2 tag and Xing/Info/VBRI frame are skipped, and the scan
+    stops at the first bytes that are not a frame (e.g. a trailing ID3v1 tag).
+    """
+    file.seek(0)
+    offset = _id3v2_size(file.read(ID3V2_HEADER_SIZE))
+    first = True
+
+    while True:
+        file.seek(offset)
+        frame = parse_mp3_frame_header(file.read(MP3_HEADER_SIZE), offset)
+
+        if frame is None:
+            return
+
+        if first:
+            first = False
+            file.seek(offset)
+            if _is_info_frame(frame, file.read(frame.size)):
+                offset += frame.size
+                continue
+
+        yield frame
+        offset += frame.size
+
+
+def scan_mp3(file: BinaryIO) -> Mp3Stream | None:
+    "Locates and measures the audio frames of an MP3 file, if there are any."
+    start: Mp3Frame | None = None
+    end = 0
+    frame_count = 0
+    samples = 0
+
+    try:
+        for frame in iter_mp3_frames(file):
+            if start is None:
+                start = frame
+            elif (frame.sample_rate, frame.channels) != (
+                start.sample_rate,
+                start.channels,
+            ):
+                break
+
+            end = frame.offset + frame.size
+            frame_count += 1
+            samples += frame.samples
+    finally:
+        file.seek(0)
+
+    if start is None:
+        return None
+
+    return Mp3Stream(
+        start=start.offset,
+        end=end,
+        sample_rate=start.sample_rate,
+        channels=start.channels,
+        frame_count=frame_count,
+        samples=samples,
+    )
+
+
+def copy_mp3_frames(source: BinaryIO, stream: Mp3Stream, sink: BinaryIO) -> None:
+    "Copies the audio frames of an MP3 file (without any tags) to the sink."
+    source.seek(stream.start)
+    remaining = stream.end - stream.start
+
+    while remaining > 0:
+        chunk = source.read(min(remaining, 64 * 1024))
+        if not chunk:
+            break
+        sink.write(chunk)
+        remaining -= len(chunk)
+
+    source.seek(0)
+
+
+# ----------------------------------
+# DURATION PROBING
+
+
+def probe_duration(file: BinaryIO) -> int | None:
+    """
+    Returns the duration of an audio file in ms, as read from its headers.
+
+    MP3 (Xing/Info/VBRI tags, or a scan of the frame headers), WAV,
+    Matroska/WebM and MP4 files are supported. Returns None when the format
+    is not recognized or its headers do not record the duration.
+    """
+    try:
+        file.seek(0)
+        header = file.read(12)
+
+        if header[:4] == b"RIFF" and header[8:12] == b"WAVE":
+            return _wav_duration(file)
+        if header[:4] == _EBML_HEADER.to_bytes(4, "big"):
+            return _matroska_duration(file)
+        if header[4:8] == b"ftyp":
+            return _mp4_duration(file)
+        if header[:3] == b"ID3" or parse_mp3_frame_header(header) is not None:
+            return _mp3_duration(file)
+
+        return None
+    except (struct.error, ValueError):
+        return None
+    finally:
+        file.seek(0)
+
+
+def _mp3_duration(file: BinaryIO) -> int | None:
+    file.seek(0)
+    offset = _id3v2_size(file.read(ID3V2_HEADER_SIZE))
+
+    file.seek(offset)
+    first = parse_mp3_frame_header(file.read(MP3_HEADER_SIZE), offset)
+
+    if first is None:
+        return None
+
+    # A leading Xing/Info/VBRI tag records the number of frames,
+    # otherwise the frames are counted from their headers.
+    file.seek(offset)
+    frame_count = _info_frame_count(first, file.read(first.size))
+
+    if frame_count is not None:
+        return frame_count * first.samples * 1000 // first.sample_rate
+
+    stream = scan_mp3(file)
+    return stream.duration if stream is not None else None
+
+
+def _wav_duration(file: BinaryIO) -> int | None:
+    file.seek(12)
+    byte_rate = None
+
+    while True:
+        chunk_header = file.read(8)
+        if len(chunk_header) < 8:
+            return None
+
+        (chunk_id, chunk_size) = struct.unpack("<4sI", chunk_header)
+
+        if chunk_id == b"fmt ":
+            fmt = file.read(chunk_size)
+            (byte_rate,) = struct.unpack_from("<I", fmt, 8)
+            file.seek(chunk_size % 2, 1)
+        elif chunk_id == b"data":
+            if not byte_rate:
+                return None
+
+            # Streamed WAV files may not record the size of their data.
+            data_start = file.tell()
+            file_end = file.seek(0, 2)
+            if chunk_size in (0, 0xFFFFFFFF) or data_start + chunk_size > file_end:
+                chunk_size = file_end - data_start
+
+            return chunk_size * 1000 // byte_rate
+        else:
+            file.seek(chunk_size + chunk_size % 2, 1)
+
+
+def _read_ebml_vint(data: bytes, offset: int, keep_marker: bool) -> tuple[int, int]:
+    """
+    Reads a variable-length EBML integer, returning it and the offset after it.
+    Element IDs keep their length marker bit; sizes do not.
+    """
+    first = data[offset]
+    length = 1
+    while length <= 8 and not first & (0x80 >> (length - 1)):
+        length += 1
+
+    if length > 8 or offset + length > len(data):
+        raise ValueError("Invalid EBML integer")
+
+    value = first if keep_marker else first & (0xFF >> length)
+    for byte in data[offset + 1 : offset + length]:
+        value = (value << 8) | byte
+
+    # A size with all value bits set is "unknown" (e.g. a live stream).
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        value = -1
+
+    return (value, offset + length)
+
+
+def _matroska_duration(file: BinaryIO) -> int | None:
+    file.seek(0)
+    data = file.read(MATROSKA_PROBE_SIZE)
+    offset = 0
+    timecode_scale = 1_000_000  # The default, in ns.
+
+    while offset < len(data):
+        (element_id, offset) = _read_ebml_vint(data, offset, keep_marker=True)
+        (size, offset) = _read_ebml_vint(data, offset, keep_marker=False)
+
+        if element_id == _MATROSKA_SEGMENT:
+            # Descend into the segment.
+            continue
+        if element_id == _MATROSKA_CLUSTER or size < 0:
+            # The audio has started without a duration being recorded.
+            return None
+        if element_id != _MATROSKA_INFO:
+            offset += size
+            continue
+
+        info_end = min(offset + size, len(data))
+        duration = None
+
+        while offset < info_end:
+            (child_id, offset) = _read_ebml_vint(data, offset, keep_marker=True)
+            (child_size, offset) = _read_ebml_vint(data, offset, keep_marker=False)
+            value = data[offset : offset + child_size]
+
+            if child_id == _MATROSKA_TIMECODE_SCALE:
+                timecode_scale = int.from_bytes(value, "big")
+            elif child_id == _MATROSKA_DURATION and child_size in (4, 8):
+                (duration,) = struct.unpack(">f" if child_size == 4 else ">d", value)
+
+            offset += child_size
+
+        if duration is None:
+            return None
+
+        return int(duration * timecode_scale / 1_000_000)
+
+    return None
+
+
+def _mp4_duration(file: BinaryIO) -> int | None:
+    file_end = file.seek(0, 2)
+
+    # Find the movie header within the top-level movie box, which may follow
+    # the media data; other boxes are skipped without being read.
+    for (box_type, box_start, box_end) in _iter_mp4_boxes(file, 0, file_end):
+        if box_type != b"moov":
+            continue
+
+        for (child_type, child_start, _) in _iter_mp4_boxes(file, box_start, box_end):
+            if child_type != b"mvhd":
+                continue
+
+            file.seek(child_start)
+            version = file.read(4)[0]
+
+            if version == 1:
+                (timescale, duration) = struct.unpack(">16xIQ", file.read(28))
+            else:
+                (timescale, duration) = struct.unpack(">8xII", file.read(16))
+
+            return duration * 1000 // timescale if timescale else None
+
+    return None
+
+
+def _iter_mp4_boxes(
+    file: BinaryIO, start: int, end: int
+) -> Iterator[tuple[bytes, int, int]]:
+    "Yields the type, content offset and end offset of the MP4 boxes in a range."
+    offset = start
+
+    while offset + 8 <= end:
+        file.seek(offset)
+        (size, box_type) = struct.unpack(">I4s", file.read(8))
+        content_start = offset + 8
+
+        if size == 1:
+            (size,) = struct.unpack(">Q", file.read(8))
+            content_start += 8
+        elif size == 0:
+            size = end - offset
+
+        if size < content_start - offset:
+            return
+
+        yield (box_type, content_start, offset + size)
+        offset += size
@@ -0,0 +1,510 @@
+"""
+Streaming audio plumbing built on ffmpeg subprocesses.
+
+Audio is decoded once into 16-bit PCM and the PCM stream is fanned out to any
+number of consumers (encoders, counters, accumulators) in fixed-size chunks,
+so memory use stays constant regardless of the length of the recording.
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import BinaryIO, NamedTuple
+
+import numpy as np
+
+from app.config import settings
+from app.errors import AudioProcessingError
+
+FFMPEG = "ffmpeg"
+STREAM_CHUNK_SIZE = 64 * 1024
+SAMPLE_WIDTH = 2  # Bytes per sample of signed 16-bit PCM.
+PEAKS_PIXELS_PER_SECOND = 20
+
+# Recordings are also kept as 16 kHz mono FLAC, the format speech recognition
+# models work in, so transcription need not decode and resample them again.
+TRANSCRIPTION_AUDIO_FORMAT = "flac"
+TRANSCRIPTION_MEDIA_TYPE = "audio/flac"
+
+# Matches the "time=" progress stat ffmpeg reports for its output.
+_OUTPUT_TIME = re.compile(rb"time=\s*(\d+):(\d{2}):(\d{2})\.(\d+)")
+# Matches the description of the first audio stream of an input.
+_AUDIO_STREAM = re.compile(rb"Stream #\d+:\d+.*?: Audio: [^\n]*?(\d+) Hz, ([^,\n]+)")
+
+
+class PcmFormat(NamedTuple):
+    sample_rate: int
+    channels: int
+
+    @property
+    def frame_size(self) -> int:
+        "The number of bytes in one sample across all channels."
+        return self.channels * SAMPLE_WIDTH
+
+    def ffmpeg_args(self) -> list[str]:
+        return ["-f", "s16le", "-ar", str(self.sample_rate), "-ac", str(self.channels)]
+
+
+TRANSCRIPTION_PCM_FORMAT = PcmFormat(sample_rate=16000, channels=1)
+
+
+def spooled_file() -> tempfile.SpooledTemporaryFile:
+    "Returns a file that is kept in memory until it grows past the spool limit."
+    return tempfile.SpooledTemporaryFile(max_size=settings.AUDIO_SPOOL_MAX_SIZE)
+
+
+@contextmanager
+def ffmpeg_input(audio: BinaryIO) -> Iterator[str]:
+    """
+    Provides a path ffmpeg can read the given file from.
+
+    Files that are not already on disk are copied to a temporary file in chunks,
+    which lets ffmpeg seek within containers (e.g. MP4) that cannot be piped.
+    """
+    name = getattr(audio, "name", None)
+
+    if isinstance(name, str) and os.path.isfile(name):
+        yield name
+        return
+
+    audio.seek(0)
+
+    with tempfile.NamedTemporaryFile() as temp_file:
+        shutil.copyfileobj(audio, temp_file, STREAM_CHUNK_SIZE)
+        temp_file.flush()
+        audio.seek(0)
+
+        yield temp_file.name
+
+
+def encoder_args(format: str, bitrate: str) -> list[str]:
+    return ["-b:a", bitrate, "-f", format, "pipe:1"]
+
+
+def transcription_encoder_args() -> list[str]:
+    return [
+        "-ar",
+        str(TRANSCRIPTION_PCM_FORMAT.sample_rate),
+        "-ac",
+        str(TRANSCRIPTION_PCM_FORMAT.channels),
+        "-c:a",
+        "flac",
+        "-f",
+        TRANSCRIPTION_AUDIO_FORMAT,
+        "pipe:1",
+    ]
+
+
+class _DiagnosticsReader:
+    "Drains an ffmpeg stderr stream in the background, keeping only its tail."
+
+    def __init__(self, stream: BinaryIO):
+        self._stream = stream
+        self._output = bytearray()
+        self._thread = threading.Thread(target=self._drain, daemon=True)
+        self._thread.start()
+
+    def _drain(self):
+        for data in iter(lambda: self._stream.read(4096), b""):
+            self._output.extend(data)
+            # Progress stats are repeated throughout; only the tail is needed.
+            del self._output[: max(0, len(self._output) - STREAM_CHUNK_SIZE)]
+
+    def result(self) -> bytes:
+        self._thread.join()
+        self._stream.close()
+        return bytes(self._output)
+
+
+def _kill(
+    process: subprocess.Popen,
+    diagnostics: _DiagnosticsReader,
+    output_thread: threading.Thread | None = None,
+) -> None:
+    """
+    Kills an ffmpeg process and waits for it to exit, closing its pipes once
+    the thread copying its output (if any) has stopped.
+    """
+    process.kill()
+
+    if process.stdin is not None:
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+
+    if output_thread is not None:
+        output_thread.join()
+
+    process.stdout.close()
+    process.wait()
+    diagnostics.result()
+
+
+def _raise_ffmpeg_error(return_code: int, diagnostics: bytes):
+    message = diagnostics.decode(errors="replace").strip()
+    raise AudioProcessingError(
+        message.splitlines()[-1] if message else f"ffmpeg exited with {return_code}"
+    )
+
+
+def run_ffmpeg(arguments: list[str], sink: BinaryIO) -> bytes:
+    """
+    Runs ffmpeg, copying its output to the sink in fixed-size chunks
+    as it is produced. Returns the diagnostic output written to stderr.
+    """
+    process = subprocess.Popen(
+        [FFMPEG, "-hide_banner", "-nostdin", *arguments],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    diagnostics = _DiagnosticsReader(process.stderr)
+
+    try:
+        for chunk in iter(lambda: process.stdout.read(STREAM_CHUNK_SIZE), b""):
+            sink.write(chunk)
+    finally:
+        process.stdout.close()
+        return_code = process.wait()
+
+    output = diagnostics.result()
+
+    if return_code != 0:
+        _raise_ffmpeg_error(return_code, output)
+
+    return output
+
+
+def output_duration(diagnostics: bytes) -> int:
+    "Returns the duration in ms of the output reported by ffmpeg."
+    matches = _OUTPUT_TIME.findall(diagnostics)
+
+    if not any(matches):
+        raise AudioProcessingError("Unable to determine the audio duration")
+
+    hours, minutes, seconds, fraction = matches[-1]
+
+    return (
+        (int(hours) * 60 + int(minutes)) * 60 * 1000
+        + int(seconds) * 1000
+        + int(fraction.ljust(3, b"0")[:3])
+    )
+
+
+def probe_pcm_format(input_path: str) -> PcmFormat:
+    """
+    Reads the sample rate and channel count of the first audio stream
+    from the container headers, without decoding any audio.
+    Audio with more than two channels is downmixed to stereo.
+    """
+    result = subprocess.run(
+        [FFMPEG, "-hide_banner", "-nostdin", "-i", input_path],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+
+    match = _AUDIO_STREAM.search(result.stderr)
+
+    if match is None:
+        raise AudioProcessingError("No audio stream found in the file")
+
+    layout = match.group(2).strip()
+    channels = 1 if layout == b"mono" else 2
+
+    return PcmFormat(sample_rate=int(match.group(1)), channels=channels)
+
+
+class AudioConsumer(ABC):
+    "Receives the decoded PCM stream of an audio file, one chunk at a time."
+
+    def start(self, pcm_format: PcmFormat) -> None:
+        self.pcm_format = pcm_format
+
+    @abstractmethod
+    def consume(self, pcm: bytes) -> None:
+        pass
+
+    def finish(self) -> None:
+        pass
+
+    def abort(self) -> None:
+        pass
+
+
+class DurationCounter(AudioConsumer):
+    "Measures the duration of the decoded audio."
+
+    def start(self, pcm_format: PcmFormat) -> None:
+        super().start(pcm_format)
+        self._bytes = 0
+
+    def consume(self, pcm: bytes) -> None:
+        self._bytes += len(pcm)
+
+    @property
+    def duration(self) -> int:
+        "The duration of the audio in ms."
+        frames = self._bytes // self.pcm_format.frame_size
+        return frames * 1000 // self.pcm_format.sample_rate
+
+
+def extract_peaks(
+    pcm: bytes | bytearray | memoryview,
+    pcm_format: PcmFormat,
+    pixels_per_second: int = PEAKS_PIXELS_PER_SECOND,
+) -> np.ndarray:
+    """
+    Computes waveform peaks from a buffer of PCM audio as 8-bit min/max pairs
+    per pixel (matching the output of `audiowaveform --bits 8`),
+    with multi-channel audio mixed down to mono.
+    A trailing partial pixel is included.
+    """
+    channels = pcm_format.channels
+    samples = np.frombuffer(pcm, dtype="<i2", count=len(pcm) // SAMPLE_WIDTH)
+    frames = len(samples) // channels
+    samples = samples[: frames * channels].reshape(frames, channels)
+
+    if channels == 1:
+        mono = samples[:, 0]
+    else:
+        # Summing the channel columns directly is far faster than sum(axis=1).
+        mixed = samples[:, 0].astype(np.int32)
+        for channel in range(1, channels):
+            mixed += samples[:, channel]
+        mono = (mixed // channels).astype(np.int16)
+
+    samples_per_pixel = max(1, pcm_format.sample_rate // pixels_per_second)
+    pixel_count = -(-frames // samples_per_pixel)
+
+    # Pad the trailing pixel with its own first sample so it can't skew the range.
+    padding = pixel_count * samples_per_pixel - frames
+    if padding > 0:
+        mono = np.concatenate((mono, np.full(padding, mono[-samples_per_pixel + padding])))
+
+    pixels = mono.reshape(pixel_count, samples_per_pixel)
+
+    peaks = np.empty(pixel_count * 2, dtype=np.int32)
+    peaks[0::2] = pixels.min(axis=1) >> 8
+    peaks[1::2] = pixels.max(axis=1) >> 8
+
+    return peaks
+
+
+class PeakAccumulator(AudioConsumer):
+    "Computes the waveform peaks of the decoded audio (see `extract_peaks`)."
+
+    def __init__(self, pixels_per_second: int = PEAKS_PIXELS_PER_SECOND):
+        self._pixels_per_second = pixels_per_second
+
+    def start(self, pcm_format: PcmFormat) -> None:
+        super().start(pcm_format)
+        samples_per_pixel = max(1, pcm_format.sample_rate // self._pixels_per_second)
+        self._pixel_size = samples_per_pixel * pcm_format.frame_size
+        self._buffer = bytearray()
+        self._peaks: list[np.ndarray] = []
+
+    def consume(self, pcm: bytes) -> None:
+        self._buffer.extend(pcm)
+        complete = len(self._buffer) // self._pixel_size * self._pixel_size
+
+        if complete > 0:
+            self._add_pixels(self._buffer[:complete])
+            del self._buffer[:complete]
+
+    def finish(self) -> None:
+        if len(self._buffer) >= self.pcm_format.frame_size:
+            self._add_pixels(self._buffer)
+        self._buffer.clear()
+
+    def _add_pixels(self, pcm: bytearray) -> None:
+        self._peaks.append(
+            extract_peaks(bytes(pcm), self.pcm_format, self._pixels_per_second)
+        )
+
+    @property
+    def peaks(self) -> np.ndarray:
+        return np.concatenate(self._peaks) if self._peaks else np.empty(0, np.int32)
+
+
+class PcmWriter(AudioConsumer):
+    "Writes the decoded PCM stream to a file."
+
+    def __init__(self, sink: BinaryIO):
+        self._sink = sink
+
+    def consume(self, pcm: bytes) -> None:
+        self._sink.write(pcm)
+
+    def finish(self) -> None:
+        self._sink.flush()
+
+
+class ContentHasher:
+    "A writable wrapper that computes the SHA-256 hash of everything written."
+
+    def __init__(self, sink: BinaryIO):
+        self._sink = sink
+        self._hash = hashlib.sha256()
+
+    def write(self, data: bytes) -> int:
+        self._hash.update(data)
+        return self._sink.write(data)
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+
+class Encoder(AudioConsumer):
+    "Encodes the PCM stream with ffmpeg, writing the result to the sink."
+
+    def __init__(self, sink: BinaryIO, format: str, bitrate: str):
+        self._sink = sink
+        self._format = format
+        self._bitrate = bitrate
+
+    def start(self, pcm_format: PcmFormat) -> None:
+        super().start(pcm_format)
+        self._process = subprocess.Popen(
+            [
+                FFMPEG,
+                "-hide_banner",
+                *pcm_format.ffmpeg_args(),
+                "-i",
+                "pipe:0",
+                *self._output_args(),
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        self._diagnostics = _DiagnosticsReader(self._process.stderr)
+        self._output_thread = threading.Thread(target=self._copy_output, daemon=True)
+        self._output_thread.start()
+
+    def _output_args(self) -> list[str]:
+        return encoder_args(self._format, self._bitrate)
+
+    def _copy_output(self):
+        stdout = self._process.stdout
+        for chunk in iter(lambda: stdout.read(STREAM_CHUNK_SIZE), b""):
+            self._sink.write(chunk)
+
+    def consume(self, pcm: bytes) -> None:
+        try:
+            self._process.stdin.write(pcm)
+        except BrokenPipeError:
+            # The encoder exited early, surface its error.
+            self.finish()
+            raise AudioProcessingError("The audio encoder stopped unexpectedly")
+
+    def finish(self) -> None:
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+
+        self._output_thread.join()
+        self._process.stdout.close()
+        return_code = self._process.wait()
+        diagnostics = self._diagnostics.result()
+
+        if return_code != 0:
+            _raise_ffmpeg_error(return_code, diagnostics)
+
+    def abort(self) -> None:
+        _kill(self._process, self._diagnostics, self._output_thread)
+
+
+class TranscriptionEncoder(Encoder):
+    "Encodes the PCM stream as 16 kHz mono FLAC for transcription."
+
+    def __init__(self, sink: BinaryIO):
+        super().__init__(sink, TRANSCRIPTION_AUDIO_FORMAT, "")
+
+    def _output_args(self) -> list[str]:
+        return transcription_encoder_args()
+
+
+def encode_pcm(
+    pcm: np.ndarray, pcm_format: PcmFormat, sink: BinaryIO, format: str, bitrate: str
+) -> None:
+    "Encodes an array of PCM samples (frames x channels) to the sink."
+    data = memoryview(np.ascontiguousarray(pcm)).cast("B")
+    encoder = Encoder(sink, format, bitrate)
+    encoder.start(pcm_format)
+
+    try:
+        for offset in range(0, len(data), STREAM_CHUNK_SIZE):
+            encoder.consume(data[offset : offset + STREAM_CHUNK_SIZE])
+    except Exception:
+        encoder.abort()
+        raise
+
+    encoder.finish()
+
+
+def decode(
+    input_path: str, consumers: list[AudioConsumer], start: int = 0
+) -> PcmFormat:
+    """
+    Decodes the audio file once and streams the PCM to every consumer,
+    optionally starting from an offset (in ms) into the audio.
+    Returns the format of the decoded audio.
+    """
+    pcm_format = probe_pcm_format(input_path)
+    started: list[AudioConsumer] = []
+
+    process = subprocess.Popen(
+        [
+            FFMPEG,
+            "-hide_banner",
+            "-nostdin",
+            *(["-ss", f"{start / 1000:.3f}"] if start > 0 else []),
+            "-i",
+            input_path,
+            "-vn",
+            "-map",
+            "0:a:0",
+            *pcm_format.ffmpeg_args(),
+            "pipe:1",
+        ],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    diagnostics = _DiagnosticsReader(process.stderr)
+
+    try:
+        for consumer in consumers:
+            consumer.start(pcm_format)
+            started.append(consumer)
+
+        for chunk in iter(lambda: process.stdout.read(STREAM_CHUNK_SIZE), b""):
+            for consumer in consumers:
+                consumer.consume(chunk)
+
+        process.stdout.close()
+        return_code = process.wait()
+        output = diagnostics.result()
+
+        if return_code != 0:
+            _raise_ffmpeg_error(return_code, output)
+
+        for consumer in consumers:
+            consumer.finish()
+    except Exception:
+        _kill(process, diagnostics)
+        for consumer in started:
+            consumer.abort()
+        raise
+
+    return pcm_format
@@ -1,30 +1,78 @@
-import io
-import json
-import os
-import subprocess
+import logging
 import tempfile
 from collections.abc import Iterator
-from functools import reduce
-from pathlib import Path
+from dataclasses import dataclass
 from typing import BinaryIO, cast
 
-from pydub import AudioSegment
-from pydub.silence import split_on_silence
+import numpy as np
 
 from app.config import settings
 from app.errors import AudioProcessingError
-from app.logging import WebAPILogger
-from app.utility.conversion import minutes_to_ms
+from app.services.audio_headers import (
+    Mp3Stream,
+    copy_mp3_frames,
+    probe_duration,
+    scan_mp3,
+)
+from app.services.audio_pipeline import (
+    PEAKS_PIXELS_PER_SECOND,
+    ContentHasher,
+    DurationCounter,
+    Encoder,
+    TRANSCRIPTION_PCM_FORMAT,
+    PcmWriter,
+    PeakAccumulator,
+    TranscriptionEncoder,
+    decode,
+    encode_pcm,
+    encoder_args,
+    ffmpeg_input,
+    output_duration,
+    run_ffmpeg,
+    spooled_file,
+    transcription_encoder_args,
+)
+
+# Audio processing also runs in worker processes (see audio_workers),
+# so this module avoids importing the database and AI service configuration.
+log = logging.getLogger(__name__)
+
+DEFAULT_MAX_SPLIT_DURATION = 2 * 60 * 1000  # 2 minutes
+
+
+@dataclass
+class IngestedAudio:
+    audio: BinaryIO
+    duration: int
+    peaks: list[float]
+    peak_max: int
+    content_hash: str
+    transcription_audio: BinaryIO | None = None
 
-log = WebAPILogger(__name__)
 
-DEFAULT_MAX_SPLIT_DURATION = minutes_to_ms(2)
+def get_duration(audio: BinaryIO) -> int:
+    """
+    Returns the duration of the audio file in ms.
 
+    The duration is read from the file's headers where they record it,
+    and the audio is only decoded (as a stream) when they do not.
+    """
+    duration = probe_duration(audio)
 
-def get_duration(audio: BinaryIO) -> int:
-    segment = AudioSegment.from_file(audio)
-    audio.seek(0)
-    return len(segment)
+    if duration is not None:
+        return duration
+
+    duration_counter = DurationCounter()
+
+    try:
+        with ffmpeg_input(audio) as input_path:
+            decode(input_path, [duration_counter])
+    except Exception as e:
+        raise AudioProcessingError(str(e))
+    finally:
+        audio.seek(0)
+
+    return duration_counter.duration
 
 
 def reformat_audio(
@@ -33,18 +81,77 @@ def reformat_audio(
     """
     Returns a new audio file (and its duration) with the given audio file
     converted into a standard format and bitrate.
+
+    The audio is streamed through ffmpeg in chunks, so memory use does not
+    grow with the length of the recording.
+    """
+    reformatted = spooled_file()
+
+    try:
+        with ffmpeg_input(original) as input_path:
+            diagnostics = run_ffmpeg(
+                ["-i", input_path, "-vn", *encoder_args(format, bitrate)],
+                reformatted,
+            )
+
+        duration = output_duration(diagnostics)
+        reformatted.seek(0)
+
+        return (cast(BinaryIO, reformatted), duration)
+    except Exception as e:
+        reformatted.close()
+        raise AudioProcessingError(str(e))
+
+
+def ingest_audio(
+    original: BinaryIO,
+    format: str,
+    bitrate: str = settings.DEFAULT_AUDIO_BITRATE,
+    output: BinaryIO | None = None,
+    transcription_output: BinaryIO | None = None,
+) -> IngestedAudio:
+    """
+    Converts an uploaded audio file into a standard format and bitrate,
+    decoding it only once to produce the stored audio, its duration,
+    its waveform peaks and the SHA-256 hash of the stored audio.
+
+    The stored audio is written to the output file if one is given.
+    If a transcription output file is given, the 16 kHz mono FLAC audio used
+    for transcription is written to it from the same decode.
     """
-    reformatted = io.BytesIO()
+    reformatted = output if output is not None else spooled_file()
+    hasher = ContentHasher(reformatted)
+    duration_counter = DurationCounter()
+    peak_accumulator = PeakAccumulator()
+
+    consumers = [Encoder(hasher, format, bitrate), duration_counter, peak_accumulator]
+
+    if transcription_output is not None:
+        consumers.append(TranscriptionEncoder(transcription_output))
 
     try:
-        segment: AudioSegment = AudioSegment.from_file(original)
-        duration = len(segment)
+        with ffmpeg_input(original) as input_path:
+            decode(input_path, consumers)
+
+        reformatted.seek(0)
 
-        segment.export(reformatted, bitrate=bitrate, format=format)
+        if transcription_output is not None:
+            transcription_output.seek(0)
 
-        return (reformatted, duration)
+        return IngestedAudio(
+            audio=cast(BinaryIO, reformatted),
+            duration=duration_counter.duration,
+            peaks=normalize_peaks(peak_accumulator.peaks),
+            peak_max=peak_max(peak_accumulator.peaks),
+            content_hash=hasher.hexdigest(),
+            transcription_audio=transcription_output,
+        )
     except Exception as e:
         reformatted.close()
+
+        if transcription_output is not None:
+            transcription_output.close()
+
         raise AudioProcessingError(str(e))
 
 
@@ -53,76 +160,381 @@ def append_audio(
     new: BinaryIO,
     format: str,
     bitrate: str = settings.DEFAULT_AUDIO_BITRATE,
+    output: BinaryIO | None = None,
 ) -> tuple[BinaryIO, int]:
     """
     Returns a new audio file (and its duration) combining
     the two input audio files separated by 1 second silence.
+
+    MP3 recordings are extended at the frame level: only the silence and the
+    new audio are encoded, and the frames of the original are copied as-is.
+
+    The combined audio is written to the output file if one is given.
     """
-    combined = io.BytesIO()
+    combined = output if output is not None else spooled_file()
+
+    if format == "mp3":
+        original_stream = scan_mp3(original)
+
+        if original_stream is not None:
+            return _append_mp3_frames(
+                original, original_stream, new, bitrate, combined
+            )
+
+    return _append_reencoded(original, new, format, bitrate, combined)
+
+
+def _append_mp3_frames(
+    original: BinaryIO,
+    original_stream: Mp3Stream,
+    new: BinaryIO,
+    bitrate: str,
+    combined: BinaryIO,
+) -> tuple[BinaryIO, int]:
+    sample_rate = original_stream.sample_rate
+    channel_layout = "mono" if original_stream.channels == 1 else "stereo"
+
+    appended = spooled_file()
 
     try:
-        original_segment: AudioSegment = AudioSegment.from_file(original)
-        new_segment: AudioSegment = AudioSegment.from_file(new)
+        with ffmpeg_input(new) as new_path:
+            # The appended frames must match the sample rate and channel
+            # layout of the original to be played back as one stream.
+            run_ffmpeg(
+                [
+                    "-f",
+                    "lavfi",
+                    "-t",
+                    "1",
+                    "-i",
+                    f"anullsrc=r={sample_rate}:cl={channel_layout}",
+                    "-i",
+                    new_path,
+                    "-filter_complex",
+                    "[0:a][1:a]concat=n=2:v=0:a=1",
+                    "-vn",
+                    "-ar",
+                    str(sample_rate),
+                    "-ac",
+                    str(original_stream.channels),
+                    "-id3v2_version",
+                    "0",
+                    "-write_xing",
+                    "0",
+                    *encoder_args("mp3", bitrate),
+                ],
+                appended,
+            )
 
-        combined_segment = original_segment + AudioSegment.silent() + new_segment
-        duration = len(combined_segment)
+        appended_stream = scan_mp3(appended)
 
-        combined_segment.export(combined, bitrate=bitrate, format=format)
+        if appended_stream is None or (
+            appended_stream.sample_rate,
+            appended_stream.channels,
+        ) != (original_stream.sample_rate, original_stream.channels):
+            raise AudioProcessingError("Unable to encode the appended audio")
 
-        return (combined, duration)
+        copy_mp3_frames(original, original_stream, combined)
+        copy_mp3_frames(appended, appended_stream, combined)
+        combined.seek(0)
+
+        samples = original_stream.samples + appended_stream.samples
+        duration = samples * 1000 // sample_rate
+
+        return (cast(BinaryIO, combined), duration)
     except Exception as e:
         combined.close()
         raise AudioProcessingError(str(e))
+    finally:
+        appended.close()
 
 
-def compute_peaks(audio: BinaryIO) -> list[float]:
-    temp_audio_filename = Path(tempfile.gettempdir(), f"{os.urandom(24).hex()}.mp3")
-    peaks_filename = Path(tempfile.gettempdir(), f"{os.urandom(24).hex()}.json")
+def _append_reencoded(
+    original: BinaryIO,
+    new: BinaryIO,
+    format: str,
+    bitrate: str,
+    combined: BinaryIO,
+) -> tuple[BinaryIO, int]:
+    try:
+        with ffmpeg_input(original) as original_path, ffmpeg_input(
+            new
+        ) as new_path:
+            # The concat filter converts every input to the format of the first,
+            # so the combined recording keeps the original's sample rate and layout.
+            diagnostics = run_ffmpeg(
+                [
+                    "-i",
+                    original_path,
+                    "-f",
+                    "lavfi",
+                    "-t",
+                    "1",
+                    "-i",
+                    "anullsrc",
+                    "-i",
+                    new_path,
+                    "-filter_complex",
+                    "[0:a][1:a][2:a]concat=n=3:v=0:a=1",
+                    "-vn",
+                    *encoder_args(format, bitrate),
+                ],
+                combined,
+            )
+
+        duration = output_duration(diagnostics)
+        combined.seek(0)
+
+        return (cast(BinaryIO, combined), duration)
+    except Exception as e:
+        combined.close()
+        raise AudioProcessingError(str(e))
+
+
+def append_transcription_audio(
+    combined: BinaryIO,
+    transcription_audio: BinaryIO | None,
+    new: BinaryIO,
+    output: BinaryIO | None = None,
+) -> BinaryIO:
+    """
+    Returns the transcription audio (16 kHz mono FLAC) of a recording after
+    further audio has been appended, matching the 1 second silence that
+    `append_audio` places between the two.
+
+    The existing transcription audio is extended with the new audio alone;
+    without one, it is converted from the full combined recording instead.
+    """
+    if transcription_audio is None:
+        return create_transcription_audio(combined, output)
+
+    extended = output if output is not None else spooled_file()
+    sample_rate = TRANSCRIPTION_PCM_FORMAT.sample_rate
 
     try:
-        with open(temp_audio_filename, mode="wb+") as temp_audio_file:
-            temp_audio_file.write(audio.read())
-
-        subprocess.run(
-            [
-                "audiowaveform",
-                "-i",
-                temp_audio_filename,
-                "-o",
-                peaks_filename,
-                "--pixels-per-second",
-                "20",
-                "--bits",
-                "8",
-            ],
-            stdout=subprocess.DEVNULL,  # Suppress
-            stderr=subprocess.DEVNULL,  # Suppress
-        )
+        with ffmpeg_input(transcription_audio) as original_path, ffmpeg_input(
+            new
+        ) as new_path:
+            run_ffmpeg(
+                [
+                    "-i",
+                    original_path,
+                    "-f",
+                    "lavfi",
+                    "-t",
+                    "1",
+                    "-i",
+                    f"anullsrc=r={sample_rate}:cl=mono",
+                    "-i",
+                    new_path,
+                    "-filter_complex",
+                    "[0:a][1:a][2:a]concat=n=3:v=0:a=1",
+                    "-vn",
+                    *transcription_encoder_args(),
+                ],
+                extended,
+            )
+
+        extended.seek(0)
+        return cast(BinaryIO, extended)
+    except Exception as e:
+        extended.close()
+        raise AudioProcessingError(str(e))
+
+
+def create_transcription_audio(
+    audio: BinaryIO,
+    output: BinaryIO | None = None,
+    start: int = 0,
+    duration: int | None = None,
+) -> BinaryIO:
+    """
+    Returns the audio file converted to 16 kHz mono FLAC for transcription,
+    optionally starting from an offset (in ms) into the audio and limited
+    to a duration (in ms).
+    """
+    converted = output if output is not None else spooled_file()
+
+    try:
+        with ffmpeg_input(audio) as input_path:
+            run_ffmpeg(
+                [
+                    *(["-ss", f"{start / 1000:.3f}"] if start > 0 else []),
+                    *(["-t", f"{duration / 1000:.3f}"] if duration else []),
+                    "-i",
+                    input_path,
+                    "-vn",
+                    *transcription_encoder_args(),
+                ],
+                converted,
+            )
+
+        converted.seek(0)
+        return cast(BinaryIO, converted)
+    except Exception as e:
+        converted.close()
+        raise AudioProcessingError(str(e))
+
+
+def compute_raw_peaks(audio: BinaryIO, start: int = 0) -> np.ndarray:
+    """
+    Returns the un-normalized waveform peaks of the audio file,
+    optionally starting from an offset (in ms) into the audio.
+    """
+    peak_accumulator = PeakAccumulator()
 
-        with open(peaks_filename, mode="r", encoding="utf-8") as peaks_file:
-            waveform_data = peaks_file.read()
+    try:
+        with ffmpeg_input(audio) as input_path:
+            decode(input_path, [peak_accumulator], start=start)
     finally:
         audio.seek(0)
 
-        if os.path.exists(temp_audio_filename):
-            os.remove(temp_audio_filename)
+    return peak_accumulator.peaks
+
+
+def compute_peaks(audio: BinaryIO) -> list[float]:
+    "Returns the normalized waveform peaks of the audio file."
+    return normalize_peaks(compute_raw_peaks(audio))
+
 
-        if os.path.exists(peaks_filename):
-            os.remove(peaks_filename)
+def peak_max(peaks: np.ndarray | list[int]) -> int:
+    "Returns the value waveform peaks are normalized against."
+    return int(np.max(peaks)) if len(peaks) > 0 else 0
 
-    waveform_json = json.loads(waveform_data)
-    peaks: list[float] = waveform_json["data"]
 
+def normalize_peaks(
+    peaks: np.ndarray | list[int], max_val: int | None = None
+) -> list[float]:
+    "Scales waveform peaks relative to the largest peak."
     # Round to 2 decimal places for normalization.
     digits = 2
 
-    max_val = float(max(peaks))
-    normalized_peaks: list[float] = []
+    values = np.asarray(peaks, dtype=np.float64)
 
-    for x in peaks:
-        normalized_peaks.append(round(x / max_val if max_val != 0 else x, digits))
+    if max_val is None:
+        max_val = peak_max(peaks)
 
-    return normalized_peaks
+    if max_val != 0:
+        values = values / max_val
+
+    return cast(list[float], np.round(values, digits).tolist())
+
+
+def append_peaks(
+    combined: BinaryIO,
+    peaks: list[float] | None,
+    original_peak_max: int | None,
+    original_duration: int,
+) -> tuple[list[float], int]:
+    """
+    Returns the normalized waveform peaks (and their max) of combined audio,
+    given the normalized peaks of the original audio it begins with.
+
+    Only audio following the last whole pixel of the original is decoded;
+    the original peaks are rescaled only if the appended audio is louder.
+    Falls back to computing all peaks if the originals can't be reused.
+    """
+    retained_pixels = original_duration * PEAKS_PIXELS_PER_SECOND // 1000
+
+    if (
+        peaks is None
+        or original_peak_max is None
+        or len(peaks) < retained_pixels * 2
+    ):
+        raw_peaks = compute_raw_peaks(combined)
+        return (normalize_peaks(raw_peaks), peak_max(raw_peaks))
+
+    appended_peaks = compute_raw_peaks(
+        combined, start=retained_pixels * 1000 // PEAKS_PIXELS_PER_SECOND
+    )
+    combined_peak_max = max(original_peak_max, peak_max(appended_peaks))
+    retained_peaks = peaks[: retained_pixels * 2]
+
+    if combined_peak_max != original_peak_max:
+        # Peaks are left as-is when the max is 0, so undo only actual scaling.
+        raw_retained_peaks = np.asarray(retained_peaks) * (original_peak_max or 1)
+        retained_peaks = normalize_peaks(raw_retained_peaks, combined_peak_max)
+
+    return (
+        retained_peaks + normalize_peaks(appended_peaks, combined_peak_max),
+        combined_peak_max,
+    )
+
+
+def find_silence_cut_points(
+    samples: np.ndarray,
+    sample_rate: int,
+    threshold_offset: float = 16,
+    min_silence_ms: int = 500,
+    window_ms: int = 10,
+) -> np.ndarray:
+    """
+    Returns the sample offsets at the middle of each period of silence
+    of at least the minimum length, where silence is quieter than the average
+    loudness of the audio less the threshold offset (in dB).
+
+    Loudness is measured as the RMS of consecutive fixed-size windows,
+    computed block-wise so memory use does not grow with the audio length.
+    """
+    frames = len(samples)
+    window = max(1, sample_rate * window_ms // 1000)
+    window_count = frames // window
+    block_windows = max(1, (60 * 1000) // window_ms)
+
+    if window_count == 0:
+        return np.empty(0, dtype=np.int64)
+
+    flat = samples[: window_count * window].reshape(window_count, -1)
+    mean_squares = np.empty(window_count, dtype=np.float64)
+
+    for offset in range(0, window_count, block_windows):
+        block = flat[offset : offset + block_windows].astype(np.float32)
+        mean_squares[offset : offset + block_windows] = np.mean(
+            np.square(block), axis=1
+        )
+
+    if not np.any(mean_squares):
+        return np.empty(0, dtype=np.int64)
+
+    # Compare mean squares directly rather than converting each window to dBFS.
+    average_dbfs = 10 * np.log10(np.mean(mean_squares) / 32768**2)
+    threshold = (32768 * 10 ** (int(average_dbfs - threshold_offset) / 20)) ** 2
+    silent = np.concatenate(([False], mean_squares < threshold, [False]))
+
+    edges = np.flatnonzero(np.diff(silent.astype(np.int8)))
+    (starts, ends) = (edges[0::2], edges[1::2])
+    long_enough = (ends - starts) * window_ms >= min_silence_ms
+
+    return ((starts[long_enough] + ends[long_enough]) // 2) * window
+
+
+def plan_segments(
+    cut_points: np.ndarray | list[int], length: int, max_length: int
+) -> list[tuple[int, int]]:
+    """
+    Groups audio into consecutive (start, end) segments of at most the max
+    length, ending each at the last cut point that fits where possible
+    and otherwise splitting it at the max length.
+    """
+    segments: list[tuple[int, int]] = []
+    start = 0
+    last_cut = start
+
+    for cut in [*(int(c) for c in cut_points), length]:
+        if cut <= start or cut > length:
+            continue
+
+        while cut - start > max_length:
+            end = last_cut if last_cut > start else start + max_length
+            segments.append((start, end))
+            start = end
+
+        last_cut = cut
+
+    if start < length:
+        segments.append((start, length))
+
+    return segments
 
 
 def split_audio(
@@ -135,82 +547,54 @@ def split_audio(
     where each is split on a point of silence where possible
     and guaranteed to be at most the indicated max duration."""
 
-    def _cluster(
-        chunks: list[AudioSegment], max_duration_ms: int
-    ) -> Iterator[AudioSegment]:
-        """
-        Clusters audio chunks into segments with combined duration
-        less than max duration.
-        """
-
-        start, *chunks = chunks
-        cluster = [start]
-
-        for chunk in chunks:
-            if sum([len(c) for c in cluster]) + len(chunk) <= max_duration_ms:
-                cluster.append(chunk)
-            else:
-                # Convert chunks into cluster into a single audio segment and return.
-                segment = reduce(lambda x, y: x + y, cluster)
-                yield segment
-                cluster = [chunk]
-
-        segment = reduce(lambda x, y: x + y, cluster)
-        yield segment
-
-    def _hard_split(
-        audio: AudioSegment, max_duration_ms: int
-    ) -> Iterator[AudioSegment]:
-        "Splits the audio file without attempting to find points of silence for breaks"
-        for x in range(0, len(audio), max_duration_ms):
-            yield AudioSegment(audio[x : (x + max_duration_ms)])
-
     try:
-        audio: AudioSegment = AudioSegment.from_file(audio_file)
+        with tempfile.NamedTemporaryFile() as pcm_file:
+            with ffmpeg_input(audio_file) as input_path:
+                pcm_format = decode(input_path, [PcmWriter(pcm_file)])
+
+            # Map the decoded audio rather than loading it, so segments
+            # are sliced as views of the file without copying.
+            frame_count = pcm_file.seek(0, 2) // pcm_format.frame_size
+
+            if frame_count == 0:
+                raise AudioProcessingError("The audio file is empty")
+
+            samples = np.memmap(
+                pcm_file.name,
+                dtype="<i2",
+                mode="r",
+                shape=(frame_count, pcm_format.channels),
+            )
 
-        log.info(
-            f"Splitting audio into {len(audio) // max_duration_ms + 1} segments"
-            f" (length {len(audio)} ms; max length {max_duration_ms} ms)"
-        )
+            duration = frame_count * 1000 // pcm_format.sample_rate
+            max_frames = max_duration_ms * pcm_format.sample_rate // 1000
 
-        # Don't process the file further if it is already within the allowed length.
-        if len(audio) <= max_duration_ms:
-            return audio_file
-
-        avg_loudness = audio.dBFS
-        silence_threshold = int(avg_loudness - 16)
-
-        # Split as much as possible on points of silence in the audio,
-        # using relative duration as a heuristic for relative file size.
-        audio_chunks = [
-            AudioSegment(chunk)
-            for chunk in split_on_silence(
-                audio,
-                silence_thresh=silence_threshold,
-                min_silence_len=500,
-                keep_silence=True,
+            log.info(
+                f"Splitting audio into {duration // max_duration_ms + 1} segments"
+                f" (length {duration} ms; max length {max_duration_ms} ms)"
             )
-        ]
-        log.debug(
-            f"Audio split into {len(audio_chunks)} on points of slience;"
-            f" max chunk length {max(len(chunk) for chunk in audio_chunks)} ms"
-        )
 
-        if len(audio_chunks) == 0:
-            # Failed to calibrate silence to loudness.
-            audio_chunks = [audio]
+            # Don't process the file further if it is already within the allowed length.
+            if frame_count <= max_frames:
+                audio_file.seek(0)
+                yield (audio_file, format)
+                return
+
+            # Split as much as possible on points of silence in the audio,
+            # using relative duration as a heuristic for relative file size.
+            cut_points = find_silence_cut_points(samples, pcm_format.sample_rate)
+            segments = plan_segments(cut_points, frame_count, max_frames)
+
+            log.debug(
+                f"Audio split into {len(segments)} segments"
+                f" on {len(cut_points)} points of silence"
+            )
 
-        # Generate the audio segment files.
-        for segment in _cluster(audio_chunks, max_duration_ms):
-            if len(segment) <= max_duration_ms:
+            # Generate the audio segment files.
+            for start, end in segments:
                 with tempfile.TemporaryFile() as file:
-                    segment.export(file, bitrate=bitrate, format=format)
+                    encode_pcm(samples[start:end], pcm_format, file, format, bitrate)
+                    file.seek(0)
                     yield (cast(BinaryIO, file), format)
-            else:
-                # If the audio segment is still too long, hard-split it.
-                for sub_segment in _hard_split(segment, max_duration_ms):
-                    with tempfile.TemporaryFile() as file:
-                        sub_segment.export(file, bitrate=bitrate, format=format)
-                        yield (cast(BinaryIO, file), format)
     except Exception as e:
         raise AudioProcessingError(str(e))
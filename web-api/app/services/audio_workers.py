@@ -0,0 +1,464 @@
+"""
+Runs CPU-bound audio processing in a dedicated pool of worker processes,
+keeping it off the request thread pool and out of contention for the GIL.
+
+The number of jobs accepted at once (running and queued) is bounded;
+once the pool is saturated further jobs are rejected with a 503 response
+rather than tying up request threads while they wait.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections.abc import Callable
+from contextlib import nullcontext
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import Any, BinaryIO, TypeVar, cast
+
+import app.schemas as sch
+from app.config import settings
+from app.errors import AudioProcessingError, ServiceBusy
+from app.services import audio_processing
+from app.services.audio_pipeline import STREAM_CHUNK_SIZE, ffmpeg_input
+
+T = TypeVar("T")
+
+
+def _timed(function: Callable[..., T], *args: Any) -> tuple[float, float, T]:
+    "Runs the job in a worker, returning when it started and how long it took."
+    started = time.time()
+    result = function(*args)
+    return (started, time.time() - started, result)
+
+
+class AudioWorkerPool:
+    "A bounded pool of worker processes for audio processing jobs."
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor: Executor | None = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._total_wait_time = 0.0
+        self._total_run_time = 0.0
+
+    def _create_executor(self) -> Executor:
+        # Workers are spawned rather than forked, since forking a
+        # multi-threaded server process can deadlock the children.
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    def _submit(self, function: Callable[..., T], *args: Any) -> Future:
+        with self._lock:
+            if self._in_flight >= self.workers + self.queue_limit:
+                self._rejected += 1
+                raise ServiceBusy(
+                    "Audio processing is at capacity, please try again shortly"
+                )
+
+            if self._executor is None:
+                self._executor = self._create_executor()
+
+            self._in_flight += 1
+
+        submitted = time.time()
+
+        try:
+            job = self._executor.submit(_timed, function, *args)
+        except Exception:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+
+        # Resolve the returned future only once the job has been accounted for,
+        # so the metrics are up to date for anything waiting on it.
+        future: Future = Future()
+
+        def _complete(job: Future):
+            self._record(job, submitted)
+
+            if job.exception() is not None:
+                future.set_exception(cast(BaseException, job.exception()))
+            else:
+                future.set_result(job.result())
+
+        job.add_done_callback(_complete)
+        return future
+
+    def _record(self, job: Future, submitted: float):
+        with self._lock:
+            self._in_flight -= 1
+
+            if job.cancelled() or job.exception() is not None:
+                self._failed += 1
+                return
+
+            (started, run_time, _) = job.result()
+            self._completed += 1
+            self._total_wait_time += max(0.0, started - submitted)
+            self._total_run_time += run_time
+
+    def run(self, function: Callable[..., T], *args: Any) -> T:
+        """
+        Runs a job in the pool, blocking until it completes.
+        The function and its arguments must be picklable.
+        """
+        (_, _, result) = self._submit(function, *args).result()
+        return result
+
+    async def run_async(self, function: Callable[..., T], *args: Any) -> T:
+        "Runs a job in the pool without blocking the event loop."
+        (_, _, result) = await asyncio.wrap_future(self._submit(function, *args))
+        return result
+
+    def metrics(self) -> sch.AudioWorkerMetrics:
+        with self._lock:
+            return sch.AudioWorkerMetrics(
+                workers=self.workers,
+                queueLimit=self.queue_limit,
+                running=min(self._in_flight, self.workers),
+                queued=max(0, self._in_flight - self.workers),
+                completed=self._completed,
+                failed=self._failed,
+                rejected=self._rejected,
+                averageWaitTime=(
+                    self._total_wait_time / self._completed
+                    if self._completed > 0
+                    else None
+                ),
+                averageRunTime=(
+                    self._total_run_time / self._completed
+                    if self._completed > 0
+                    else None
+                ),
+            )
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+audio_worker_pool = AudioWorkerPool(
+    workers=settings.AUDIO_WORKERS, queue_limit=settings.AUDIO_QUEUE_LIMIT
+)
+
+
+# ----------------------------------
+# JOBS
+# Jobs run in the worker processes, so they exchange file paths
+# (not open files) with the server process.
+
+
+def _ingest_audio_job(
+    input_path: str,
+    output_path: str,
+    transcription_output_path: str | None,
+    format: str,
+    bitrate: str,
+) -> audio_processing.IngestedAudio:
+    with (
+        open(input_path, "rb") as original,
+        open(output_path, "wb") as output,
+        (
+            open(transcription_output_path, "wb")
+            if transcription_output_path is not None
+            else nullcontext()
+        ) as transcription_output,
+    ):
+        ingested = audio_processing.ingest_audio(
+            original, format, bitrate, output, transcription_output
+        )
+
+    ingested.audio = cast(BinaryIO, None)
+    ingested.transcription_audio = None
+    return ingested
+
+
+def _append_audio_job(
+    original_path: str, new_path: str, output_path: str, format: str, bitrate: str
+) -> int:
+    with (
+        open(original_path, "rb") as original,
+        open(new_path, "rb") as new,
+        open(output_path, "wb") as output,
+    ):
+        (_, duration) = audio_processing.append_audio(
+            original, new, format, bitrate, output
+        )
+
+    return duration
+
+
+def _append_transcription_audio_job(
+    combined_path: str,
+    transcription_audio_path: str | None,
+    new_path: str,
+    output_path: str,
+) -> None:
+    with (
+        open(combined_path, "rb") as combined,
+        (
+            open(transcription_audio_path, "rb")
+            if transcription_audio_path is not None
+            else nullcontext()
+        ) as transcription_audio,
+        open(new_path, "rb") as new,
+        open(output_path, "wb") as output,
+    ):
+        audio_processing.append_transcription_audio(
+            combined, transcription_audio, new, output
+        )
+
+
+def _create_transcription_audio_job(
+    input_path: str, output_path: str, start: int, duration: int | None = None
+) -> None:
+    with open(input_path, "rb") as audio, open(output_path, "wb") as output:
+        audio_processing.create_transcription_audio(audio, output, start, duration)
+
+
+def _append_peaks_job(
+    combined_path: str,
+    peaks: list[float] | None,
+    original_peak_max: int | None,
+    original_duration: int,
+) -> tuple[list[float], int]:
+    with open(combined_path, "rb") as combined:
+        return audio_processing.append_peaks(
+            combined, peaks, original_peak_max, original_duration
+        )
+
+
+def _compute_peaks_job(input_path: str) -> list[float]:
+    with open(input_path, "rb") as audio:
+        return audio_processing.compute_peaks(audio)
+
+
+def _split_audio_job(
+    input_path: str, output_folder: str, max_duration_ms: int, format: str, bitrate: str
+) -> list[tuple[str, str]]:
+    segments: list[tuple[str, str]] = []
+
+    with open(input_path, "rb") as audio:
+        for i, (segment, audio_format) in enumerate(
+            audio_processing.split_audio(audio, max_duration_ms, format, bitrate)
+        ):
+            segment_path = os.path.join(output_folder, f"{i:>03}.{audio_format}")
+
+            with open(segment_path, "wb") as segment_file:
+                shutil.copyfileobj(segment, segment_file, STREAM_CHUNK_SIZE)
+
+            segments.append((segment_path, audio_format))
+
+    return segments
+
+
+# ----------------------------------
+# POOLED OPERATIONS
+# These mirror the functions of audio_processing, running them in the pool.
+
+
+def _output_file() -> BinaryIO:
+    return cast(BinaryIO, tempfile.NamedTemporaryFile())
+
+
+def ingest_audio(
+    original: BinaryIO,
+    format: str,
+    bitrate: str = settings.DEFAULT_AUDIO_BITRATE,
+    transcription_audio: bool = False,
+) -> audio_processing.IngestedAudio:
+    output = _output_file()
+    transcription_output = _output_file() if transcription_audio else None
+
+    try:
+        with ffmpeg_input(original) as input_path:
+            ingested = audio_worker_pool.run(
+                _ingest_audio_job,
+                input_path,
+                output.name,
+                transcription_output.name if transcription_output else None,
+                format,
+                bitrate,
+            )
+    except Exception:
+        output.close()
+        if transcription_output is not None:
+            transcription_output.close()
+        raise
+
+    ingested.audio = output
+    ingested.transcription_audio = transcription_output
+    return ingested
+
+
+def append_audio(
+    original: BinaryIO,
+    new: BinaryIO,
+    format: str,
+    bitrate: str = settings.DEFAULT_AUDIO_BITRATE,
+) -> tuple[BinaryIO, int]:
+    output = _output_file()
+
+    try:
+        with ffmpeg_input(original) as original_path, ffmpeg_input(new) as new_path:
+            duration = audio_worker_pool.run(
+                _append_audio_job,
+                original_path,
+                new_path,
+                output.name,
+                format,
+                bitrate,
+            )
+    except Exception:
+        output.close()
+        raise
+
+    return (output, duration)
+
+
+def append_transcription_audio(
+    combined: BinaryIO, transcription_audio: BinaryIO | None, new: BinaryIO
+) -> BinaryIO:
+    output = _output_file()
+
+    try:
+        with (
+            ffmpeg_input(combined) as combined_path,
+            (
+                ffmpeg_input(transcription_audio)
+                if transcription_audio is not None
+                else nullcontext()
+            ) as transcription_audio_path,
+            ffmpeg_input(new) as new_path,
+        ):
+            audio_worker_pool.run(
+                _append_transcription_audio_job,
+                combined_path,
+                transcription_audio_path,
+                new_path,
+                output.name,
+            )
+    except Exception:
+        output.close()
+        raise
+
+    return output
+
+
+async def create_transcription_audio(audio: BinaryIO, start: int = 0) -> BinaryIO:
+    output = _output_file()
+
+    try:
+        with ffmpeg_input(audio) as input_path:
+            await audio_worker_pool.run_async(
+                _create_transcription_audio_job, input_path, output.name, start
+            )
+    except ServiceBusy:
+        output.close()
+        raise
+    except Exception as e:
+        output.close()
+        raise AudioProcessingError(str(e))
+
+    return output
+
+
+async def create_transcription_segments(
+    audio: BinaryIO, bounds: list[tuple[int, int | None]]
+) -> list[BinaryIO]:
+    """
+    Returns open files (to be closed by the caller) of each (start, end) range
+    of the audio, in ms, as transcription audio, where an end of None runs to
+    the end of the audio. The ranges are encoded concurrently in the pool,
+    each directly from the one input file.
+    """
+    outputs = [_output_file() for _ in bounds]
+
+    with ffmpeg_input(audio) as input_path:
+        # Every job is waited for, so none writes to an output once closed.
+        results = await asyncio.gather(
+            *(
+                audio_worker_pool.run_async(
+                    _create_transcription_audio_job,
+                    input_path,
+                    output.name,
+                    start,
+                    end - start if end is not None else None,
+                )
+                for (output, (start, end)) in zip(outputs, bounds)
+            ),
+            return_exceptions=True,
+        )
+
+    errors = [r for r in results if isinstance(r, BaseException)]
+
+    if errors:
+        for output in outputs:
+            output.close()
+        if isinstance(errors[0], ServiceBusy):
+            raise errors[0]
+        raise AudioProcessingError(str(errors[0]))
+
+    return outputs
+
+
+def append_peaks(
+    combined: BinaryIO,
+    peaks: list[float] | None,
+    original_peak_max: int | None,
+    original_duration: int,
+) -> tuple[list[float], int]:
+    with ffmpeg_input(combined) as combined_path:
+        return audio_worker_pool.run(
+            _append_peaks_job,
+            combined_path,
+            peaks,
+            original_peak_max,
+            original_duration,
+        )
+
+
+def compute_peaks(audio: BinaryIO) -> list[float]:
+    with ffmpeg_input(audio) as input_path:
+        return audio_worker_pool.run(_compute_peaks_job, input_path)
+
+
+async def split_audio(
+    audio: BinaryIO,
+    max_duration_ms: int = audio_processing.DEFAULT_MAX_SPLIT_DURATION,
+    format: str = settings.DEFAULT_AUDIO_FORMAT,
+    bitrate: str = settings.DEFAULT_AUDIO_BITRATE,
+) -> list[tuple[BinaryIO, str]]:
+    """
+    Returns open files (to be closed by the caller) for sequential segments
+    of the audio file. See `audio_processing.split_audio`.
+    """
+    with ffmpeg_input(audio) as input_path, tempfile.TemporaryDirectory() as folder:
+        try:
+            segments = await audio_worker_pool.run_async(
+                _split_audio_job, input_path, folder, max_duration_ms, format, bitrate
+            )
+        except ServiceBusy:
+            raise
+        except Exception as e:
+            raise AudioProcessingError(str(e))
+
+        # The files remain readable after the folder is removed.
+        return [
+            (cast(BinaryIO, open(path, "rb")), audio_format)
+            for (path, audio_format) in segments
+        ]
@@ -209,8 +209,11 @@ class AuroraPostgresProvider(DatabaseProvider):
                 file_size INTEGER,
                 duration INTEGER NOT NULL,
                 waveform_peaks TEXT,
+                waveform_peak_max INTEGER,
                 segments TEXT,
-                transcript TEXT
+                transcript TEXT,
+                segment_transcripts TEXT,
+                audio_hash CHAR(64)
             )
         """))
         
@@ -292,11 +295,53 @@ class AuroraPostgresProvider(DatabaseProvider):
                 started TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
                 time INTEGER NOT NULL,
                 service VARCHAR(50) NOT NULL,
+                cached BOOLEAN,
                 error_id CHAR(36),
                 session_id CHAR(36)
             )
         """))
         
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS transcription_jobs (
+                id VARCHAR(12) PRIMARY KEY,
+                username VARCHAR(255) NOT NULL,
+                recording_id VARCHAR(12) NOT NULL,
+                status VARCHAR(20) NOT NULL,
+                segments_completed INTEGER NOT NULL DEFAULT 0,
+                segments_total INTEGER,
+                transcript TEXT,
+                error_id CHAR(36),
+                error_message TEXT,
+                created TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                modified TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                session_id CHAR(36)
+            )
+        """))
+        
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS transcript_cache (
+                audio_hash CHAR(64) NOT NULL,
+                service VARCHAR(50) NOT NULL,
+                model VARCHAR(100) NOT NULL,
+                transcript TEXT NOT NULL,
+                created TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (audio_hash, service, model)
+            )
+        """))
+        
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS generation_cache (
+                key CHAR(64) PRIMARY KEY,
+                service VARCHAR(50) NOT NULL,
+                model VARCHAR(100) NOT NULL,
+                text TEXT NOT NULL,
+                completion_tokens INTEGER NOT NULL,
+                prompt_tokens INTEGER NOT NULL,
+                created TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                last_used TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+        
         conn.execute(text("""
             CREATE TABLE IF NOT EXISTS generation_log (
                 task_id CHAR(36) PRIMARY KEY,
@@ -308,6 +353,8 @@ class AuroraPostgresProvider(DatabaseProvider):
                 model VARCHAR(50) NOT NULL,
                 completion_tokens INTEGER NOT NULL,
                 prompt_tokens INTEGER NOT NULL,
+                cached BOOLEAN,
+                cache_key CHAR(64),
                 error_id CHAR(36),
                 session_id CHAR(36)
             )
@@ -1,19 +1,60 @@
 # app/services/bedrock.py
+import asyncio
 import json
-from collections.abc import Iterator
+from collections.abc import Iterable
 from datetime import datetime
 from typing import Any, Dict, List, cast
 
 import boto3
+from botocore.config import Config
 from botocore.exceptions import BotoCoreError, ClientError
 
+from app.config import settings
 from app.errors import ExternalServiceError
 from app.schemas import GenerationOutput, LanguageModel
 from app.services.adapters import GenerativeAIService
+from app.services.streaming import GenerationStream, complete_stream
 from app.utility.timing import ExecutionTimer
 
 CONTENT_TYPE = "application/json"
 ACCEPT = "application/json"
+CODE_FENCE = "```"
+
+
+class _FenceStripper:
+    """
+    Strips a leading and a trailing code fence from text streamed in chunks,
+    holding back only the text that may yet turn out to be part of one.
+    """
+
+    def __init__(self) -> None:
+        self._pending = ""
+        self._started = False
+
+    def feed(self, chunk: str) -> str:
+        "Returns the text of the chunks so far that is certain to be kept."
+        self._pending += chunk
+
+        if not self._started:
+            if CODE_FENCE.startswith(self._pending):
+                return ""
+
+            self._pending = self._pending.removeprefix(CODE_FENCE)
+            self._started = True
+
+        # Hold back what may be the start of a closing fence.
+        (text, self._pending) = (
+            self._pending[: -len(CODE_FENCE)],
+            self._pending[-len(CODE_FENCE) :],
+        )
+        return text
+
+    def finish(self) -> str:
+        "Returns the rest of the text, once the stream has ended."
+        if not self._started:
+            self._pending = self._pending.removeprefix(CODE_FENCE)
+
+        return self._pending.removesuffix(CODE_FENCE)
 
 
 class BedrockGenerativeAIService(GenerativeAIService):
@@ -22,6 +63,9 @@ class BedrockGenerativeAIService(GenerativeAIService):
             self.runtime = boto3.client(
                 "bedrock-runtime",
                 region_name=region_name or "us-west-2",
+                config=Config(
+                    max_pool_connections=settings.GENERATION_MAX_CONNECTIONS
+                ),
             )
         except (BotoCoreError, ClientError) as e:
             raise ExternalServiceError("AWS Bedrock", str(e))
@@ -76,7 +120,7 @@ class BedrockGenerativeAIService(GenerativeAIService):
             raise ExternalServiceError(self.service_name, str(e))
 
         return GenerationOutput(
-            text=answer.removeprefix("```").removesuffix("```"),
+            text=answer.removeprefix(CODE_FENCE).removesuffix(CODE_FENCE),
             generatedAt=cast(datetime, timer.started_at),
             service=self.service_name,
             model=model,
@@ -85,28 +129,45 @@ class BedrockGenerativeAIService(GenerativeAIService):
             timeToGenerate=cast(int, timer.elapsed_ms),
         )
 
-    def _stream_complete(
+    async def stream(
         self,
         model: str,
-        messages: str | List[Dict[str, str]],
+        messages: List[Dict[str, str]],
         temperature: int = 0,
-    ) -> GenerationOutput:
+    ) -> GenerationStream:
+        text = ""
+        # Streamed text matches the final text, which has any fences stripped.
+        fence_stripper = _FenceStripper()
+
         try:
             with ExecutionTimer() as timer:
-                body = self._format_messages(model, messages, temperature)
+                body = self._format_messages(
+                    model, self._conversation(messages), temperature
+                )
 
-                stream = self.runtime.invoke_model_with_response_stream(
+                # boto3 blocks, so its calls (and each read of the event
+                # stream) are made in a worker thread.
+                stream = await asyncio.to_thread(
+                    self.runtime.invoke_model_with_response_stream,
                     modelId=model,
                     contentType=CONTENT_TYPE,
                     accept=ACCEPT,
                     body=json.dumps(body),
                 )
 
-                text = ""
-                for event in cast(Iterator[Dict[str, Any]], stream["body"]):
-                    text += self._extract_chunk(
+                events = iter(cast(Iterable[Dict[str, Any]], stream["body"]))
+                while event := await asyncio.to_thread(next, events, None):
+                    chunk = self._extract_chunk(
                         model, json.loads(event["chunk"]["bytes"])
                     )
+                    if chunk:
+                        text += chunk
+                        if kept := fence_stripper.feed(chunk):
+                            yield kept
+
+                if rest := fence_stripper.finish():
+                    yield rest
+
                 prompt_tokens, completion_tokens = self._count_tokens(
                     None, None, None, text
                 )
@@ -114,8 +175,8 @@ class BedrockGenerativeAIService(GenerativeAIService):
         except Exception as e:
             raise ExternalServiceError(self.service_name, str(e))
 
-        return GenerationOutput(
-            text=text.removeprefix("```").removesuffix("```"),
+        yield GenerationOutput(
+            text=text.removeprefix(CODE_FENCE).removesuffix(CODE_FENCE),
             generatedAt=cast(datetime, timer.started_at),
             service=self.service_name,
             model=model,
@@ -124,12 +185,17 @@ class BedrockGenerativeAIService(GenerativeAIService):
             timeToGenerate=cast(int, timer.elapsed_ms),
         )
 
-    def complete(
+    async def complete(
         self,
         model: str,
         messages: List[Dict[str, str]],
         temperature: int = 0,
     ) -> GenerationOutput:
+        return await complete_stream(self.stream(model, messages, temperature))
+
+    @staticmethod
+    def _conversation(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        "Combines the messages into one system and one user message."
         system_message = "\n\n".join(
             m["content"] for m in messages if m["role"] == "system"
         )
@@ -137,13 +203,11 @@ class BedrockGenerativeAIService(GenerativeAIService):
             m["content"] for m in messages if m["role"] == "user"
         )
 
-        conv_messages = [
+        return [
             {"role": "system", "content": system_message},
             {"role": "user", "content": user_message},
         ]
 
-        return self._stream_complete(model, conv_messages, temperature)
-
     def _format_messages(
         self,
         model: str,
@@ -0,0 +1,176 @@
+"""
+Routing of generation requests across the replicas of a self-hosted service.
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from typing import Generic, TypeVar
+
+import httpx
+
+from app.config import settings
+from app.errors import ExternalServiceInterruption, ExternalServiceTimeout
+from app.services.streaming import GenerationStream
+
+logger = logging.getLogger(__name__)
+
+Client = TypeVar("Client")
+
+# Errors meaning the replica is failing, rather than the request itself.
+REPLICA_FAILURES = (ExternalServiceInterruption, ExternalServiceTimeout)
+
+HEALTH_CHECK_TIMEOUT = 5  # Seconds
+MAX_EJECTION_FACTOR = 8  # Consecutive failures double ejections, up to this
+
+
+def endpoint_urls(value: str | list[str]) -> list[str]:
+    "Lists the URLs in a comma separated setting, without trailing slashes."
+    urls = value.split(",") if isinstance(value, str) else value
+
+    return [url.strip().rstrip("/") for url in urls if url.strip()]
+
+
+class Replica(Generic[Client]):
+    "One replica of a service, with the client used to reach it."
+
+    def __init__(self, url: str, client: Client):
+        self.url = url
+        self.client = client
+        self.outstanding = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+
+    @property
+    def ejected(self) -> bool:
+        return time.monotonic() < self.ejected_until
+
+    def eject(self, reason: str) -> None:
+        self.failures += 1
+        duration = settings.GENERATION_EJECTION_TIME * min(
+            2 ** (self.failures - 1), MAX_EJECTION_FACTOR
+        )
+        self.ejected_until = time.monotonic() + duration
+
+        logger.warning(f"Ejected {self.url} for {duration:.0f}s: {reason}")
+
+    def restore(self) -> None:
+        if self.failures > 0:
+            logger.info(f"Restored {self.url}")
+
+        self.failures = 0
+        self.ejected_until = 0.0
+
+
+class BackendPool(Generic[Client]):
+    """
+    Routes requests across the replicas of a service, each to the replica
+    with the fewest requests outstanding from this API (taking turns when
+    tied), so throughput grows with the replicas added.
+
+    Replicas failing a request with an interruption or timeout are ejected
+    from the pool for a time, doubled for each consecutive failure. With
+    more than one replica, their health is also checked in the background:
+    failing replicas are ejected, and recovered ones restored. Should every
+    replica be ejected, the one due back soonest is still tried.
+    """
+
+    def __init__(
+        self,
+        urls: list[str],
+        create_client: Callable[[str], Client],
+        health_path: str,
+        close_client: Callable[[Client], Awaitable[None]] = (
+            lambda client: client.aclose()
+        ),
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        if not urls:
+            raise ValueError("A backend pool needs at least one replica")
+
+        self.replicas = [Replica(url, create_client(url)) for url in urls]
+        self.health_path = health_path
+
+        self._close_client = close_client
+        self._transport = transport
+        self._turns = itertools.count()
+        self._health_checks: asyncio.Task | None = None
+
+    @asynccontextmanager
+    async def use(self) -> AsyncIterator[Client]:
+        "Provides the client for the replica a request is routed to."
+        self._start_health_checks()
+
+        replica = self._select()
+        replica.outstanding += 1
+
+        try:
+            yield replica.client
+        except REPLICA_FAILURES as e:
+            replica.eject(str(e))
+            raise
+        else:
+            replica.restore()
+        finally:
+            replica.outstanding -= 1
+
+    async def stream(
+        self, start: Callable[[Client], GenerationStream]
+    ) -> GenerationStream:
+        "Streams from the replica routed to, holding it until finished."
+        async with self.use() as client:
+            async for item in start(client):
+                yield item
+
+    async def aclose(self) -> None:
+        if self._health_checks is not None:
+            self._health_checks.cancel()
+
+        for replica in self.replicas:
+            await self._close_client(replica.client)
+
+    def _select(self) -> Replica[Client]:
+        available = [r for r in self.replicas if not r.ejected]
+
+        if not available:
+            return min(self.replicas, key=lambda r: r.ejected_until)
+
+        # Start from a different replica each turn, to alternate on ties.
+        turn = next(self._turns) % len(available)
+        rotated = available[turn:] + available[:turn]
+
+        return min(rotated, key=lambda r: r.outstanding)
+
+    def _start_health_checks(self) -> None:
+        # Health checks are only worth making with replicas to route around,
+        # and need the event loop, so start with the first request.
+        if self._health_checks is None and len(self.replicas) > 1:
+            self._health_checks = asyncio.create_task(self._check_health())
+
+    async def _check_health(self) -> None:
+        async with httpx.AsyncClient(
+            timeout=HEALTH_CHECK_TIMEOUT, transport=self._transport
+        ) as http:
+            while True:
+                await asyncio.gather(*(self._probe(http, r) for r in self.replicas))
+                await asyncio.sleep(settings.GENERATION_HEALTH_CHECK_INTERVAL)
+
+    async def _probe(self, http: httpx.AsyncClient, replica: Replica) -> None:
+        try:
+            response = await http.get(f"{replica.url}{self.health_path}")
+            healthy = response.is_success
+            reason = f"Health check returned {response.status_code}"
+        except httpx.HTTPError as e:
+            healthy = False
+            reason = f"Health check failed: {e!r}"
+
+        if replica.ejected:
+            return
+
+        if healthy:
+            replica.restore()
+        else:
+            replica.eject(reason)
@@ -0,0 +1,217 @@
+"""
+Audio handling for live transcription, while a recording is in progress.
+
+Encoded audio arrives in chunks (as produced by a browser's MediaRecorder),
+is decoded as it arrives to 16 kHz mono PCM, and is grouped into windows
+of speech that end at natural pauses so each can be transcribed on its own.
+"""
+
+import asyncio
+import io
+import wave
+from collections.abc import AsyncIterator
+from typing import BinaryIO
+
+import numpy as np
+
+from app.errors import AudioProcessingError
+from app.services.audio_pipeline import (
+    FFMPEG,
+    SAMPLE_WIDTH,
+    STREAM_CHUNK_SIZE,
+    TRANSCRIPTION_PCM_FORMAT,
+    PcmFormat,
+)
+
+FRAME_MS = 30  # Length of the frames speech is detected in
+MIN_WINDOW_MS = 4000
+MAX_WINDOW_MS = 30000
+MIN_PAUSE_MS = 500
+
+
+class StreamDecoder:
+    """
+    Decodes a stream of encoded audio to PCM with ffmpeg as it arrives.
+    Input is written while the PCM is read concurrently.
+    """
+
+    def __init__(self, pcm_format: PcmFormat = TRANSCRIPTION_PCM_FORMAT):
+        self.pcm_format = pcm_format
+        self._process: asyncio.subprocess.Process | None = None
+        self._diagnostics: asyncio.Task[bytes] | None = None
+
+    async def start(self) -> None:
+        self._process = await asyncio.create_subprocess_exec(
+            FFMPEG,
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-i",
+            "pipe:0",
+            "-vn",
+            *self.pcm_format.ffmpeg_args(),
+            "pipe:1",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        self._diagnostics = asyncio.create_task(self._process.stderr.read())
+
+    async def write(self, chunk: bytes) -> None:
+        assert self._process is not None
+        self._process.stdin.write(chunk)
+        await self._process.stdin.drain()
+
+    def end_input(self) -> None:
+        assert self._process is not None
+        self._process.stdin.close()
+
+    async def read(self) -> AsyncIterator[bytes]:
+        "Yields the PCM as it is decoded, until the input ends."
+        assert self._process is not None
+        while chunk := await self._process.stdout.read(STREAM_CHUNK_SIZE):
+            yield chunk
+
+        return_code = await self._process.wait()
+        diagnostics = await self._diagnostics
+
+        if return_code != 0:
+            message = diagnostics.decode(errors="replace").strip()
+            raise AudioProcessingError(
+                message.splitlines()[-1]
+                if message
+                else f"ffmpeg exited with {return_code}"
+            )
+
+    def kill(self) -> None:
+        if self._process is not None and self._process.returncode is None:
+            self._process.kill()
+
+
+class SpeechWindower:
+    """
+    Groups streamed mono PCM into windows of speech for transcription.
+
+    A window ends in the middle of the first pause of at least the minimum
+    length once it is at least the minimum window length, or at its longest
+    pause on reaching the maximum. Pauses are quieter than the average
+    loudness of the stream so far less the threshold offset (in dB), and
+    windows without any speech are dropped.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = TRANSCRIPTION_PCM_FORMAT.sample_rate,
+        min_window_ms: int = MIN_WINDOW_MS,
+        max_window_ms: int = MAX_WINDOW_MS,
+        min_pause_ms: int = MIN_PAUSE_MS,
+        threshold_offset: float = 16,
+    ):
+        self._frame_length = sample_rate * FRAME_MS // 1000
+        self._min_frames = min_window_ms // FRAME_MS
+        self._max_frames = max_window_ms // FRAME_MS
+        self._min_pause_frames = max(1, min_pause_ms // FRAME_MS)
+        self._threshold_ratio = 10 ** (-threshold_offset / 10)
+
+        self._pending = bytearray()
+        self._frames: list[np.ndarray] = []
+        self._loudness: list[float] = []
+        self._total_loudness = 0.0
+        self._total_frames = 0
+
+    def add(self, pcm: bytes) -> list[np.ndarray]:
+        "Adds PCM to the stream, returning any windows of speech completed."
+        self._pending.extend(pcm)
+        frame_size = self._frame_length * SAMPLE_WIDTH
+        usable = len(self._pending) // frame_size * frame_size
+
+        frames = np.frombuffer(bytes(self._pending[:usable]), dtype=np.int16)
+        del self._pending[:usable]
+
+        windows: list[np.ndarray] = []
+
+        for frame in frames.reshape(-1, self._frame_length):
+            # Loudness is compared as mean squares, rather than in dB.
+            loudness = float(np.mean(np.square(frame.astype(np.float32))))
+            self._frames.append(frame)
+            self._loudness.append(loudness)
+            self._total_loudness += loudness
+            self._total_frames += 1
+
+            window = self._next_window()
+            if window is not None:
+                windows.append(window)
+
+        return windows
+
+    def flush(self) -> np.ndarray | None:
+        "Returns the remainder of the stream, if it contains any speech."
+        remainder = np.frombuffer(bytes(self._pending), dtype=np.int16)
+        self._pending.clear()
+
+        window = self._take(len(self._frames))
+
+        if window is None or not len(remainder):
+            return window
+
+        return np.concatenate([window, remainder])
+
+    def _is_pause(self, loudness: float) -> bool:
+        average = self._total_loudness / max(1, self._total_frames)
+        return loudness <= average * self._threshold_ratio
+
+    def _next_window(self) -> np.ndarray | None:
+        frame_count = len(self._frames)
+
+        if frame_count < self._min_frames:
+            return None
+
+        trailing_pause = 0
+        for loudness in reversed(self._loudness):
+            if not self._is_pause(loudness):
+                break
+            trailing_pause += 1
+
+        if trailing_pause >= self._min_pause_frames:
+            return self._take(frame_count - trailing_pause // 2)
+
+        if frame_count >= self._max_frames:
+            return self._take(self._longest_pause_middle() or frame_count)
+
+        return None
+
+    def _longest_pause_middle(self) -> int | None:
+        (longest, middle, run) = (0, None, 0)
+
+        for index, loudness in enumerate(self._loudness):
+            run = run + 1 if self._is_pause(loudness) else 0
+            if run > longest:
+                (longest, middle) = (run, index + 1 - run // 2)
+
+        return middle
+
+    def _take(self, frame_count: int) -> np.ndarray | None:
+        "Removes the first frames as a window, or None if it has no speech."
+        frames = self._frames[:frame_count]
+        has_speech = not all(map(self._is_pause, self._loudness[:frame_count]))
+
+        del self._frames[:frame_count]
+        del self._loudness[:frame_count]
+
+        return np.concatenate(frames) if frames and has_speech else None
+
+
+def pcm_to_wav(
+    samples: np.ndarray, pcm_format: PcmFormat = TRANSCRIPTION_PCM_FORMAT
+) -> BinaryIO:
+    "Returns a WAV file of the 16-bit PCM samples."
+    file = io.BytesIO()
+
+    with wave.open(file, "wb") as wav:
+        wav.setnchannels(pcm_format.channels)
+        wav.setsampwidth(SAMPLE_WIDTH)
+        wav.setframerate(pcm_format.sample_rate)
+        wav.writeframes(np.ascontiguousarray(samples, dtype=np.int16).tobytes())
+
+    file.seek(0)
+    return file
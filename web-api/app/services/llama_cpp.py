@@ -14,13 +14,24 @@
 
 from datetime import datetime
 from typing import List, Dict, cast
+import httpx
 import requests
 import json
 import logging
 
-from app.errors import ExternalServiceError
+from app.errors import (
+    ExternalServiceError,
+    ExternalServiceInterruption,
+    ExternalServiceTimeout,
+)
 from app.schemas import GenerationOutput, LanguageModel
 from app.services.adapters import GenerativeAIService
+from app.services.backend_pool import BackendPool, endpoint_urls
+from app.services.streaming import (
+    GenerationStream,
+    pooled_http_client,
+    stream_chat_completions_api,
+)
 from app.utility.timing import ExecutionTimer
 from app.config import settings
 
@@ -38,30 +49,45 @@ class LlamaCppGenerativeAIService(GenerativeAIService):
         llama-server -m model.gguf -ngl 99 -c 4096 --host 0.0.0.0 --port 8080
     """
 
-    def __init__(self, api_url: str = None):
-        self.api_url = api_url or getattr(settings, 'LLAMA_CPP_SERVER_URL', 'http://localhost:8080')
+    def __init__(self, api_url: str | list[str] | None = None):
+        self.api_urls = endpoint_urls(
+            api_url or getattr(settings, 'LLAMA_CPP_SERVER_URL', 'http://localhost:8080')
+        )
+        self.api_url = self.api_urls[0] if self.api_urls else None
 
         if not self.api_url:
             logger.warning("LlamaCpp API URL not configured")
             self._available_models = []
             return
 
-        logger.info(f"LlamaCpp service initialized with API URL: {self.api_url}")
-        try:
-            self._available_models = self._get_available_models()
-            logger.info(f"Successfully connected to llama-server. Available models: {[m['id'] for m in self._available_models]}")
-        except Exception as e:
-            logger.error(f"Failed to connect to llama-server: {str(e)}")
-            self._available_models = []
+        self._backends = BackendPool(
+            self.api_urls,
+            # 5 minutes for large models
+            lambda url: pooled_http_client(url, timeout=300),
+            health_path="/health",
+        )
+
+        logger.info(f"LlamaCpp service initialized with API URLs: {self.api_urls}")
+
+        # Replicas serve the same models, so list those of the first to answer.
+        self._available_models = []
+        for url in self.api_urls:
+            try:
+                self._available_models = self._get_available_models(url)
+                if self._available_models:
+                    logger.info(f"Successfully connected to llama-server. Available models: {[m['id'] for m in self._available_models]}")
+                    break
+            except Exception as e:
+                logger.error(f"Failed to connect to llama-server at {url}: {str(e)}")
 
     def _get_headers(self) -> Dict[str, str]:
         return {"Content-Type": "application/json"}
 
-    def _get_available_models(self) -> List[Dict]:
+    def _get_available_models(self, api_url: str) -> List[Dict]:
         try:
-            logger.info(f"Fetching available models from {self.api_url}/v1/models")
+            logger.info(f"Fetching available models from {api_url}/v1/models")
             response = requests.get(
-                f"{self.api_url}/v1/models",
+                f"{api_url}/v1/models",
                 headers=self._get_headers(),
                 timeout=10
             )
@@ -74,7 +100,7 @@ class LlamaCppGenerativeAIService(GenerativeAIService):
                 logger.error(error_msg)
                 return []
         except requests.exceptions.ConnectionError as e:
-            error_msg = f"Could not connect to llama-server at {self.api_url}. Is the server running?"
+            error_msg = f"Could not connect to llama-server at {api_url}. Is the server running?"
             logger.error(error_msg)
             return []
         except Exception as e:
@@ -93,7 +119,7 @@ class LlamaCppGenerativeAIService(GenerativeAIService):
             for model in self._available_models
         ]
 
-    def complete(
+    async def complete(
         self,
         model: str,
         messages: List[Dict[str, str]],
@@ -106,6 +132,16 @@ class LlamaCppGenerativeAIService(GenerativeAIService):
                 "Start llama-server first with: llama-server -m model.gguf -ngl 99 --port 8080"
             )
 
+        async with self._backends.use() as client:
+            return await self._complete(client, model, messages, temperature)
+
+    async def _complete(
+        self,
+        client: httpx.AsyncClient,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: int,
+    ) -> GenerationOutput:
         try:
             with ExecutionTimer() as timer:
                 # Find the requested model or use the first available
@@ -127,15 +163,12 @@ class LlamaCppGenerativeAIService(GenerativeAIService):
                     "max_tokens": 4096
                 }
 
-                logger.info(f"Sending request to {self.api_url}/v1/chat/completions")
+                logger.info(f"Sending request to {client.base_url.join('/v1/chat/completions')}")
                 logger.debug(f"Request data: {json.dumps(data, indent=2)}")
 
                 try:
-                    response = requests.post(
-                        f"{self.api_url}/v1/chat/completions",
-                        headers=self._get_headers(),
-                        json=data,
-                        timeout=300  # 5 minutes for large models
+                    response = await client.post(
+                        "/v1/chat/completions", json=data
                     )
 
                     if response.status_code == 200:
@@ -155,16 +188,18 @@ class LlamaCppGenerativeAIService(GenerativeAIService):
                     else:
                         error_msg = f"llama-server API error: {response.status_code} - {response.text}"
                         logger.error(error_msg)
+                        if response.status_code >= 500:
+                            raise ExternalServiceInterruption(self.service_name, error_msg)
                         raise ExternalServiceError(self.service_name, error_msg)
 
-                except requests.exceptions.ConnectionError as e:
-                    error_msg = f"Could not connect to llama-server at {self.api_url}. Is the server running?"
+                except httpx.ConnectError as e:
+                    error_msg = f"Could not connect to llama-server at {client.base_url}. Is the server running?"
                     logger.error(error_msg)
-                    raise ExternalServiceError(self.service_name, error_msg)
-                except requests.exceptions.Timeout as e:
+                    raise ExternalServiceInterruption(self.service_name, error_msg)
+                except httpx.TimeoutException as e:
                     error_msg = f"Request to llama-server timed out after 300 seconds"
                     logger.error(error_msg)
-                    raise ExternalServiceError(self.service_name, error_msg)
+                    raise ExternalServiceTimeout(self.service_name, error_msg)
 
         except ExternalServiceError:
             raise
@@ -181,3 +216,40 @@ class LlamaCppGenerativeAIService(GenerativeAIService):
             promptTokens=prompt_tokens,
             timeToGenerate=cast(int, timer.elapsed_ms),
         )
+
+    def stream(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: int = 0,
+    ) -> GenerationStream:
+        if not self._available_models:
+            raise ExternalServiceError(
+                self.service_name,
+                f"llama-server at {self.api_url} is not available or has no models loaded. "
+                "Start llama-server first with: llama-server -m model.gguf -ngl 99 --port 8080"
+            )
+
+        # Use the requested model or the first available
+        available_model = next(
+            (m for m in self._available_models if m['id'] == model),
+            self._available_models[0]
+        )
+
+        data = {
+            "model": available_model['id'],
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": 4096
+        }
+
+        logger.info("Streaming request to llama-server /v1/chat/completions")
+        return self._backends.stream(
+            lambda client: stream_chat_completions_api(
+                client, self.service_name, data
+            )
+        )
+
+    async def aclose(self) -> None:
+        if self.api_url:
+            await self._backends.aclose()
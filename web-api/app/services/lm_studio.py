@@ -5,7 +5,8 @@ import requests
 import logging
 
 import aiohttp
-from openai import AsyncOpenAI, NotGiven, OpenAI
+import openai
+from openai import AsyncOpenAI, NotGiven
 from openai.types.chat import ChatCompletionMessageParam
 
 from app.errors import (
@@ -15,29 +16,53 @@ from app.errors import (
 )
 from app.schemas import GenerationOutput, LanguageModel
 from app.services.adapters import GenerativeAIService
+from app.services.backend_pool import BackendPool, endpoint_urls
+from app.services.streaming import (
+    GenerationStream,
+    pooled_http_client,
+    stream_openai_chat,
+)
 from app.utility.timing import ExecutionTimer
 
 logger = logging.getLogger(__name__)
 
 class LMStudioGenerativeAIService(GenerativeAIService):
-    def __init__(self, service_url: str = "http://localhost:1234"):
-        self._service_url = service_url
+    def __init__(self, service_url: str | list[str] = "http://localhost:1234"):
+        self._service_urls = endpoint_urls(service_url)
+        self._service_url = self._service_urls[0]
         self._available_models = []
-        try:
-            self._available_models = self._get_available_models()
-            if not self._available_models:
-                logger.warning(f"LM Studio server at {service_url} is not responding or has no models available")
-        except Exception as e:
-            logger.warning(f"Could not connect to LM Studio server at {service_url}: {str(e)}")
+
+        # Replicas serve the same models, so list those of the first to answer.
+        for url in self._service_urls:
+            try:
+                self._available_models = self._get_available_models(url)
+                if self._available_models:
+                    break
+                logger.warning(f"LM Studio server at {url} is not responding or has no models available")
+            except Exception as e:
+                logger.warning(f"Could not connect to LM Studio server at {url}: {str(e)}")
+
+        self._backends = BackendPool(
+            self._service_urls,
+            lambda url: AsyncOpenAI(
+                base_url=f"{url}/v1",
+                api_key="lm-studio",
+                timeout=120,  # Increased timeout to 2 minutes
+                max_retries=0,
+                http_client=pooled_http_client(),
+            ),
+            health_path="/v1/models",
+            close_client=lambda client: client.close(),
+        )
 
     @property
     def service_name(self):
         return "LM Studio"
 
-    def _get_available_models(self) -> List[Dict]:
+    def _get_available_models(self, service_url: str) -> List[Dict]:
         """Fetch available models from LM Studio API."""
         try:
-            response = requests.get(f"{self._service_url}/v1/models", timeout=5)
+            response = requests.get(f"{service_url}/v1/models", timeout=5)
             if response.status_code == 200:
                 models = response.json().get('data', [])
                 logger.info(f"Found {len(models)} models in LM Studio: {[m['id'] for m in models]}")
@@ -47,7 +72,7 @@ class LMStudioGenerativeAIService(GenerativeAIService):
                 logger.error(response.text)
                 return []
         except requests.exceptions.ConnectionError:
-            logger.error(f"Could not connect to LM Studio server at {self._service_url}")
+            logger.error(f"Could not connect to LM Studio server at {service_url}")
             return []
         except Exception as e:
             logger.error(f"Error connecting to LM Studio: {str(e)}")
@@ -61,7 +86,7 @@ class LMStudioGenerativeAIService(GenerativeAIService):
             for model in self._available_models
         ]
 
-    def complete(
+    async def complete(
         self,
         model: str,
         messages: str | list[dict[str, str]],
@@ -72,22 +97,25 @@ class LMStudioGenerativeAIService(GenerativeAIService):
                 self.service_name,
                 f"LM Studio server at {self._service_url} is not available or has no models loaded"
             )
-            
+
+        async with self._backends.use() as client:
+            return await self._complete(client, model, messages, temperature)
+
+    async def _complete(
+        self,
+        client: AsyncOpenAI,
+        model: str,
+        messages: str | list[dict[str, str]],
+        temperature: int,
+    ) -> GenerationOutput:
         try:
             with ExecutionTimer() as timer:
-                openai_client = OpenAI(
-                    base_url=f"{self._service_url}/v1",
-                    api_key="lm-studio",
-                    timeout=120,  # Increased timeout to 2 minutes
-                    max_retries=0,
-                )
-                
                 # Log the request for debugging
                 logger.info(f"Sending request to LM Studio with model: {model}")
                 logger.debug(f"Messages: {messages}")
                 
                 try:
-                    response = openai_client.chat.completions.create(
+                    response = await client.chat.completions.create(
                         model=model,
                         messages=cast(Iterable[ChatCompletionMessageParam], messages),
                         temperature=temperature,
@@ -115,6 +143,12 @@ class LMStudioGenerativeAIService(GenerativeAIService):
 
         except ExternalServiceTimeout:
             raise
+        except (openai.APIConnectionError, openai.InternalServerError) as e:
+            logger.error(f"Error in LM Studio completion: {str(e)}")
+            raise ExternalServiceInterruption(
+                self.service_name,
+                f"Error communicating with LM Studio server: {str(e)}"
+            )
         except Exception as e:
             logger.error(f"Error in LM Studio completion: {str(e)}")
             raise ExternalServiceError(
@@ -130,4 +164,30 @@ class LMStudioGenerativeAIService(GenerativeAIService):
             completionTokens=completion_tokens,
             promptTokens=prompt_tokens,
             timeToGenerate=cast(int, timer.elapsed_ms),
-        ) 
\ No newline at end of file
+        ) 
+
+    def stream(
+        self,
+        model: str,
+        messages: str | list[dict[str, str]],
+        temperature: int = 0,
+    ) -> GenerationStream:
+        if not self._available_models:
+            raise ExternalServiceError(
+                self.service_name,
+                f"LM Studio server at {self._service_url} is not available or has no models loaded"
+            )
+
+        return self._backends.stream(
+            lambda client: stream_openai_chat(
+                client,
+                self.service_name,
+                model,
+                messages,
+                temperature,
+                max_tokens=4096,
+            )
+        )
+
+    async def aclose(self) -> None:
+        await self._backends.aclose()
@@ -1,4 +1,5 @@
 import os
+import shutil
 from pathlib import Path
 from typing import BinaryIO, Generator, Any
 
@@ -16,7 +17,7 @@ class LocalStorageProvider(StorageProvider):
             os.makedirs(user_folder, exist_ok=True)
 
         with open(Path(user_folder, filename), "wb") as recording_file:
-            recording_file.write(file.read())
+            shutil.copyfileobj(file, recording_file, 64 * 1024)
 
     def stream_recording(self, username: str, filename: str) -> Generator[bytes, Any, None]:
         """Streams a file from the user's recordings folder."""
@@ -29,6 +30,10 @@ class LocalStorageProvider(StorageProvider):
         user_folder = Path(settings.RECORDINGS_FOLDER, username)
         os.remove(Path(user_folder, filename))
 
+    def recording_exists(self, username: str, filename: str) -> bool:
+        """Checks whether a file is in the user's recordings folder."""
+        return os.path.isfile(Path(settings.RECORDINGS_FOLDER, username, filename))
+
     def get_sample_recording(self, filename: str) -> Generator[bytes, Any, None]:
         """Streams a sample recording file."""
         sample_path = Path(".sample-recordings", filename)
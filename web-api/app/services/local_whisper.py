@@ -0,0 +1,114 @@
+import logging
+from typing import BinaryIO
+
+import httpx
+
+from app.config import settings
+from app.errors import (
+    ExternalServiceError,
+    ExternalServiceInterruption,
+    ExternalServiceTimeout,
+)
+from app.schemas import TranscriptionOutput
+from app.services.adapters import TranscriptionService
+
+logger = logging.getLogger(__name__)
+
+# Responses worth retrying later, as for the OpenAI service.
+INTERRUPTION_STATUSES = {409, 422, 429, 500, 502, 503, 504}
+
+
+class LocalWhisperTranscriptionService(TranscriptionService):
+    """
+    Service for transcribing with a separate ASR server exposing the OpenAI
+    compatible /v1/audio/transcriptions endpoint (e.g. faster-whisper-server,
+    speaches or whisper.cpp's server), so the API does not hold the model in
+    its own memory and each can be scaled on its own.
+
+    Requests share a pool of keep-alive connections, and audio files are
+    streamed to the server in chunks rather than read into memory first.
+    """
+
+    def __init__(
+        self,
+        api_url: str | None = None,
+        model: str | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.api_url = api_url or settings.LOCAL_WHISPER_SERVICE_URL
+        self.model = model or settings.LOCAL_WHISPER_MODEL
+
+        if not self.api_url:
+            raise ValueError(
+                "LOCAL_WHISPER_SERVICE_URL must be set to use Local Whisper"
+            )
+
+        logger.info(f"Local Whisper service initialized with API URL: {self.api_url}")
+
+        # Transcriptions run as long as the audio takes, so only connecting
+        # is limited in time.
+        self._client = httpx.AsyncClient(
+            base_url=self.api_url,
+            timeout=httpx.Timeout(None, connect=10),
+            limits=httpx.Limits(
+                max_connections=settings.LOCAL_WHISPER_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LOCAL_WHISPER_MAX_CONNECTIONS,
+            ),
+            transport=transport,
+        )
+
+    @property
+    def service_name(self):
+        return "Local Whisper"
+
+    @property
+    def model_name(self):
+        return self.model
+
+    async def transcribe(
+        self,
+        audio_file: BinaryIO,
+        filename: str,
+        content_type: str,
+        prompt: str | None = None,
+    ) -> TranscriptionOutput:
+        data = {"model": self.model, "response_format": "json"}
+        if prompt:
+            data["prompt"] = prompt
+
+        try:
+            response = await self._client.post(
+                "/v1/audio/transcriptions",
+                data=data,
+                files={"file": (filename, audio_file, content_type)},
+            )
+        except httpx.TimeoutException as e:
+            raise ExternalServiceTimeout(self.service_name, str(e))
+        except httpx.TransportError as e:
+            raise ExternalServiceInterruption(self.service_name, str(e))
+        except Exception as e:
+            raise ExternalServiceError(self.service_name, str(e))
+
+        if response.status_code in INTERRUPTION_STATUSES:
+            raise ExternalServiceInterruption(
+                self.service_name, f"{response.status_code} - {response.text}"
+            )
+        if response.status_code != 200:
+            raise ExternalServiceError(
+                self.service_name, f"{response.status_code} - {response.text}"
+            )
+
+        try:
+            transcript = response.json()["text"]
+        except (ValueError, KeyError) as e:
+            raise ExternalServiceError(
+                self.service_name, f"Invalid transcription response: {str(e)}"
+            )
+
+        return TranscriptionOutput(
+            transcript=transcript.strip(),
+            service=self.service_name,
+        )
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
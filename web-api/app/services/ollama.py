@@ -5,7 +5,8 @@ import requests
 import logging
 
 import aiohttp
-from openai import AsyncOpenAI, NotGiven, OpenAI
+import openai
+from openai import AsyncOpenAI, NotGiven
 from openai.types.chat import ChatCompletionMessageParam
 
 from app.errors import (
@@ -15,23 +16,48 @@ from app.errors import (
 )
 from app.schemas import GenerationOutput, LanguageModel
 from app.services.adapters import GenerativeAIService
+from app.services.backend_pool import BackendPool, endpoint_urls
+from app.services.streaming import (
+    GenerationStream,
+    pooled_http_client,
+    stream_openai_chat,
+)
 from app.utility.timing import ExecutionTimer
 
 logger = logging.getLogger(__name__)
 
 class OllamaGenerativeAIService(GenerativeAIService):
-    def __init__(self, service_url: str = "http://localhost:11434"):
-        self._service_url = service_url
-        self._available_models = self._get_available_models()
+    def __init__(self, service_url: str | list[str] = "http://localhost:11434"):
+        self._service_urls = endpoint_urls(service_url)
+        self._service_url = self._service_urls[0]
+
+        # Replicas serve the same models, so list those of the first to answer.
+        for url in self._service_urls:
+            self._available_models = self._get_available_models(url)
+            if self._available_models:
+                break
+
+        self._backends = BackendPool(
+            self._service_urls,
+            lambda url: AsyncOpenAI(
+                base_url=f"{url}/v1",
+                api_key="not-needed",
+                timeout=None,
+                max_retries=0,
+                http_client=pooled_http_client(),
+            ),
+            health_path="/api/version",
+            close_client=lambda client: client.close(),
+        )
 
     @property
     def service_name(self):
         return "Ollama"
 
-    def _get_available_models(self) -> List[Dict]:
+    def _get_available_models(self, service_url: str) -> List[Dict]:
         """Fetch available models from Ollama API."""
         try:
-            response = requests.get(f"{self._service_url}/api/tags")
+            response = requests.get(f"{service_url}/api/tags")
             if response.status_code == 200:
                 return response.json().get('models', [])
             else:
@@ -50,21 +76,25 @@ class OllamaGenerativeAIService(GenerativeAIService):
             for model in self._available_models
         ]
 
-    def complete(
+    async def complete(
         self,
         model: str,
         messages: str | list[dict[str, str]],
         temperature: int = 0,
+    ) -> GenerationOutput:
+        async with self._backends.use() as client:
+            return await self._complete(client, model, messages, temperature)
+
+    async def _complete(
+        self,
+        client: AsyncOpenAI,
+        model: str,
+        messages: str | list[dict[str, str]],
+        temperature: int,
     ) -> GenerationOutput:
         try:
             with ExecutionTimer() as timer:
-                openai_client = OpenAI(
-                    base_url=f"{self._service_url}/v1",
-                    api_key="not-needed",
-                    timeout=None,
-                    max_retries=0,
-                )
-                response = openai_client.chat.completions.create(
+                response = await client.chat.completions.create(
                     model=model,
                     messages=cast(Iterable[ChatCompletionMessageParam], messages),
                     temperature=temperature,
@@ -78,6 +108,10 @@ class OllamaGenerativeAIService(GenerativeAIService):
                     0 if response.usage is None else response.usage.prompt_tokens
                 )
 
+        except openai.APITimeoutError as e:
+            raise ExternalServiceTimeout(self.service_name, str(e))
+        except (openai.APIConnectionError, openai.InternalServerError) as e:
+            raise ExternalServiceInterruption(self.service_name, str(e))
         except Exception as e:
             raise ExternalServiceError(self.service_name, str(e))
 
@@ -89,4 +123,19 @@ class OllamaGenerativeAIService(GenerativeAIService):
             completionTokens=completion_tokens,
             promptTokens=prompt_tokens,
             timeToGenerate=cast(int, timer.elapsed_ms),
-        ) 
\ No newline at end of file
+        ) 
+
+    def stream(
+        self,
+        model: str,
+        messages: str | list[dict[str, str]],
+        temperature: int = 0,
+    ) -> GenerationStream:
+        return self._backends.stream(
+            lambda client: stream_openai_chat(
+                client, self.service_name, model, messages, temperature
+            )
+        )
+
+    async def aclose(self) -> None:
+        await self._backends.aclose()
@@ -3,7 +3,7 @@ from datetime import datetime
 from typing import BinaryIO, cast
 
 import openai
-from openai import AsyncOpenAI, NotGiven, OpenAI
+from openai import AsyncOpenAI, NotGiven
 from openai.types.chat import ChatCompletionMessageParam
 
 from app.errors import (
@@ -13,6 +13,11 @@ from app.errors import (
 )
 from app.schemas import GenerationOutput, LanguageModel, TranscriptionOutput
 from app.services.adapters import GenerativeAIService, TranscriptionService
+from app.services.streaming import (
+    GenerationStream,
+    pooled_http_client,
+    stream_openai_chat,
+)
 from app.utility.timing import ExecutionTimer
 
 
@@ -21,6 +26,10 @@ class OpenAITranscriptionService(TranscriptionService):
     def service_name(self):
         return "OpenAI Whisper"
 
+    @property
+    def model_name(self):
+        return "whisper-1"
+
     async def transcribe(
         self,
         audio_file: BinaryIO,
@@ -31,7 +40,7 @@ class OpenAITranscriptionService(TranscriptionService):
         try:
             openai_client = AsyncOpenAI(timeout=None, max_retries=0)
             response = await openai_client.audio.transcriptions.create(
-                model="whisper-1",
+                model=self.model_name,
                 file=(filename, audio_file, content_type),
                 prompt=prompt or NotGiven(),
             )
@@ -55,6 +64,11 @@ class OpenAITranscriptionService(TranscriptionService):
 
 
 class OpenAIGenerativeAIService(GenerativeAIService):
+    def __init__(self):
+        self._client = AsyncOpenAI(
+            timeout=None, max_retries=0, http_client=pooled_http_client()
+        )
+
     @property
     def service_name(self):
         return "OpenAI"
@@ -63,7 +77,7 @@ class OpenAIGenerativeAIService(GenerativeAIService):
     def models(self):
         return [LanguageModel(name="gpt-4o", size="Large")]
 
-    def complete(
+    async def complete(
         self,
         model: str,
         messages: str | list[dict[str, str]],
@@ -71,8 +85,7 @@ class OpenAIGenerativeAIService(GenerativeAIService):
     ) -> GenerationOutput:
         try:
             with ExecutionTimer() as timer:
-                openai_client = OpenAI(timeout=None, max_retries=0)
-                response = openai_client.chat.completions.create(
+                response = await self._client.chat.completions.create(
                     model=model,
                     messages=cast(Iterable[ChatCompletionMessageParam], messages),
                     temperature=temperature,
@@ -107,3 +120,16 @@ class OpenAIGenerativeAIService(GenerativeAIService):
             promptTokens=prompt_tokens,
             timeToGenerate=cast(int, timer.elapsed_ms),
         )
+
+    def stream(
+        self,
+        model: str,
+        messages: str | list[dict[str, str]],
+        temperature: int = 0,
+    ) -> GenerationStream:
+        return stream_openai_chat(
+            self._client, self.service_name, model, messages, temperature
+        )
+
+    async def aclose(self) -> None:
+        await self._client.close()
@@ -11,6 +11,7 @@ MODEL_ID = "mlx-community/parakeet-tdt-0.6b-v2"
 
 class ParakeetMLXTranscriptionService(TranscriptionService):
     def __init__(self, model_id: str | Path = MODEL_ID):
+        self._model_id = str(model_id)
         try:
             self.model = from_pretrained(str(model_id))
         except Exception as e:
@@ -20,6 +21,10 @@ class ParakeetMLXTranscriptionService(TranscriptionService):
     def service_name(self) -> str:
         return "Parakeet MLX"
 
+    @property
+    def model_name(self) -> str:
+        return self._model_id
+
     async def transcribe(
         self,
         audio_file: BinaryIO,
@@ -76,6 +76,16 @@ class S3StorageProvider(StorageProvider):
         except ClientError as e:
             raise IOError(f"Error deleting file from S3: {str(e)}")
 
+    def recording_exists(self, username: str, filename: str) -> bool:
+        s3_key = f"recordings/{username}/{filename}"
+        try:
+            self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                return False
+            raise IOError(f"Error checking file in S3: {str(e)}")
+
     def get_sample_recording(self, filename: str) -> Generator[bytes, Any, None]:
         s3_key = f"sample-recordings/{filename}"
         try:
@@ -0,0 +1,215 @@
+"""
+Chat completions from the generative AI services, over shared clients.
+
+A stream is an async iterator yielding the text of the completion as it
+arrives, then (as its last item) the complete `GenerationOutput` once the
+service has finished.
+"""
+
+import json
+from collections.abc import AsyncIterable, AsyncIterator, Iterable
+from datetime import datetime
+from typing import Any, cast
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletionMessageParam
+
+from app.config import settings
+from app.errors import (
+    ExternalServiceError,
+    ExternalServiceInterruption,
+    ExternalServiceTimeout,
+    WebAPIException,
+)
+from app.schemas import GenerationOutput
+from app.utility.timing import ExecutionTimer
+
+GenerationStream = AsyncIterator[str | GenerationOutput]
+
+
+def pooled_http_client(
+    base_url: str = "", timeout: float | None = None
+) -> httpx.AsyncClient:
+    """
+    Creates a client keeping a limited pool of connections alive to a
+    service, to be shared by all its requests for the life of the app.
+    Requests beyond the limit wait for a free connection, however long.
+    """
+    return httpx.AsyncClient(
+        base_url=base_url,
+        timeout=httpx.Timeout(timeout, connect=10, pool=None),
+        limits=httpx.Limits(
+            max_connections=settings.GENERATION_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.GENERATION_MAX_CONNECTIONS,
+        ),
+    )
+
+
+async def complete_stream(stream: GenerationStream) -> GenerationOutput:
+    "Runs a stream to its end, returning the complete output."
+    async for item in stream:
+        if isinstance(item, GenerationOutput):
+            return item
+
+    raise ValueError("The stream ended without its output")
+
+
+async def start_stream(stream: GenerationStream) -> GenerationStream:
+    """
+    Starts a stream, running it up to its first item so that any error in
+    reaching the service is raised now, and returns the continuing stream.
+    """
+    first = await anext(stream)
+
+    return _resumed(first, stream)
+
+
+async def _resumed(
+    first: str | GenerationOutput, stream: GenerationStream
+) -> GenerationStream:
+    yield first
+    async for item in stream:
+        yield item
+
+
+async def stream_openai_chat(
+    client: AsyncOpenAI,
+    service_name: str,
+    model: str,
+    messages: str | list[dict[str, str]],
+    temperature: int = 0,
+    **options: Any,
+) -> GenerationStream:
+    "Streams a chat completion from an OpenAI compatible service."
+    parts: list[str] = []
+    (prompt_tokens, completion_tokens) = (0, 0)
+
+    try:
+        with ExecutionTimer() as timer:
+            stream = await client.chat.completions.create(
+                model=model,
+                messages=cast(Iterable[ChatCompletionMessageParam], messages),
+                temperature=temperature,
+                stream=True,
+                stream_options={"include_usage": True},
+                **options,
+            )
+
+            try:
+                async for chunk in stream:
+                    # Usage is reported by a last chunk without choices.
+                    if chunk.usage is not None:
+                        prompt_tokens = chunk.usage.prompt_tokens
+                        completion_tokens = chunk.usage.completion_tokens
+
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        parts.append(chunk.choices[0].delta.content)
+                        yield chunk.choices[0].delta.content
+            finally:
+                await stream.close()
+    except openai.APITimeoutError as e:
+        raise ExternalServiceTimeout(service_name, str(e))
+    except (
+        openai.APIConnectionError,
+        openai.ConflictError,
+        openai.InternalServerError,
+        openai.RateLimitError,
+        openai.UnprocessableEntityError,
+    ) as e:
+        raise ExternalServiceInterruption(service_name, str(e))
+    except WebAPIException:
+        raise
+    except Exception as e:
+        raise ExternalServiceError(service_name, str(e))
+
+    yield GenerationOutput(
+        text="".join(parts),
+        generatedAt=cast(datetime, timer.started_at),
+        service=service_name,
+        model=model,
+        completionTokens=completion_tokens,
+        promptTokens=prompt_tokens,
+        timeToGenerate=cast(int, timer.elapsed_ms),
+    )
+
+
+async def stream_chat_completions_api(
+    client: httpx.AsyncClient,
+    service_name: str,
+    data: dict[str, Any],
+) -> GenerationStream:
+    """
+    Streams a chat completion from a server's OpenAI compatible
+    /v1/chat/completions endpoint, reading its Server-Sent Events.
+    """
+    parts: list[str] = []
+    (prompt_tokens, completion_tokens) = (0, 0)
+
+    try:
+        with ExecutionTimer() as timer:
+            async with client.stream(
+                "POST",
+                "/v1/chat/completions",
+                json={
+                    **data,
+                    "stream": True,
+                    "stream_options": {"include_usage": True},
+                },
+            ) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    error = (
+                        ExternalServiceInterruption
+                        if response.status_code >= 500
+                        else ExternalServiceError
+                    )
+                    raise error(
+                        service_name,
+                        f"API error: {response.status_code} - {response.text}",
+                    )
+
+                async for chunk in sse_data(response.aiter_lines()):
+                    usage = chunk.get("usage") or {}
+                    prompt_tokens = usage.get("prompt_tokens", prompt_tokens)
+                    completion_tokens = usage.get(
+                        "completion_tokens", completion_tokens
+                    )
+
+                    choices = chunk.get("choices") or [{}]
+                    text = choices[0].get("delta", {}).get("content")
+                    if text:
+                        parts.append(text)
+                        yield text
+    except WebAPIException:
+        raise
+    except httpx.TimeoutException as e:
+        raise ExternalServiceTimeout(service_name, str(e))
+    except httpx.TransportError as e:
+        raise ExternalServiceInterruption(service_name, str(e))
+    except Exception as e:
+        raise ExternalServiceError(service_name, str(e))
+
+    yield GenerationOutput(
+        text="".join(parts),
+        generatedAt=cast(datetime, timer.started_at),
+        service=service_name,
+        model=data["model"],
+        completionTokens=completion_tokens,
+        promptTokens=prompt_tokens,
+        timeToGenerate=cast(int, timer.elapsed_ms),
+    )
+
+
+async def sse_data(lines: AsyncIterable[str]) -> AsyncIterator[dict[str, Any]]:
+    "Yields the JSON data of each Server-Sent Event, until a [DONE] event."
+    async for line in lines:
+        if not line or not line.startswith("data:"):
+            continue
+
+        data = line.removeprefix("data:").strip()
+        if data == "[DONE]":
+            return
+
+        yield json.loads(data)
@@ -1,5 +1,7 @@
+import asyncio
 from datetime import datetime
 from typing import List, Dict, cast, Optional
+import httpx
 import requests
 import json
 import logging
@@ -7,9 +9,19 @@ import os
 from pathlib import Path
 
 from app.config.package_checks import VLLM_AVAILABLE
-from app.errors import ExternalServiceError
+from app.errors import (
+    ExternalServiceError,
+    ExternalServiceInterruption,
+    ExternalServiceTimeout,
+)
 from app.schemas import GenerationOutput, LanguageModel
 from app.services.adapters import GenerativeAIService
+from app.services.backend_pool import BackendPool, endpoint_urls
+from app.services.streaming import (
+    GenerationStream,
+    pooled_http_client,
+    stream_chat_completions_api,
+)
 from app.utility.timing import ExecutionTimer
 from app.config import settings
 
@@ -25,21 +37,37 @@ logger = logging.getLogger(__name__)
 
 class VLLMService(GenerativeAIService):
     
-    def __init__(self, api_url: Optional[str] = None):
-        self.api_url = api_url or f"http://{settings.VLLM_SERVER_NAME}:{settings.VLLM_SERVER_PORT}"
+    def __init__(self, api_url: str | list[str] | None = None):
+        self.api_urls = endpoint_urls(
+            api_url or f"http://{settings.VLLM_SERVER_NAME}:{settings.VLLM_SERVER_PORT}"
+        )
+        self.api_url = self.api_urls[0] if self.api_urls else None
         
         if not self.api_url:
             logger.warning("VLLM API URL not configured")
             self._available_models = []
             return
 
-        logger.info(f"VLLM service initialized with API URL: {self.api_url}")
-        try:
-            self._available_models = self._get_available_models()
-            logger.info(f"Successfully connected to VLLM server. Available models: {self._available_models}")
-        except Exception as e:
-            logger.error(f"Failed to connect to VLLM server: {str(e)}")
-            raise ExternalServiceError("VLLM", f"Failed to connect to VLLM server: {str(e)}")
+        self._backends = BackendPool(
+            self.api_urls,
+            lambda url: pooled_http_client(url, timeout=120),
+            health_path="/health",
+        )
+
+        logger.info(f"VLLM service initialized with API URLs: {self.api_urls}")
+
+        # Replicas serve the same models, so list those of the first to answer.
+        error = None
+        for url in self.api_urls:
+            try:
+                self._available_models = self._get_available_models(url)
+                logger.info(f"Successfully connected to VLLM server. Available models: {self._available_models}")
+                break
+            except Exception as e:
+                logger.error(f"Failed to connect to VLLM server at {url}: {str(e)}")
+                error = e
+        else:
+            raise ExternalServiceError("VLLM", f"Failed to connect to VLLM server: {str(error)}")
     
     def _download_model(self) -> None:
         if not settings.HUGGINGFACE_TOKEN:
@@ -82,11 +110,11 @@ class VLLMService(GenerativeAIService):
     def _get_headers(self) -> Dict[str, str]:
         return {"Content-Type": "application/json"}
     
-    def _get_available_models(self) -> List[Dict]:
+    def _get_available_models(self, api_url: str) -> List[Dict]:
         try:
-            logger.info(f"Fetching available models from {self.api_url}/v1/models")
+            logger.info(f"Fetching available models from {api_url}/v1/models")
             response = requests.get(
-                f"{self.api_url}/v1/models",
+                f"{api_url}/v1/models",
                 headers=self._get_headers(),
                 timeout=10
             )
@@ -99,7 +127,7 @@ class VLLMService(GenerativeAIService):
                 logger.error(error_msg)
                 raise ExternalServiceError(self.service_name, error_msg)
         except requests.exceptions.ConnectionError as e:
-            error_msg = f"Could not connect to VLLM server at {self.api_url}. Is the server running?"
+            error_msg = f"Could not connect to VLLM server at {api_url}. Is the server running?"
             logger.error(error_msg)
             raise ExternalServiceError(self.service_name, error_msg)
         except Exception as e:
@@ -118,7 +146,7 @@ class VLLMService(GenerativeAIService):
             for model in self._available_models
         ]
     
-    def complete(
+    async def complete(
         self,
         model: str,
         messages: List[Dict[str, str]],
@@ -129,10 +157,23 @@ class VLLMService(GenerativeAIService):
                 self.service_name,
                 "VLLM service is not properly configured. Check server URL or local setup."
             )
-            
+
+        if not self.api_url:
+            return await self._complete(None, model, messages, temperature)
+
+        async with self._backends.use() as client:
+            return await self._complete(client, model, messages, temperature)
+
+    async def _complete(
+        self,
+        client: httpx.AsyncClient | None,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: int,
+    ) -> GenerationOutput:
         try:
             with ExecutionTimer() as timer:
-                if self.api_url:
+                if client is not None:
                     available_model = next(
                         (m for m in self._available_models if m['id'] == model),
                         None
@@ -151,15 +192,12 @@ class VLLMService(GenerativeAIService):
                         "max_tokens": 1024
                     }
                     
-                    logger.info(f"Sending request to {self.api_url}/v1/chat/completions")
+                    logger.info(f"Sending request to {client.base_url.join('/v1/chat/completions')}")
                     logger.debug(f"Request data: {json.dumps(data, indent=2)}")
                     
                     try:
-                        response = requests.post(
-                            f"{self.api_url}/v1/chat/completions",
-                            headers=self._get_headers(),
-                            json=data,
-                            timeout=120
+                        response = await client.post(
+                            "/v1/chat/completions", json=data
                         )
                         
                         if response.status_code == 200:
@@ -171,15 +209,17 @@ class VLLMService(GenerativeAIService):
                         else:
                             error_msg = f"VLLM API error: {response.status_code} - {response.text}"
                             logger.error(error_msg)
+                            if response.status_code >= 500:
+                                raise ExternalServiceInterruption(self.service_name, error_msg)
                             raise ExternalServiceError(self.service_name, error_msg)
-                    except requests.exceptions.ConnectionError as e:
-                        error_msg = f"Could not connect to VLLM server at {self.api_url}. Is the server running?"
+                    except httpx.ConnectError as e:
+                        error_msg = f"Could not connect to VLLM server at {client.base_url}. Is the server running?"
                         logger.error(error_msg)
-                        raise ExternalServiceError(self.service_name, error_msg)
-                    except requests.exceptions.Timeout as e:
+                        raise ExternalServiceInterruption(self.service_name, error_msg)
+                    except httpx.TimeoutException as e:
                         error_msg = f"Request to VLLM server timed out after 120 seconds"
                         logger.error(error_msg)
-                        raise ExternalServiceError(self.service_name, error_msg)
+                        raise ExternalServiceTimeout(self.service_name, error_msg)
                 else:
                     if not VLLM_AVAILABLE:
                         raise ExternalServiceError(
@@ -193,13 +233,17 @@ class VLLMService(GenerativeAIService):
                         max_tokens=4096,
                     )
                     
-                    outputs = self.llm.generate(prompt, sampling_params)
+                    outputs = await asyncio.to_thread(
+                        self.llm.generate, prompt, sampling_params
+                    )
                     output = cast(RequestOutput, outputs[0])
                     text = output.outputs[0].text
                     
                     completion_tokens = len(text) // 4
                     prompt_tokens = len(prompt) // 4
                 
+        except ExternalServiceError:
+            raise
         except Exception as e:
             logger.error(f"Error generating completion: {str(e)}")
             raise ExternalServiceError(self.service_name, str(e))
@@ -214,6 +258,47 @@ class VLLMService(GenerativeAIService):
             timeToGenerate=cast(int, timer.elapsed_ms),
         )
     
+    def stream(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: int = 0,
+    ) -> GenerationStream:
+        if not self._available_models:
+            raise ExternalServiceError(
+                self.service_name,
+                "VLLM service is not properly configured. Check server URL or local setup."
+            )
+
+        available_model = next(
+            (m for m in self._available_models if m['id'] == model),
+            None
+        )
+
+        if not available_model:
+            raise ExternalServiceError(
+                self.service_name,
+                f"Model {model} not found in available models: {[m['id'] for m in self._available_models]}"
+            )
+
+        data = {
+            "model": available_model['id'],
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": 1024
+        }
+
+        logger.info("Streaming request to VLLM /v1/chat/completions")
+        return self._backends.stream(
+            lambda client: stream_chat_completions_api(
+                client, self.service_name, data
+            )
+        )
+
+    async def aclose(self) -> None:
+        if self.api_url:
+            await self._backends.aclose()
+
     def _format_messages(self, messages: List[Dict[str, str]]) -> str:
         formatted_prompt = ""
         
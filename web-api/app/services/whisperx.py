@@ -1,4 +1,4 @@
-import json
+import asyncio
 from typing import BinaryIO
 import tempfile
 import os
@@ -7,6 +7,7 @@ import warnings
 from pydantic import BaseModel, Field
 import logging
 import sys
+import time
 
 from app.errors import (
     ExternalServiceError,
@@ -15,6 +16,17 @@ from app.errors import (
 )
 from app.schemas import TranscriptionOutput
 from app.services.adapters import TranscriptionService
+from app.services.whisperx_profiles import (
+    CALIBRATE,
+    CALIBRATION_CLIP,
+    CALIBRATION_SECONDS,
+    WhisperXProfile,
+    available_memory,
+    calibrate,
+    cpu_thread_count,
+    get_profile,
+)
+from app.services.whisperx_worker import SAMPLE_RATE, WhisperXInferenceWorker
 from app.config import settings
 
 logger = logging.getLogger(__name__)
@@ -35,6 +47,7 @@ class WhisperXConfig(BaseModel):
     batch_size: int = 16
     compute_type: str = "float32"
     model_version: str = "large-v3"
+    cpu_threads: int = 4
 
     def validate_device(self) -> bool:
         """Validate device availability and compatibility."""
@@ -69,25 +82,81 @@ class WhisperXTranscriptionService(TranscriptionService):
     def __init__(self):
         if not WHISPERX_AVAILABLE:
             logger.info("WhisperX is not available. This service will not be used in AWS environment.")
+            self.config = WhisperXConfig()
             return
 
+        device = settings.WHISPERX_DEVICE.split(":")[0]
         self.config = WhisperXConfig(
-            device=settings.WHISPERX_DEVICE.split(":")[0] if ":" in settings.WHISPERX_DEVICE else settings.WHISPERX_DEVICE,
-            device_index=int(settings.WHISPERX_DEVICE.split(":")[1]) if ":" in settings.WHISPERX_DEVICE and settings.WHISPERX_DEVICE.split(":")[0] == "cuda" else 0,
-            batch_size=1 if settings.WHISPERX_DEVICE.split(":")[0] == "cpu" else 16,
-            compute_type="float32",
-            model_version="large-v3"
+            device=device,
+            device_index=int(settings.WHISPERX_DEVICE.split(":")[1]) if ":" in settings.WHISPERX_DEVICE and device == "cuda" else 0,
+            cpu_threads=cpu_thread_count(settings.WHISPERX_CPU_THREADS),
         )
         
         self.config.validate_device()
         
         self.model = None
-        self._load_model()
+        self.profile: WhisperXProfile | None = None
+
+        if settings.WHISPERX_PROFILE == CALIBRATE:
+            profile = calibrate(settings.WHISPERX_ACCURACY_TIER, self._benchmark)
+        else:
+            profile = get_profile(settings.WHISPERX_PROFILE)
+
+        if profile != self.profile:
+            self.model = None
+            self._use_profile(profile)
+            self._load_model()
+
+        # Inference runs on a dedicated worker, batching concurrent requests.
+        # On CPU, each batch is sized for the RAM free as it is formed (and
+        # is never larger than the segments waiting to be transcribed).
+        self.worker = WhisperXInferenceWorker(
+            self.model,
+            (
+                (lambda: profile.batch_size(available_memory()))
+                if self.config.device == "cpu"
+                else self.config.batch_size
+            ),
+        )
 
     @property
     def service_name(self):
         return "WhisperX"
 
+    @property
+    def model_name(self):
+        return self.config.model_version
+
+    def _use_profile(self, profile: WhisperXProfile):
+        self.profile = profile
+        self.config.model_version = profile.model_version
+        self.config.compute_type = profile.compute_type
+
+        # GPU batches are sized for its own memory; CPU batches for the RAM free.
+        if self.config.device == "cpu":
+            self.config.batch_size = profile.batch_size(available_memory())
+
+        logger.info(
+            f"Using WhisperX profile {profile.name} "
+            f"(batch_size={self.config.batch_size}, threads={self.config.cpu_threads})"
+        )
+
+    def _benchmark(self, profile: WhisperXProfile) -> float:
+        "Returns the seconds taken to transcribe the calibration clip."
+        self.model = None
+        self._use_profile(profile)
+        self._load_model()
+
+        audio = whisperx.load_audio(str(CALIBRATION_CLIP))
+        audio = audio[: CALIBRATION_SECONDS * SAMPLE_RATE]
+
+        start = time.perf_counter()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            self.model.transcribe(audio, batch_size=self.config.batch_size)
+
+        return time.perf_counter() - start
+
     def _load_model(self):
         if not WHISPERX_AVAILABLE:
             return
@@ -102,7 +171,9 @@ class WhisperXTranscriptionService(TranscriptionService):
                     self.model = whisperx.load_model(
                         self.config.model_version,
                         "cpu",
-                        compute_type=self.config.compute_type
+                        compute_type=self.config.compute_type,
+                        language=settings.WHISPERX_LANGUAGE,
+                        threads=self.config.cpu_threads,
                     )
                 else:
                     logger.info(f"Loading WhisperX model on CUDA device {self.config.device_index}")
@@ -110,7 +181,8 @@ class WhisperXTranscriptionService(TranscriptionService):
                         self.config.model_version,
                         self.config.device,
                         device_index=self.config.device_index,
-                        compute_type=self.config.compute_type
+                        compute_type=self.config.compute_type,
+                        language=settings.WHISPERX_LANGUAGE,
                     )
             except Exception as e:
                 device_type = "CPU" if self.config.device == "cpu" else "GPU"
@@ -157,7 +229,8 @@ class WhisperXTranscriptionService(TranscriptionService):
             try:
                 try:
                     logger.info("Loading audio file...")
-                    audio = whisperx.load_audio(temp_file_path)
+                    # Audio is decoded by an ffmpeg process, off the event loop.
+                    audio = await asyncio.to_thread(whisperx.load_audio, temp_file_path)
                     if audio is None or len(audio) == 0:
                         logger.error("Audio loading returned empty result")
                         raise ValueError("Audio loading returned empty result")
@@ -170,64 +243,20 @@ class WhisperXTranscriptionService(TranscriptionService):
 
                 try:
                     logger.info(
-                        f"Transcribing audio on {self.config.device} (batch_size={self.config.batch_size})"
+                        f"Transcribing audio on {self.config.device}"
                     )
 
-                    with warnings.catch_warnings():
-                        warnings.simplefilter("ignore")
-                        result = self.model.transcribe(
-                            audio, batch_size=self.config.batch_size
-                        )
-
-                    if not result:
-                        logger.error("Transcription returned empty result")
-                        raise ValueError("Transcription returned empty result")
-                    
-                    if "segments" not in result:
-                        logger.error(f"Transcription result missing segments: {result}")
-                        raise ValueError("Transcription returned invalid result")
-
-                    logger.info(f"Transcription result: {json.dumps(result, indent=2)}")
-
+                    texts = await self.worker.transcribe(audio)
                 except Exception as e:
-                    if "memory" in str(e).lower() and self.config.batch_size > 1:
-                        logger.warning(
-                            f"Memory error, reducing batch size from {self.config.batch_size} to {self.config.batch_size // 2}"
-                        )
-                        try:
-                            result = self.model.transcribe(
-                                audio, batch_size=self.config.batch_size // 2
-                            )
-                            if not result or "segments" not in result:
-                                logger.error(f"Transcription with reduced batch size returned invalid result: {result}")
-                                raise ValueError(
-                                    "Transcription returned invalid result"
-                                )
-                        except Exception as retry_e:
-                            logger.error(f"Transcription failed with reduced batch size: {str(retry_e)}")
-                            raise ExternalServiceError(
-                                self.service_name,
-                                f"Transcription failed with reduced batch size: {str(retry_e)}",
-                            )
-                    else:
-                        logger.error(f"Failed to transcribe audio: {str(e)}")
-                        raise ExternalServiceError(
-                            self.service_name, f"Failed to transcribe audio: {str(e)}"
-                        )
+                    logger.error(f"Failed to transcribe audio: {str(e)}")
+                    raise ExternalServiceError(
+                        self.service_name, f"Failed to transcribe audio: {str(e)}"
+                    )
 
-                segments = result.get("segments", [])
-                if not segments:
+                text_chunks = [text.strip() for text in texts if text.strip()]
+                if not text_chunks:
                     logger.warning("No segments found in transcription result")
-                    transcript = ""
-                else:
-                    text_chunks = [
-                        segment["text"].strip()
-                        for segment in segments
-                        if isinstance(segment, dict)
-                        and "text" in segment
-                        and segment["text"].strip()
-                    ]
-                    transcript = " ".join(text_chunks)
+                transcript = " ".join(text_chunks)
 
                 logger.info(
                     f"Transcription completed successfully. Length: {len(transcript)} characters"
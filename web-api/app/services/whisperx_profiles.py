@@ -0,0 +1,155 @@
+"""
+Performance profiles for running WhisperX, particularly on CPU-only nodes.
+
+A profile pairs a Whisper model size with a compute type (quantization) and
+the accuracy tier it is known to reach. The profile used is set by name, or
+chosen at startup by benchmarking each profile meeting the accuracy tier
+required on a short clip of a sample recording and taking the fastest.
+"""
+
+import logging
+import os
+from collections.abc import Callable
+from pathlib import Path
+from typing import Literal
+
+from pydantic import BaseModel, ConfigDict
+
+logger = logging.getLogger(__name__)
+
+AccuracyTier = Literal["high", "medium", "low"]
+
+CALIBRATE = "auto"
+CALIBRATION_CLIP = Path(".sample-recordings", "CAR0001.mp3")
+CALIBRATION_SECONDS = 20
+MAX_BATCH_SIZE = 16
+
+_TIER_RANKS: dict[AccuracyTier, int] = {"low": 0, "medium": 1, "high": 2}
+
+
+class WhisperXProfile(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())
+
+    name: str
+    model_version: str
+    compute_type: str
+    accuracy: AccuracyTier
+    # Rough working memory of each 30-second segment in a batch.
+    segment_memory_mb: int
+
+    def meets(self, tier: AccuracyTier) -> bool:
+        "Whether the profile is at least as accurate as the tier."
+        return _TIER_RANKS[self.accuracy] >= _TIER_RANKS[tier]
+
+    def batch_size(self, available_bytes: int) -> int:
+        "The largest batch that fits in half the memory available."
+        fits = available_bytes // 2 // (self.segment_memory_mb * 1024 * 1024)
+        return max(1, min(MAX_BATCH_SIZE, fits))
+
+
+# Ordered from most to least accurate. Int8 quantization costs little
+# accuracy while several times faster than float32 on CPU.
+PROFILES = [
+    WhisperXProfile(
+        name="large-v3-float32",
+        model_version="large-v3",
+        compute_type="float32",
+        accuracy="high",
+        segment_memory_mb=1024,
+    ),
+    WhisperXProfile(
+        name="large-v3-int8",
+        model_version="large-v3",
+        compute_type="int8",
+        accuracy="high",
+        segment_memory_mb=512,
+    ),
+    WhisperXProfile(
+        name="large-v3-turbo-int8",
+        model_version="large-v3-turbo",
+        compute_type="int8",
+        accuracy="medium",
+        segment_memory_mb=384,
+    ),
+    WhisperXProfile(
+        name="medium-int8",
+        model_version="medium",
+        compute_type="int8",
+        accuracy="medium",
+        segment_memory_mb=256,
+    ),
+    WhisperXProfile(
+        name="small-int8",
+        model_version="small",
+        compute_type="int8",
+        accuracy="low",
+        segment_memory_mb=128,
+    ),
+]
+
+
+def get_profile(name: str) -> WhisperXProfile:
+    for profile in PROFILES:
+        if profile.name == name:
+            return profile
+
+    names = ", ".join(p.name for p in PROFILES)
+    raise ValueError(f"Unknown WhisperX profile '{name}', expected one of: {names}")
+
+
+def cpu_thread_count(configured: int = 0) -> int:
+    "The configured thread count, or else the number of physical cores."
+    if configured > 0:
+        return configured
+
+    import psutil
+
+    return psutil.cpu_count(logical=False) or os.cpu_count() or 1
+
+
+def available_memory() -> int:
+    import psutil
+
+    return psutil.virtual_memory().available
+
+
+def profile_models(name: str, tier: AccuracyTier) -> list[str]:
+    """
+    The models a profile setting may run: that of the named profile, or when
+    calibrating, those of the profiles meeting the accuracy tier.
+    """
+    if name == CALIBRATE:
+        versions = [p.model_version for p in PROFILES if p.meets(tier)]
+        return list(dict.fromkeys(versions))
+
+    return [get_profile(name).model_version]
+
+
+def calibrate(
+    tier: AccuracyTier, benchmark: Callable[[WhisperXProfile], float]
+) -> WhisperXProfile:
+    """
+    Returns the fastest profile meeting the accuracy tier, given a benchmark
+    returning the seconds each profile takes. Profiles failing the benchmark
+    (e.g. a model that cannot be downloaded) are skipped.
+    """
+    candidates = [p for p in PROFILES if p.meets(tier)]
+    timings: dict[str, float] = {}
+
+    for profile in candidates:
+        try:
+            timings[profile.name] = benchmark(profile)
+            logger.info(
+                f"WhisperX profile {profile.name} took "
+                f"{timings[profile.name]:.2f}s on the calibration clip"
+            )
+        except Exception as e:
+            logger.warning(f"WhisperX profile {profile.name} failed: {str(e)}")
+
+    if not timings:
+        raise RuntimeError(f"No WhisperX profile meeting '{tier}' accuracy could run")
+
+    fastest = min(candidates, key=lambda p: timings.get(p.name, float("inf")))
+    logger.info(f"Selected WhisperX profile {fastest.name}")
+
+    return fastest
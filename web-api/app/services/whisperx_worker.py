@@ -0,0 +1,223 @@
+"""
+Runs WhisperX inference on a dedicated thread, off the event loop.
+
+Requests are queued to the worker, which splits each recording into its
+voice activity (VAD) segments and fills every forward pass of the model with
+up to `batch_size` segments, taken in turn from all the requests waiting.
+Concurrent transcriptions therefore share the throughput of the device
+rather than running one after another, and the API stays responsive.
+
+The batch size may be given as a function, to size each batch as it is
+formed (e.g. for the memory free at the time).
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+import warnings
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000  # WhisperX decodes all audio at 16 kHz
+CHUNK_SIZE = 30  # Maximum length of a merged VAD segment, in seconds
+
+
+@dataclass
+class _Request:
+    audio: np.ndarray
+    loop: asyncio.AbstractEventLoop
+    future: asyncio.Future
+    segments: deque[tuple[int, np.ndarray]] = field(default_factory=deque)
+    texts: list[str] = field(default_factory=list)
+    outstanding: int = 0
+
+    def resolve(self) -> None:
+        self.loop.call_soon_threadsafe(_set_result, self.future, self.texts)
+
+    def fail(self, error: Exception) -> None:
+        self.loop.call_soon_threadsafe(_set_exception, self.future, error)
+
+
+def _set_result(future: asyncio.Future, result: Any) -> None:
+    if not future.done():
+        future.set_result(result)
+
+
+def _set_exception(future: asyncio.Future, error: Exception) -> None:
+    if not future.done():
+        future.set_exception(error)
+
+
+class WhisperXInferenceWorker:
+    """
+    Transcribes audio with a loaded WhisperX pipeline on a worker thread,
+    batching VAD segments across concurrent requests.
+
+    For example:
+    ```python
+        worker = WhisperXInferenceWorker(model, batch_size=16)
+        texts = await worker.transcribe(whisperx.load_audio(path))
+    ```
+    """
+
+    def __init__(self, model: Any, batch_size: int | Callable[[], int]):
+        self.model = model
+        self._batch_size = batch_size if callable(batch_size) else lambda: batch_size
+        self._requests: queue.SimpleQueue[_Request] = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    async def transcribe(self, audio: np.ndarray) -> list[str]:
+        "Returns the text of each speech segment of the 16 kHz audio, in order."
+        loop = asyncio.get_running_loop()
+        request = _Request(audio=audio, loop=loop, future=loop.create_future())
+
+        self._start()
+        self._requests.put(request)
+
+        return await request.future
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="whisperx-inference", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        active: deque[_Request] = deque()
+
+        while True:
+            # Wait for a request when idle, then admit any others waiting.
+            if not active:
+                self._admit(self._requests.get(), active)
+
+            while True:
+                try:
+                    self._admit(self._requests.get_nowait(), active)
+                except queue.Empty:
+                    break
+
+            if active:
+                self._run_batch(self._next_batch(active), active)
+
+    def _admit(self, request: _Request, active: deque[_Request]) -> None:
+        try:
+            segments = vad_segments(self.model, request.audio)
+        except Exception as e:
+            request.fail(e)
+            return
+
+        for index, (start, end) in enumerate(segments):
+            samples = request.audio[int(start * SAMPLE_RATE) : int(end * SAMPLE_RATE)]
+            request.segments.append((index, samples))
+
+        request.texts = [""] * len(segments)
+        request.outstanding = len(segments)
+
+        if request.outstanding == 0:
+            request.resolve()
+        else:
+            active.append(request)
+
+    def _next_batch(
+        self, active: deque[_Request]
+    ) -> list[tuple[_Request, int, np.ndarray]]:
+        "Takes segments in turn from each active request to fill a batch."
+        batch: list[tuple[_Request, int, np.ndarray]] = []
+        waiting = [r for r in active if r.segments]
+        batch_size = max(1, self._batch_size())
+
+        while len(batch) < batch_size and waiting:
+            for request in list(waiting):
+                if len(batch) == batch_size:
+                    break
+
+                (index, samples) = request.segments.popleft()
+                batch.append((request, index, samples))
+
+                if not request.segments:
+                    waiting.remove(request)
+
+        return batch
+
+    def _run_batch(
+        self,
+        batch: list[tuple[_Request, int, np.ndarray]],
+        active: deque[_Request],
+    ) -> None:
+        try:
+            texts = self._infer([samples for (_, _, samples) in batch])
+        except Exception as e:
+            logger.error(f"WhisperX inference failed: {str(e)}")
+
+            for request in {id(r): r for (r, _, _) in batch}.values():
+                request.fail(e)
+                request.segments.clear()
+                active.remove(request)
+
+            return
+
+        for (request, index, _), text in zip(batch, texts):
+            request.texts[index] = text
+            request.outstanding -= 1
+
+            if request.outstanding == 0:
+                request.resolve()
+                active.remove(request)
+
+    def _infer(self, inputs: list[np.ndarray]) -> list[str]:
+        "Runs one forward pass, halving the batch if the device runs out of memory."
+        try:
+            # Silence the pipeline's warnings where it runs, on this thread.
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                outputs = self.model(
+                    iter([{"inputs": samples} for samples in inputs]),
+                    batch_size=len(inputs),
+                )
+                return [output["text"] for output in outputs]
+        except Exception as e:
+            if "memory" not in str(e).lower() or len(inputs) == 1:
+                raise
+
+            half = len(inputs) // 2
+            logger.warning(f"Memory error, reducing batch size to {half}")
+            return self._infer(inputs[:half]) + self._infer(inputs[half:])
+
+
+def vad_segments(model: Any, audio: np.ndarray) -> list[tuple[float, float]]:
+    """
+    Returns the (start, end) times, in seconds, of the speech segments of the
+    audio as the WhisperX pipeline finds them, merged into chunks of up to
+    30 seconds.
+    """
+    vad_model = model.vad_model
+    vad_params = model._vad_params
+
+    # WhisperX 3.3.2 moved preprocessing and merging onto the VAD model.
+    if hasattr(vad_model, "preprocess_audio"):
+        waveform = vad_model.preprocess_audio(audio)
+        merge_chunks = vad_model.merge_chunks
+    else:
+        import torch
+        from whisperx.vad import merge_chunks
+
+        waveform = torch.from_numpy(audio).unsqueeze(0)
+
+    segments = merge_chunks(
+        vad_model({"waveform": waveform, "sample_rate": SAMPLE_RATE}),
+        CHUNK_SIZE,
+        onset=vad_params["vad_onset"],
+        offset=vad_params["vad_offset"],
+    )
+
+    return [(segment["start"], segment["end"]) for segment in segments]
@@ -1,2 +1,21 @@
-from .generation import generate_note, generate_transcript_label  # noqa
-from .transcription import transcribe_audio  # noqa
+from .generation import (  # noqa
+    draft_note_events,
+    generate_note,
+    generate_notes,
+    generate_transcript_label,
+    invalidate_cached_generations,
+    stream_note,
+)
+from .transcription import (  # noqa
+    cache_transcript,
+    get_cached_transcript,
+    invalidate_cached_transcripts,
+    transcribe_audio,
+    transcribe_recording,
+)
+from .transcription_jobs import (  # noqa
+    cancel_transcription_jobs,
+    get_transcription_job,
+    start_transcription_job,
+    transcription_job_events,
+)
@@ -1,16 +1,45 @@
+import asyncio
+import hashlib
+import json
+import traceback
+from collections.abc import AsyncIterator
+from datetime import datetime, timedelta, timezone
+from typing import cast
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session as DatabaseSession
+
+import app.config.db as db
 import app.errors as errors
 import app.schemas as sch
+from app.config import settings
 from app.config.ai import (
     LABEL_TRANSCRIPT_SYSTEM_PROMPT,
     MARKDOWN_NOTE_SYSTEM_PROMPT,
     PLAINTEXT_NOTE_SYSTEM_PROMPT,
     generative_ai_services,
 )
-from app.logging import WebAPILogger
+from app.config.db import CachedGeneration
+from app.logging import WebAPILogger, log_error, log_generation
+from app.schemas import WebAPISession
 from app.services.adapters import GenerativeAIService
+from app.services.streaming import GenerationStream, complete_stream, start_stream
+from app.utility.caching import LRUCache
+from app.utility.timing import ExecutionTimer
 
 log = WebAPILogger(__name__)
 
+# How often generations served from memory have their last use saved to
+# the database, which orders the database's evictions.
+LAST_USED_SAVE_INTERVAL = timedelta(minutes=10)
+
+# Recently used generations, keyed by the hash of their service, model and
+# messages, with when their last use was saved.
+_generation_cache = LRUCache[str, tuple[sch.GenerationOutput, datetime]](
+    settings.GENERATION_CACHE_SIZE, ttl=settings.CACHE_MEMORY_TTL
+)
+
 
 def _get_service(model) -> GenerativeAIService | None:
     service = next(
@@ -25,46 +54,216 @@ def _get_service(model) -> GenerativeAIService | None:
     return service
 
 
-def generate_note(
+async def generate_note(
+    database: DatabaseSession,
     model: str,
     instructions: str,
     context: str | None,
     transcript: str,
     output_type: sch.NoteOutputType = "Markdown",
-) -> sch.GenerationOutput:
+) -> tuple[sch.GenerationOutput, bool]:
+    """
+    Generates a draft note, returning it and whether it was served from the
+    generation cache.
+    """
+    service = _get_note_service(model)
+    messages = _note_messages(instructions, context, transcript, output_type)
+
+    return await _generate(database, service, model, messages)
+
+
+async def stream_note(
+    database: DatabaseSession,
+    model: str,
+    instructions: str,
+    context: str | None,
+    transcript: str,
+    output_type: sch.NoteOutputType = "Markdown",
+) -> tuple[GenerationStream, bool]:
+    """
+    Starts generating a draft note, returning a stream of its text as it is
+    generated and whether it is served from the generation cache (as a
+    single piece of text). Errors before any text is generated are raised
+    here.
+    """
+    service = _get_note_service(model)
+    messages = _note_messages(instructions, context, transcript, output_type)
+
+    key = _cache_key(service, model, messages)
+    cached_output = get_cached_generation(database, key)
+
+    if cached_output is not None:
+        return (_replayed(cached_output), True)
+
+    stream = await start_stream(service.stream(model, messages))
+
+    return (_cached_on_completion(key, stream), False)
+
+
+async def generate_notes(
+    database: DatabaseSession,
+    model: str,
+    notes: list[sch.DraftNoteRequest],
+    context: str | None,
+    transcript: str,
+) -> list[tuple[sch.GenerationOutput, bool] | Exception]:
+    """
+    Generates several draft notes for one transcript concurrently, returning
+    each (with whether it was served from the generation cache) or the error
+    generating it, in order. Notes use the given model unless they name one.
+
+    Every prompt starts with the transcript, so a service caching prompt
+    prefixes need only process it once. The first note is started alone,
+    until the service begins responding to it, so that the transcript is in
+    the cache before the others are sent.
+    """
+    if len(notes) == 0:
+        return []
+
+    (first, *others) = notes
+    first_stream: GenerationStream | None = None
+
+    try:
+        # Returns once the service has begun responding, so has processed
+        # the transcript.
+        (first_stream, first_cached) = await stream_note(
+            database,
+            first.model or model,
+            first.instructions,
+            context,
+            transcript,
+            first.outputType,
+        )
+    except Exception as e:
+        first_error = e
+
+    async def finish_first() -> tuple[sch.GenerationOutput, bool]:
+        if first_stream is None:
+            raise first_error
+
+        return (await complete_stream(first_stream), first_cached)
+
+    results = await asyncio.gather(
+        finish_first(),
+        *(
+            generate_note(
+                database,
+                note.model or model,
+                note.instructions,
+                context,
+                transcript,
+                note.outputType,
+            )
+            for note in others
+        ),
+        return_exceptions=True,
+    )
+
+    return list(results)
+
+
+async def draft_note_events(
+    note_id: str, stream: GenerationStream, cached: bool, session: WebAPISession
+) -> AsyncIterator[str]:
+    """
+    Yields Server-Sent Events for a streamed draft note: a "token" event with
+    each piece of text as it is generated, then a "completed" event with the
+    whole note, or a "failed" event with the error.
+    """
+    try:
+        async for item in stream:
+            if isinstance(item, sch.GenerationOutput):
+                generation_output = item
+                break
+
+            yield f"event: token\ndata: {json.dumps({'text': item})}\n\n"
+    except Exception as e:
+        error = (
+            e
+            if isinstance(e, errors.WebAPIException)
+            else errors.WebAPIException(str(e))
+        )
+        log_error(
+            occurred=datetime.now(timezone.utc).astimezone(),
+            name=error.name,
+            message=error.message,
+            stack_trace=traceback.format_exc(),
+            error_id=error.uuid,
+            session=session,
+        )
+
+        detail = sch.WebAPIErrorDetail(
+            errorId=error.uuid,
+            name=error.name,
+            message=error.message,
+            fatal=error.fatal,
+        )
+        yield f"event: failed\ndata: {detail.model_dump_json()}\n\n"
+        return
+
+    with db.DatabaseSessionMaker() as database:
+        log_generation(
+            database=database,
+            record_id=note_id,
+            task_type="GENERATE NOTE",
+            generation_output=generation_output,
+            cached=cached,
+            session=session,
+        )
+
+    response = sch.GenerationResponse(text=generation_output.text, noteId=note_id)
+    yield f"event: completed\ndata: {response.model_dump_json()}\n\n"
+
+
+def _get_note_service(model: str) -> GenerativeAIService:
     service = _get_service(model)
 
     if service is None:
         raise errors.WebAPIException(f"Model {model} has not been configured for use")
 
-    # Configure prompt messages.
+    return service
+
+
+def _note_messages(
+    instructions: str,
+    context: str | None,
+    transcript: str,
+    output_type: sch.NoteOutputType,
+) -> list[dict[str, str]]:
+    # Configure prompt messages. The transcript (and other details of the
+    # encounter) come before the instructions, so prompts for different notes
+    # share a prefix that services can cache.
     if output_type == "Markdown":
         instructions = instructions.replace("*", "$$")
         instructions = instructions.replace("+", "$$$")
         instructions = instructions.replace("#", "$$$$")
         messages = [
             {"role": "system", "content": MARKDOWN_NOTE_SYSTEM_PROMPT},
-            {"role": "user", "content": f'Instructions:\n"""{instructions}\n"""'},
             {"role": "user", "content": f'Audio Transcript:\n"""{transcript}\n"""'},
         ]
         if context is not None and len(context.strip()) > 0:
             messages.append(
                 {"role": "user", "content": f'Other Details:\n"""{context}\n"""'}
             )
+        messages.append(
+            {"role": "user", "content": f'Instructions:\n"""{instructions}\n"""'}
+        )
     else:
         messages = [
             {"role": "system", "content": PLAINTEXT_NOTE_SYSTEM_PROMPT},
-            {"role": "user", "content": f"{instructions}\n\n{transcript}\n\n{context}"},
+            {"role": "user", "content": f"{transcript}\n\n{context}\n\n{instructions}"},
         ]
 
-    # Return the draft note segments.
-    try:
-        return service.complete(model, messages)
-    except errors.ExternalServiceError as e:
-        raise e
+    return messages
 
 
-def generate_transcript_label(model: str, transcript: str) -> sch.GenerationOutput:
+async def generate_transcript_label(
+    database: DatabaseSession, model: str, transcript: str
+) -> tuple[sch.GenerationOutput, bool]:
+    """
+    Generates a label for a transcript, returning it and whether it was
+    served from the generation cache.
+    """
     # Configure prompt messages.
     messages = [
         {"role": "system", "content": LABEL_TRANSCRIPT_SYSTEM_PROMPT},
@@ -78,8 +277,233 @@ def generate_transcript_label(model: str, transcript: str) -> sch.GenerationOutp
             f"Unable to generate label: model {model} has not been configured for use"
         )
 
-    # Return the draft note segments.
+    # Labels are generated in the background, alone on their session, so
+    # their cache's database work can be kept off the event loop.
+    return await _generate(database, service, model, messages, threadpool=True)
+
+
+async def _generate(
+    database: DatabaseSession,
+    service: GenerativeAIService,
+    model: str,
+    messages: list[dict[str, str]],
+    threadpool: bool = False,
+) -> tuple[sch.GenerationOutput, bool]:
+    """
+    Generates from the messages, or serves them from the generation cache.
+    The cache's database work runs in the threadpool if requested, which
+    requires that no other generation shares the session.
+    """
+
+    async def run_database_work(function, *args):
+        if threadpool:
+            return await run_in_threadpool(function, *args)
+
+        return function(*args)
+
+    key = _cache_key(service, model, messages)
+    cached_output = await run_database_work(get_cached_generation, database, key)
+
+    if cached_output is not None:
+        return (cached_output, True)
+
     try:
-        return service.complete(model, messages)
+        generation_output = await service.complete(model, messages)
     except errors.ExternalServiceError as e:
         raise e
+
+    generation_output.cacheKey = key
+    await run_database_work(cache_generation, database, key, generation_output)
+
+    return (generation_output, False)
+
+
+async def _replayed(output: sch.GenerationOutput) -> GenerationStream:
+    yield output.text
+    yield output
+
+
+async def _cached_on_completion(key: str, stream: GenerationStream) -> GenerationStream:
+    async for item in stream:
+        if isinstance(item, sch.GenerationOutput):
+            item.cacheKey = key
+
+            # The request's session may have closed while streaming.
+            with db.DatabaseSessionMaker() as database:
+                cache_generation(database, key, item)
+
+        yield item
+
+
+def _cache_key(
+    service: GenerativeAIService, model: str, messages: list[dict[str, str]]
+) -> str:
+    # Generation is at temperature 0, so the same prompt to the same model
+    # gives the same output. The prompts are part of the messages, so
+    # changing them changes the key.
+    rendered = json.dumps(
+        {"service": service.service_name, "model": model, "messages": messages},
+        sort_keys=True,
+    )
+
+    return hashlib.sha256(rendered.encode()).hexdigest()
+
+
+def get_cached_generation(
+    database: DatabaseSession, key: str
+) -> sch.GenerationOutput | None:
+    """
+    Returns the output of an earlier generation with the given cache key,
+    timed as generated now.
+    """
+    with ExecutionTimer() as timer:
+        cached = _generation_cache.get(key)
+
+        if cached is not None:
+            output = cached[0]
+            _save_last_used(database, key, cached)
+        elif settings.GENERATION_CACHE_DB_SIZE > 0:
+            output = _load_cached_generation(database, key)
+        else:
+            output = None
+
+    if output is None:
+        return None
+
+    return output.model_copy(
+        update={
+            "generatedAt": cast(datetime, timer.started_at),
+            "timeToGenerate": cast(int, timer.elapsed_ms),
+            "cacheKey": key,
+        }
+    )
+
+
+def _load_cached_generation(
+    database: DatabaseSession, key: str
+) -> sch.GenerationOutput | None:
+    record = database.get(CachedGeneration, key)
+
+    if record is None:
+        return None
+
+    now = datetime.now(timezone.utc).astimezone()
+
+    try:
+        record.last_used = now
+        database.commit()
+    except Exception as e:
+        database.rollback()
+        log.warning(f"Unable to update cached generation: {str(e)}")
+
+    output = sch.GenerationOutput(
+        text=record.text,
+        generatedAt=record.created,
+        service=record.service,
+        model=record.model,
+        completionTokens=record.completion_tokens,
+        promptTokens=record.prompt_tokens,
+        timeToGenerate=0,
+    )
+    _generation_cache.put(key, (output, now))
+
+    return output
+
+
+def _save_last_used(
+    database: DatabaseSession,
+    key: str,
+    cached: tuple[sch.GenerationOutput, datetime],
+) -> None:
+    """
+    Saves the use of a generation served from memory to the database, at most
+    once an interval, so that the database does not evict the generations
+    used most as if they were stale.
+    """
+    (output, last_used_saved) = cached
+    now = datetime.now(timezone.utc).astimezone()
+
+    if (
+        settings.GENERATION_CACHE_DB_SIZE <= 0
+        or now - last_used_saved < LAST_USED_SAVE_INTERVAL
+    ):
+        return
+
+    try:
+        database.execute(
+            update(CachedGeneration)
+            .where(CachedGeneration.key == key)
+            .values(last_used=now)
+        )
+        database.commit()
+        _generation_cache.put(key, (output, now))
+    except Exception as e:
+        database.rollback()
+        log.warning(f"Unable to update cached generation: {str(e)}")
+
+
+def cache_generation(
+    database: DatabaseSession, key: str, output: sch.GenerationOutput
+) -> None:
+    """
+    Saves the output of a generation with the given cache key, evicting the
+    least recently used generations once the database holds too many.
+    """
+    now = datetime.now(timezone.utc).astimezone()
+    _generation_cache.put(key, (output, now))
+
+    if settings.GENERATION_CACHE_DB_SIZE <= 0:
+        return
+
+    try:
+        database.merge(
+            CachedGeneration(
+                key=key,
+                service=output.service,
+                model=output.model,
+                text=output.text,
+                completion_tokens=output.completionTokens,
+                prompt_tokens=output.promptTokens,
+                created=now,
+                last_used=now,
+            )
+        )
+        database.commit()
+
+        # Evict all but the most recently used in one statement.
+        retained = (
+            select(CachedGeneration.key)
+            .order_by(CachedGeneration.last_used.desc())
+            .limit(settings.GENERATION_CACHE_DB_SIZE)
+        )
+        database.execute(
+            delete(CachedGeneration).where(CachedGeneration.key.not_in(retained))
+        )
+        database.commit()
+    except Exception as e:
+        database.rollback()
+        log.warning(f"Unable to cache generation: {str(e)}")
+
+
+def invalidate_cached_generations(
+    database: DatabaseSession, record_ids: list[str]
+) -> None:
+    """
+    Removes the cached output of the generations logged for the given records
+    (e.g. the draft notes of an encounter), for purging their sensitive data.
+    The deletion is committed with the caller's changes.
+
+    Only this process's memory is cleared; other replicas may serve the
+    generations from memory until they expire (see `CACHE_MEMORY_TTL`).
+    """
+    keys = set(
+        database.scalars(
+            select(db.GenerationTask.cache_key).where(
+                db.GenerationTask.record_id.in_(record_ids),
+                db.GenerationTask.cache_key.is_not(None),
+            )
+        ).all()
+    )
+
+    database.execute(delete(CachedGeneration).where(CachedGeneration.key.in_(keys)))
+    _generation_cache.discard_where(lambda key: key in keys)
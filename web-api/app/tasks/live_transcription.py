@@ -0,0 +1,105 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+
+import numpy as np
+
+from app.config.ai import transcription_service
+from app.logging import WebAPILogger
+from app.services.live_audio import SpeechWindower, StreamDecoder, pcm_to_wav
+from app.tasks.transcription import prompt_tail
+
+log = WebAPILogger(__name__)
+
+# Called with the index and transcript of each window as it is transcribed.
+PartialTranscriptCallback = Callable[[int, str], Awaitable[None]]
+
+
+class LiveTranscription:
+    """
+    Transcribes audio streamed while it is being recorded.
+
+    Audio chunks are decoded as they arrive and each window of speech is
+    transcribed as soon as it ends at a pause, prompted with the end of the
+    transcript before it, so only the last window remains to be transcribed
+    once the recording stops.
+
+    For example:
+    ```python
+        live = LiveTranscription(on_partial=send_partial)
+        await live.start()
+        await live.add_audio(chunk)
+        transcript = await live.finish()
+    ```
+    """
+
+    def __init__(self, on_partial: PartialTranscriptCallback):
+        self._on_partial = on_partial
+        self._decoder = StreamDecoder()
+        self._windower = SpeechWindower(self._decoder.pcm_format.sample_rate)
+        self._windows: asyncio.Queue[np.ndarray | None] = asyncio.Queue()
+        self._transcripts: list[str] = []
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self) -> None:
+        await self._decoder.start()
+        self._tasks = [
+            asyncio.create_task(self._window_audio()),
+            asyncio.create_task(self._transcribe_windows()),
+        ]
+
+    async def add_audio(self, chunk: bytes) -> None:
+        self._raise_if_failed()
+        await self._decoder.write(chunk)
+
+    async def finish(self) -> str:
+        "Ends the recording, returning the full transcript once complete."
+        self._decoder.end_input()
+
+        try:
+            await asyncio.gather(*self._tasks)
+        except BaseException:
+            self.abort()
+            raise
+
+        return " ".join(t for t in self._transcripts if t)
+
+    def abort(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+
+        self._decoder.kill()
+
+    def _raise_if_failed(self) -> None:
+        for task in self._tasks:
+            if task.done() and not task.cancelled() and task.exception() is not None:
+                raise task.exception()  # type: ignore
+
+    async def _window_audio(self) -> None:
+        try:
+            async for pcm in self._decoder.read():
+                for window in self._windower.add(pcm):
+                    self._windows.put_nowait(window)
+
+            window = self._windower.flush()
+            if window is not None:
+                self._windows.put_nowait(window)
+        finally:
+            self._windows.put_nowait(None)
+
+    async def _transcribe_windows(self) -> None:
+        while (window := await self._windows.get()) is not None:
+            index = len(self._transcripts)
+            previous = self._transcripts[-1] if self._transcripts else None
+
+            log.debug(f"Transcribing live window {index + 1}")
+
+            output = await transcription_service.transcribe(
+                pcm_to_wav(window, self._decoder.pcm_format),
+                f"live-{index:>03}.wav",
+                "audio/wav",
+                prompt=prompt_tail(previous),
+            )
+
+            transcript = output.transcript.strip()
+            self._transcripts.append(transcript)
+            await self._on_partial(index, transcript)
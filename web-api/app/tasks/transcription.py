@@ -1,18 +1,241 @@
+import asyncio
+import json
+from collections.abc import Callable, Coroutine, Iterable
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import BinaryIO
+from typing import BinaryIO, Literal
 
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session as DatabaseSession
+
+import app.config.db as db
 import app.errors as errors
 import app.schemas as sch
+from app.config import settings, storage
 from app.config.ai import transcription_service
+from app.config.db import CachedTranscript
 from app.logging import WebAPILogger
-from app.services.audio_processing import split_audio
+from app.services.audio_pipeline import (
+    TRANSCRIPTION_AUDIO_FORMAT,
+    TRANSCRIPTION_MEDIA_TYPE,
+)
+from app.services.audio_workers import create_transcription_audio, split_audio
+from app.services.file_validation import file_validator
+from app.utility.caching import LRUCache
 from app.utility.conversion import MB_to_bytes, bytes_to_MB, get_file_size
 
 log = WebAPILogger(__name__)
 
+# The characters from the end of a transcript used to prompt the next segment.
+PROMPT_TAIL_LENGTH = 500
+
+SegmentPrompts = Literal["chain", "tail", "none"]
+
+# Called with the number of segments transcribed and the total.
+ProgressCallback = Callable[[int, int], None]
+
+# Recently used transcripts, keyed by audio hash, service and model.
+_transcript_cache = LRUCache[tuple[str, str, str], str](
+    settings.TRANSCRIPT_CACHE_SIZE, ttl=settings.CACHE_MEMORY_TTL
+)
+
+
+async def transcribe_recording(
+    database: DatabaseSession,
+    username: str,
+    recording_id: str,
+    on_progress: ProgressCallback | None = None,
+) -> tuple[sch.TranscriptionOutput, bool]:
+    """
+    Transcribes a user's saved recording, returning the transcript and
+    whether it was served from the transcript cache.
+
+    When audio has been appended to a transcribed recording, only the new
+    segments are transcribed and joined to the transcripts of the others
+    (which keep any edits made before appending, see `append_recording`).
+    Such joined transcripts are saved with the recording but not cached.
+    """
+    get_recording = (
+        select(db.Recording)
+        .join(db.Recording.encounter)
+        .where(db.Encounter.username == username, db.Recording.id == recording_id)
+    )
+    recording = database.execute(get_recording).scalar_one_or_none()
+
+    # Recordings already transcribed by this service and model are
+    # served from the transcript cache.
+    audio_hash = (
+        await _get_audio_hash(database, username, recording)
+        if recording is not None
+        else None
+    )
+    cached_output = (
+        get_cached_transcript(database, audio_hash) if audio_hash is not None else None
+    )
+
+    segments: list[int] = (
+        json.loads(recording.segments)
+        if recording is not None and recording.segments is not None
+        else [0]
+    )
+
+    if cached_output is not None:
+        if recording is not None:
+            # Keep the segments in step, for audio appended later.
+            _save_segment_transcripts(
+                database, recording, [cached_output.transcript], segments
+            )
+        if on_progress is not None:
+            on_progress(1, 1)
+        return (cached_output, True)
+
+    segment_transcripts: list[str] = (
+        json.loads(recording.segment_transcripts)
+        if recording is not None and recording.segment_transcripts is not None
+        else []
+    )
+
+    if 0 < len(segment_transcripts) < len(segments):
+        appended_output = await _transcribe_appended_audio(
+            username,
+            recording_id,
+            segments[len(segment_transcripts)],
+            on_progress,
+        )
+
+        segment_transcripts.append(appended_output.transcript)
+        transcription_output = sch.TranscriptionOutput(
+            transcript=" ".join(t for t in segment_transcripts if t),
+            service=appended_output.service,
+        )
+    else:
+        transcription_output = await _transcribe_stored_audio(
+            username, recording_id, on_progress
+        )
+        segment_transcripts = [transcription_output.transcript]
+
+        # Only the service's own transcript of the whole audio is cached, never
+        # one joined to transcripts that may have been edited.
+        if audio_hash is not None:
+            cache_transcript(database, audio_hash, transcription_output)
+
+    if recording is not None:
+        _save_segment_transcripts(database, recording, segment_transcripts, segments)
+
+    return (transcription_output, False)
+
+
+def _save_segment_transcripts(
+    database: DatabaseSession,
+    recording: db.Recording,
+    segment_transcripts: list[str],
+    segments: list[int],
+) -> None:
+    # Segments after the first transcribed together are left empty.
+    segment_transcripts += [""] * (len(segments) - len(segment_transcripts))
+
+    try:
+        recording.segment_transcripts = json.dumps(segment_transcripts)
+        database.commit()
+    except Exception as e:
+        database.rollback()
+        log.warning(f"Unable to save segment transcripts: {str(e)}")
+
+
+async def _transcribe_stored_audio(
+    username: str, recording_id: str, on_progress: ProgressCallback | None
+) -> sch.TranscriptionOutput:
+    media_type = "audio/mpeg"
+    filename = f"{recording_id}.mp3"
+
+    try:
+        # Prefer the copy of the recording prepared for transcription,
+        # which saves decoding and resampling it again.
+        transcription_filename = f"{recording_id}.flac"
+        if storage.recording_exists(username, transcription_filename):
+            media_type = TRANSCRIPTION_MEDIA_TYPE
+            filename = transcription_filename
+
+        file_data = storage.open_recording(username, filename)
+    except Exception as e:
+        log.error(f"Error accessing recording file: {str(e)}")
+        raise errors.NotFound(f"Recording file not found: {str(e)}")
+
+    try:
+        return await transcribe_audio(
+            file_data, filename, media_type, on_progress=on_progress
+        )
+    finally:
+        file_data.close()
+
+
+async def _transcribe_appended_audio(
+    username: str,
+    recording_id: str,
+    start: int,
+    on_progress: ProgressCallback | None,
+) -> sch.TranscriptionOutput:
+    "Transcribes the stored recording from the start (in ms) of appended audio."
+    try:
+        file_data = storage.open_recording(username, f"{recording_id}.mp3")
+    except Exception as e:
+        log.error(f"Error accessing recording file: {str(e)}")
+        raise errors.NotFound(f"Recording file not found: {str(e)}")
+
+    try:
+        appended_audio = await create_transcription_audio(file_data, start=start)
+    finally:
+        file_data.close()
+
+    try:
+        return await transcribe_audio(
+            appended_audio,
+            f"{recording_id}-{start}.{TRANSCRIPTION_AUDIO_FORMAT}",
+            TRANSCRIPTION_MEDIA_TYPE,
+            on_progress=on_progress,
+        )
+    finally:
+        appended_audio.close()
+
+
+async def _get_audio_hash(
+    database: DatabaseSession, username: str, recording: db.Recording
+) -> str | None:
+    """
+    Returns the hash of a recording's stored audio, calculating it for
+    recordings saved before hashes were recorded. Returns None if its
+    audio cannot be read.
+    """
+    if recording.audio_hash is None:
+        try:
+            # The whole recording is read (perhaps from S3) and hashed, so
+            # off the event loop.
+            recording.audio_hash = await asyncio.to_thread(
+                _hash_stored_audio, username, recording.id
+            )
+            database.commit()
+        except Exception as e:
+            database.rollback()
+            log.warning(f"Unable to hash recording {recording.id}: {str(e)}")
+            return None
+
+    return recording.audio_hash
+
+
+def _hash_stored_audio(username: str, recording_id: str) -> str:
+    audio = storage.open_recording(username, f"{recording_id}.mp3")
+
+    try:
+        return file_validator.calculate_file_hash(audio)
+    finally:
+        audio.close()
+
 
 async def transcribe_audio(
-    audio: BinaryIO, filename: str, content_type: str
+    audio: BinaryIO,
+    filename: str,
+    content_type: str,
+    on_progress: ProgressCallback | None = None,
 ) -> sch.TranscriptionOutput:
     try:
         file_size = get_file_size(audio)
@@ -23,31 +246,32 @@ async def transcribe_audio(
             transcription_output = await transcription_service.transcribe(
                 audio, filename, content_type
             )
+
+            if on_progress is not None:
+                on_progress(1, 1)
         else:
             log.warning(
-                f"{bytes_to_MB(file_size):.2f} MB"
+                f"{bytes_to_MB(file_size):.2f} MB "
                 "will be split and transcribed in segments"
             )
 
-            segments: list[sch.TranscriptionOutput] = []
-
-            for i, audio_segment in enumerate(split_audio(audio)):
-                log.debug(f"Transcribing segment {i+1}")
-
-                (segment_file, audio_format) = audio_segment
-                segment_content_type = f"audio/{audio_format}"
-                segment_filename = f"{Path(filename).stem}-{i:>03}.{audio_format}"
-                previous_transcript_segment = (
-                    segments[i - 1].transcript if i > 1 else None
-                )
+            # Keep transcription audio in its format when splitting it.
+            audio_segments = await split_audio(
+                audio,
+                format=(
+                    TRANSCRIPTION_AUDIO_FORMAT
+                    if content_type == TRANSCRIPTION_MEDIA_TYPE
+                    else settings.DEFAULT_AUDIO_FORMAT
+                ),
+            )
 
-                segment = await transcription_service.transcribe(
-                    segment_file,
-                    segment_filename,
-                    segment_content_type,
-                    prompt=previous_transcript_segment,
+            try:
+                segments = await transcribe_segments(
+                    audio_segments, filename, on_progress=on_progress
                 )
-                segments.append(segment)
+            finally:
+                for segment_file, _ in audio_segments:
+                    segment_file.close()
 
             transcription_output = sch.TranscriptionOutput(
                 transcript=" ".join([s.transcript for s in segments]),
@@ -58,3 +282,167 @@ async def transcribe_audio(
         raise e
 
     return transcription_output
+
+
+async def transcribe_segments(
+    audio_segments: list[tuple[BinaryIO, str]],
+    filename: str,
+    prompts: SegmentPrompts = settings.TRANSCRIPTION_SEGMENT_PROMPTS,
+    concurrency: int = settings.TRANSCRIPTION_SEGMENT_CONCURRENCY,
+    on_progress: ProgressCallback | None = None,
+) -> list[sch.TranscriptionOutput]:
+    """
+    Transcribes sequential segments of a recording, returning their
+    transcripts in order.
+
+    With "chain" prompts each segment is prompted with the transcript of the
+    one before it, so they are transcribed one at a time. Otherwise up to
+    `concurrency` segments are transcribed at once. With "tail" prompts, the
+    even segments are transcribed first, and each odd segment is then
+    prompted with the end of the transcript of the segment before it.
+
+    Progress is reported as each segment completes, if a callback is given.
+    """
+    semaphore = asyncio.Semaphore(1 if prompts == "chain" else max(1, concurrency))
+    transcripts: list[sch.TranscriptionOutput | None] = [None] * len(audio_segments)
+
+    if on_progress is not None:
+        on_progress(0, len(audio_segments))
+
+    async def transcribe_segment(i: int, prompt: str | None):
+        (segment_file, audio_format) = audio_segments[i]
+
+        async with semaphore:
+            log.debug(f"Transcribing segment {i+1}")
+
+            transcripts[i] = await transcription_service.transcribe(
+                segment_file,
+                f"{Path(filename).stem}-{i:>03}.{audio_format}",
+                f"audio/{audio_format}",
+                prompt=prompt,
+            )
+
+        if on_progress is not None:
+            on_progress(
+                sum(1 for t in transcripts if t is not None), len(audio_segments)
+            )
+
+    def previous_transcript(i: int) -> str | None:
+        previous = transcripts[i - 1] if i > 0 else None
+        return previous.transcript if previous is not None else None
+
+    if prompts == "chain":
+        for i in range(len(audio_segments)):
+            await transcribe_segment(i, previous_transcript(i))
+    elif prompts == "tail":
+        await _gather(
+            transcribe_segment(i, None) for i in range(0, len(audio_segments), 2)
+        )
+        await _gather(
+            transcribe_segment(i, prompt_tail(previous_transcript(i)))
+            for i in range(1, len(audio_segments), 2)
+        )
+    else:
+        await _gather(transcribe_segment(i, None) for i in range(len(audio_segments)))
+
+    return [t for t in transcripts if t is not None]
+
+
+def prompt_tail(transcript: str | None) -> str | None:
+    "Returns the end of a transcript, starting from a whole word."
+    if not transcript or len(transcript) <= PROMPT_TAIL_LENGTH:
+        return transcript or None
+
+    tail = transcript[-PROMPT_TAIL_LENGTH:]
+    (_, _, words) = tail.partition(" ")
+    return words or tail
+
+
+async def _gather(coroutines: Iterable[Coroutine]) -> None:
+    "Runs the coroutines concurrently, cancelling the rest if any fail."
+    tasks = [asyncio.ensure_future(c) for c in coroutines]
+
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+
+def _cache_key(audio_hash: str) -> tuple[str, str, str]:
+    return (
+        audio_hash,
+        transcription_service.service_name,
+        transcription_service.model_name,
+    )
+
+
+def get_cached_transcript(
+    database: DatabaseSession, audio_hash: str
+) -> sch.TranscriptionOutput | None:
+    """
+    Returns the transcript of the audio with the given hash if the current
+    transcription service and model have transcribed it before.
+    """
+    key = _cache_key(audio_hash)
+    (_, service, model) = key
+
+    transcript = _transcript_cache.get(key)
+
+    if transcript is None:
+        transcript = database.execute(
+            select(CachedTranscript.transcript).where(
+                CachedTranscript.audio_hash == audio_hash,
+                CachedTranscript.service == service,
+                CachedTranscript.model == model,
+            )
+        ).scalar_one_or_none()
+
+        if transcript is None:
+            return None
+
+        _transcript_cache.put(key, transcript)
+
+    return sch.TranscriptionOutput(transcript=transcript, service=service)
+
+
+def cache_transcript(
+    database: DatabaseSession, audio_hash: str, output: sch.TranscriptionOutput
+) -> None:
+    "Saves the transcript of the audio with the given hash."
+    key = _cache_key(audio_hash)
+    (_, service, model) = key
+
+    try:
+        database.merge(
+            CachedTranscript(
+                audio_hash=audio_hash,
+                service=service,
+                model=model,
+                transcript=output.transcript,
+                created=datetime.now(timezone.utc).astimezone(),
+            )
+        )
+        database.commit()
+    except Exception as e:
+        database.rollback()
+        log.warning(f"Unable to cache transcript: {str(e)}")
+        return
+
+    _transcript_cache.put(key, output.transcript)
+
+
+def invalidate_cached_transcripts(database: DatabaseSession, audio_hash: str) -> None:
+    """
+    Removes the cached transcripts of the audio with the given hash, by any
+    service and model, for purging a recording's sensitive data. The deletion
+    is committed with the caller's changes.
+
+    Only this process's memory is cleared; other replicas may serve the
+    transcripts from memory until they expire (see `CACHE_MEMORY_TTL`).
+    """
+    database.execute(
+        delete(CachedTranscript).where(CachedTranscript.audio_hash == audio_hash)
+    )
+    _transcript_cache.discard_where(lambda key: key[0] == audio_hash)
@@ -0,0 +1,245 @@
+"""
+Transcribes saved recordings in the background, so that long transcriptions
+do not hold a request open. Job state is kept in the database, so any
+replica of the API can report on a job started by another.
+
+Running jobs refresh their modified time as a heartbeat. Jobs that stop
+beating (as when the replica running them is stopped) are failed when next
+read, by whichever replica reads them.
+"""
+
+import asyncio
+import traceback
+from collections.abc import AsyncIterator
+from datetime import datetime, timedelta, timezone
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.exc import NoResultFound
+
+import app.config.db as db
+import app.errors as errors
+import app.schemas as sch
+from app.config import settings
+from app.logging import WebAPILogger, log_error, log_transcription
+from app.schemas import WebAPISession
+from app.tasks.transcription import transcribe_recording
+from app.utility.conversion import ConvertToSchema
+from app.utility.timing import ExecutionTimer
+
+log = WebAPILogger(__name__)
+
+EVENT_POLL_INTERVAL = 1.0  # Seconds between checks for job changes
+EVENT_KEEPALIVE_INTERVAL = 15.0  # Seconds without events before a keep-alive
+JOB_HEARTBEAT_INTERVAL = 30.0  # Seconds between heartbeats of running jobs
+JOB_STALE_AFTER = 120.0  # Seconds without a heartbeat before a job is failed
+
+# Jobs running in this process, referenced until they finish.
+_running_jobs: set[asyncio.Task] = set()
+
+
+def start_transcription_job(
+    database: db.DatabaseSession, session: WebAPISession, recording_id: str
+) -> db.TranscriptionJob:
+    "Saves a new transcription job for a recording and starts running it."
+    now = datetime.now(timezone.utc).astimezone()
+
+    job = db.TranscriptionJob(
+        id=db.next_sqid(database),
+        username=session.username,
+        recording_id=recording_id,
+        status="QUEUED",
+        segments_completed=0,
+        created=now,
+        modified=now,
+        session_id=session.sessionId,
+    )
+
+    try:
+        database.add(job)
+        database.commit()
+    except Exception as e:
+        raise errors.DatabaseError(str(e))
+
+    task = asyncio.create_task(_run_transcription_job(job.id, session))
+    _running_jobs.add(task)
+    task.add_done_callback(_running_jobs.discard)
+
+    return job
+
+
+def get_transcription_job(
+    database: db.DatabaseSession, username: str, job_id: str
+) -> db.TranscriptionJob:
+    try:
+        get_job = select(db.TranscriptionJob).where(
+            db.TranscriptionJob.username == username,
+            db.TranscriptionJob.id == job_id,
+        )
+
+        job = database.execute(get_job).scalar_one()
+    except NoResultFound:
+        raise errors.NotFound("Transcription job not found")
+
+    _fail_if_stale(database, job)
+
+    return job
+
+
+def _fail_if_stale(database: db.DatabaseSession, job: db.TranscriptionJob) -> None:
+    "Fails an unfinished job whose heartbeat has stopped."
+    now = datetime.now(timezone.utc).astimezone()
+    stale_before = now - timedelta(seconds=JOB_STALE_AFTER)
+
+    # Times read back without a time zone were saved in local time.
+    unfinished = job.status in ("QUEUED", "RUNNING")
+    if not unfinished or job.modified.astimezone() > stale_before:
+        return
+
+    log.warning(f"Transcription job {job.id} stopped responding")
+
+    try:
+        job.status = "FAILED"
+        job.error_message = "Transcription was interrupted"
+        job.modified = now
+        database.commit()
+    except Exception as e:
+        database.rollback()
+        raise errors.DatabaseError(str(e))
+
+
+async def transcription_job_events(username: str, job_id: str) -> AsyncIterator[str]:
+    """
+    Yields Server-Sent Events for a transcription job: a "progress" event
+    whenever it changes, then a "completed" or "failed" event to finish.
+    Comments are sent while it is idle to keep the connection alive.
+    Jobs that stop responding are failed, so every stream comes to an end.
+    """
+    last_modified: datetime | None = None
+    idle_time = 0.0
+
+    while True:
+        job = await run_in_threadpool(_read_transcription_job, username, job_id)
+
+        if job.modified != last_modified:
+            last_modified = job.modified
+            idle_time = 0.0
+            finished = job.status in ("COMPLETED", "FAILED")
+            event = job.status.lower() if finished else "progress"
+
+            yield f"event: {event}\ndata: {job.model_dump_json()}\n\n"
+
+            if finished:
+                return
+        elif idle_time >= EVENT_KEEPALIVE_INTERVAL:
+            idle_time = 0.0
+            yield ": keep-alive\n\n"
+
+        await asyncio.sleep(EVENT_POLL_INTERVAL)
+        idle_time += EVENT_POLL_INTERVAL
+
+
+def _read_transcription_job(username: str, job_id: str) -> sch.TranscriptionJob:
+    with db.DatabaseSessionMaker() as database:
+        return ConvertToSchema.transcription_job(
+            get_transcription_job(database, username, job_id)
+        )
+
+
+async def cancel_transcription_jobs() -> None:
+    "Stops the jobs running in this process, marking them as failed."
+    for task in list(_running_jobs):
+        task.cancel()
+
+    await asyncio.gather(*_running_jobs, return_exceptions=True)
+
+
+async def _run_transcription_job(job_id: str, session: WebAPISession) -> None:
+    with db.DatabaseSessionMaker() as database:
+        job = database.get_one(db.TranscriptionJob, job_id)
+
+        def update(**changes) -> None:
+            for name, value in changes.items():
+                setattr(job, name, value)
+
+            job.modified = datetime.now(timezone.utc).astimezone()
+            database.commit()
+
+        def save_progress(**changes) -> None:
+            try:
+                update(**changes)
+            except Exception as e:
+                database.rollback()
+                log.warning(f"Unable to save progress of job {job_id}: {str(e)}")
+
+        def on_progress(completed: int, total: int) -> None:
+            save_progress(segments_completed=completed, segments_total=total)
+
+        async def beat() -> None:
+            while True:
+                await asyncio.sleep(JOB_HEARTBEAT_INTERVAL)
+                save_progress()
+
+        update(status="RUNNING")
+        timer = ExecutionTimer()
+
+        try:
+            with timer:
+                heartbeat = asyncio.create_task(beat())
+                try:
+                    (transcription_output, cached) = await transcribe_recording(
+                        database, session.username, job.recording_id, on_progress
+                    )
+                finally:
+                    heartbeat.cancel()
+
+            update(status="COMPLETED", transcript=transcription_output.transcript)
+
+            log_transcription(
+                database=database,
+                recording_id=job.recording_id,
+                timer=timer,
+                service=settings.TRANSCRIPTION_SERVICE,
+                cached=cached,
+                session=session,
+            )
+        except (Exception, asyncio.CancelledError) as ex:
+            transcription_error = (
+                ex
+                if isinstance(ex, errors.WebAPIException)
+                else errors.WebAPIException(
+                    "Transcription was interrupted"
+                    if isinstance(ex, asyncio.CancelledError)
+                    else str(ex)
+                )
+            )
+
+            database.rollback()
+            update(
+                status="FAILED",
+                error_id=transcription_error.uuid,
+                error_message=transcription_error.message,
+            )
+
+            log_error(
+                occurred=datetime.now(timezone.utc).astimezone(),
+                name=transcription_error.name,
+                message=transcription_error.message,
+                stack_trace=" ".join(
+                    traceback.TracebackException.from_exception(ex).format()
+                ),
+                error_id=transcription_error.uuid,
+                session=session,
+            )
+
+            log_transcription(
+                database=database,
+                recording_id=job.recording_id,
+                timer=timer,
+                service=settings.TRANSCRIPTION_SERVICE,
+                error=transcription_error,
+                session=session,
+            )
+
+            if isinstance(ex, asyncio.CancelledError):
+                raise
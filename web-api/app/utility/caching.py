@@ -0,0 +1,68 @@
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Generic, TypeVar
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """
+    A thread-safe mapping of bounded size, which evicts the least recently
+    used entries once full. A maximum size of 0 disables the cache. Given a
+    time to live (in seconds), entries also expire that long after being put.
+
+    For example:
+    ```python
+        cache = LRUCache[str, int](max_size=128)
+        cache.put("key", 1)
+        value = cache.get("key")
+    ```
+    """
+
+    def __init__(self, max_size: int, ttl: float | None = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        # Each value with the time it was put.
+        self._entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: K) -> V | None:
+        with self._lock:
+            if key not in self._entries:
+                return None
+
+            (put_at, value) = self._entries[key]
+            if self.ttl is not None and time.monotonic() - put_at >= self.ttl:
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: K, value: V) -> None:
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: K) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def discard_where(self, predicate: Callable[[K], bool]) -> None:
+        "Removes every entry whose key matches the predicate."
+        with self._lock:
+            for key in [k for k in self._entries if predicate(k)]:
+                del self._entries[key]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
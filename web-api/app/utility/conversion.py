@@ -1,6 +1,6 @@
 import json
 import math
-from typing import BinaryIO
+from typing import BinaryIO, cast
 
 import app.config.db as db
 import app.schemas as sch
@@ -100,6 +100,21 @@ class ConvertToSchema:
             transcript=db_record.transcript,
         )
 
+    @staticmethod
+    def transcription_job(db_record: db.TranscriptionJob):
+        return sch.TranscriptionJob(
+            id=db_record.id,
+            recordingId=db_record.recording_id,
+            status=cast(sch.TranscriptionJobStatus, db_record.status),
+            segmentsCompleted=db_record.segments_completed,
+            segmentsTotal=db_record.segments_total,
+            transcript=db_record.transcript,
+            errorId=db_record.error_id,
+            errorMessage=db_record.error_message,
+            created=db_record.created,
+            modified=db_record.modified,
+        )
+
     @staticmethod
     def user_info(db_record: db.User):
         return sch.UserInfo(
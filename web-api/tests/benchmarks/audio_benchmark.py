@@ -0,0 +1,357 @@
+"""
+Benchmarks the audio processing subsystem on synthetic long-form recordings.
+
+Recordings of speech-like audio with pauses are generated for each duration,
+channel count and container, and each operation is timed in a fresh process
+so that its peak memory use (and that of the ffmpeg processes it starts) can
+be measured in isolation. Results are written as JSON.
+
+Run from the web-api folder (ffmpeg must be installed):
+
+    python -m tests.benchmarks.audio_benchmark --output benchmark.json
+    python -m tests.benchmarks.audio_benchmark --durations 1 15 --channels 1 \\
+        --containers webm --operations compute_peaks split_audio
+
+This module is not collected by pytest.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+SAMPLE_RATE = 48000
+CHUNK_SECONDS = 10
+APPENDED_MINUTES = 1
+
+DURATIONS = [1, 15, 60, 120]  # Minutes
+CHANNELS = [1, 2]
+CONTAINERS = {
+    "webm": ["-c:a", "libopus", "-b:a", "64k"],
+    "mp4": ["-c:a", "aac", "-b:a", "96k"],
+    "wav": ["-c:a", "pcm_s16le"],
+}
+OPERATIONS = [
+    "reformat_audio",
+    "ingest_audio",
+    "append_audio",
+    "compute_peaks",
+    "split_audio",
+    "get_duration",
+]
+
+
+# ----------------------------------
+# SYNTHETIC AUDIO
+
+
+def speech_like_audio(
+    minutes: float, channels: int, seed: int = 0
+) -> Iterator[np.ndarray]:
+    """
+    Yields 16-bit PCM chunks (frames x channels) of speech-like audio:
+    voiced "utterances" with a varying pitch and syllable rhythm, separated
+    by short pauses and, roughly every minute, a longer silence.
+    """
+    rng = np.random.default_rng(seed)
+    total_frames = int(minutes * 60 * SAMPLE_RATE)
+    chunk_frames = CHUNK_SECONDS * SAMPLE_RATE
+
+    # The pattern of speech and silence, at 10 ms resolution.
+    step = SAMPLE_RATE // 100
+    activity = np.zeros(total_frames // step + 1, dtype=bool)
+    amplitude = np.zeros(len(activity))
+    pitch = np.zeros(len(activity))
+    position = 0
+
+    while position < len(activity):
+        speaking = int(rng.uniform(30, 300))
+        activity[position : position + speaking] = True
+        amplitude[position : position + speaking] = rng.uniform(0.1, 0.6)
+        pitch[position : position + speaking] = rng.uniform(90, 250)
+        position += speaking
+
+        long_pause = rng.random() < 0.02
+        position += int(rng.uniform(200, 400) if long_pause else rng.uniform(20, 150))
+
+    phase = 0.0
+
+    for start in range(0, total_frames, chunk_frames):
+        frames = min(chunk_frames, total_frames - start)
+        index = (start + np.arange(frames)) // step
+        t = (start + np.arange(frames)) / SAMPLE_RATE
+
+        # Harmonics of the pitch, modulated at a syllable rate of ~4 Hz.
+        frequency = pitch[index]
+        phases = phase + np.cumsum(2 * np.pi * frequency / SAMPLE_RATE)
+        phase = float(phases[-1]) if frames > 0 else phase
+        voiced = (
+            np.sin(phases) + 0.5 * np.sin(2 * phases) + 0.25 * np.sin(3 * phases)
+        )
+        syllables = 0.5 * (1 + np.sin(2 * np.pi * 4 * t))
+        envelope = np.where(activity[index], amplitude[index] * syllables, 0.0)
+
+        noise = rng.normal(0, 1, frames)
+        signal = envelope * (0.6 * voiced + 0.1 * noise) + 0.0005 * noise
+
+        samples = np.clip(signal * 32767 / 1.5, -32768, 32767).astype(np.int16)
+        yield np.repeat(samples[:, None], channels, axis=1)
+
+
+def generate_recording(
+    path: Path, minutes: float, channels: int, container: str, seed: int = 0
+) -> None:
+    "Encodes synthetic speech-like audio into a file of the given container."
+    process = subprocess.Popen(
+        [
+            "ffmpeg",
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-y",
+            "-f",
+            "s16le",
+            "-ar",
+            str(SAMPLE_RATE),
+            "-ac",
+            str(channels),
+            "-i",
+            "pipe:0",
+            *CONTAINERS[container],
+            str(path),
+        ],
+        stdin=subprocess.PIPE,
+    )
+
+    try:
+        for chunk in speech_like_audio(minutes, channels, seed):
+            process.stdin.write(chunk.tobytes())
+    finally:
+        process.stdin.close()
+
+    if process.wait() != 0:
+        raise RuntimeError(f"Unable to generate {path}")
+
+
+# ----------------------------------
+# OPERATIONS
+# Each runs in a fresh worker process, given the paths of its inputs.
+
+
+def _peak_rss(usage: resource.struct_rusage) -> int:
+    "Returns the peak resident set size in bytes (reported in KB on Linux)."
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+
+def _run_operation(operation: str, paths: dict[str, str]) -> dict:
+    from app.config import settings
+    from app.services import audio_processing
+
+    format = settings.DEFAULT_AUDIO_FORMAT
+    bitrate = settings.DEFAULT_AUDIO_BITRATE
+
+    started = time.perf_counter()
+
+    if operation == "reformat_audio":
+        with open(paths["input"], "rb") as original:
+            (reformatted, _) = audio_processing.reformat_audio(
+                original, format, bitrate
+            )
+            reformatted.close()
+    elif operation == "ingest_audio":
+        with open(paths["input"], "rb") as original:
+            audio_processing.ingest_audio(original, format, bitrate).audio.close()
+    elif operation == "append_audio":
+        with open(paths["stored"], "rb") as original, open(
+            paths["appended"], "rb"
+        ) as new:
+            (combined, _) = audio_processing.append_audio(
+                original, new, format, bitrate
+            )
+            combined.close()
+    elif operation == "compute_peaks":
+        with open(paths["stored"], "rb") as audio:
+            audio_processing.compute_peaks(audio)
+    elif operation == "split_audio":
+        with open(paths["stored"], "rb") as audio:
+            for segment, _ in audio_processing.split_audio(
+                audio, audio_processing.DEFAULT_MAX_SPLIT_DURATION, format, bitrate
+            ):
+                segment.close()
+    elif operation == "get_duration":
+        for key in ("input", "stored"):
+            with open(paths[key], "rb") as audio:
+                audio_processing.get_duration(audio)
+    else:
+        raise ValueError(f"Unknown operation: {operation}")
+
+    wall_time = time.perf_counter() - started
+
+    return {
+        "wall_time": wall_time,
+        "peak_rss": _peak_rss(resource.getrusage(resource.RUSAGE_SELF)),
+        "peak_child_rss": _peak_rss(resource.getrusage(resource.RUSAGE_CHILDREN)),
+    }
+
+
+def _store_recording(input_path: Path, stored_path: Path) -> None:
+    "Converts a generated recording into the stored format, as on upload."
+    from app.config import settings
+    from app.services import audio_processing
+
+    with open(input_path, "rb") as original, open(stored_path, "wb") as output:
+        audio_processing.ingest_audio(
+            original,
+            settings.DEFAULT_AUDIO_FORMAT,
+            settings.DEFAULT_AUDIO_BITRATE,
+            output,
+        )
+
+
+def run_isolated(function, *args):
+    "Runs the function in a fresh process, so measurements are not shared."
+    with ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        return executor.submit(function, *args).result()
+
+
+# ----------------------------------
+# BENCHMARK
+
+
+def _ffmpeg_version() -> str | None:
+    try:
+        output = subprocess.run(
+            ["ffmpeg", "-version"], capture_output=True, text=True
+        ).stdout
+        return output.splitlines()[0] if output else None
+    except OSError:
+        return None
+
+
+def run_benchmark(
+    durations: list[float],
+    channels: list[int],
+    containers: list[str],
+    operations: list[str],
+    workdir: Path,
+) -> dict:
+    results = []
+
+    for minutes in durations:
+        for channel_count in channels:
+            for container in containers:
+                name = f"speech-{minutes:g}min-{channel_count}ch"
+                paths = {
+                    "input": workdir / f"{name}.{container}",
+                    "appended": workdir / f"appended-{channel_count}ch.{container}",
+                    "stored": workdir / f"{name}-{container}.stored.mp3",
+                }
+
+                # Generated recordings are reused from the work folder.
+                if not paths["input"].exists():
+                    generate_recording(
+                        paths["input"], minutes, channel_count, container
+                    )
+                if not paths["appended"].exists():
+                    generate_recording(
+                        paths["appended"],
+                        APPENDED_MINUTES,
+                        channel_count,
+                        container,
+                        seed=1,
+                    )
+                if not paths["stored"].exists():
+                    run_isolated(_store_recording, paths["input"], paths["stored"])
+
+                for operation in operations:
+                    result = {
+                        "operation": operation,
+                        "duration_minutes": minutes,
+                        "channels": channel_count,
+                        "container": container,
+                        "input_size": paths["input"].stat().st_size,
+                    }
+
+                    try:
+                        result.update(
+                            run_isolated(
+                                _run_operation,
+                                operation,
+                                {key: str(path) for key, path in paths.items()},
+                            )
+                        )
+                    except Exception as e:
+                        result["error"] = str(e)
+
+                    print(json.dumps(result), file=sys.stderr)
+                    results.append(result)
+
+    return {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "ffmpeg": _ffmpeg_version(),
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--durations", nargs="+", type=float, default=DURATIONS)
+    parser.add_argument("--channels", nargs="+", type=int, default=CHANNELS)
+    parser.add_argument(
+        "--containers", nargs="+", choices=list(CONTAINERS), default=list(CONTAINERS)
+    )
+    parser.add_argument(
+        "--operations", nargs="+", choices=OPERATIONS, default=OPERATIONS
+    )
+    parser.add_argument(
+        "--workdir",
+        type=Path,
+        help="Folder to keep generated recordings in between runs",
+    )
+    parser.add_argument("--output", type=Path, help="Defaults to standard output")
+    args = parser.parse_args()
+
+    if shutil.which("ffmpeg") is None:
+        parser.error("ffmpeg is required")
+
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix="audio-benchmark-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+
+    try:
+        report = run_benchmark(
+            args.durations, args.channels, args.containers, args.operations, workdir
+        )
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+
+    if args.output is not None:
+        args.output.write_text(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -22,6 +22,7 @@ os.makedirs("static", exist_ok=True)
 sys.modules.setdefault("boto3", MagicMock())
 sys.modules.setdefault("botocore", MagicMock())
 sys.modules.setdefault("botocore.exceptions", MagicMock())
+sys.modules.setdefault("botocore.config", MagicMock())
 
 # Audio processing
 sys.modules.setdefault("pydub", MagicMock())
@@ -29,7 +30,6 @@ sys.modules.setdefault("pydub.silence", MagicMock())
 
 # ML / transcription dependencies
 sys.modules.setdefault("librosa", MagicMock())
-sys.modules.setdefault("numpy", MagicMock())
 sys.modules.setdefault("transformers", MagicMock())
 sys.modules.setdefault("speechbrain", MagicMock())
 sys.modules.setdefault("whisperx", MagicMock())
@@ -41,6 +41,8 @@ sys.modules.setdefault("magic", MagicMock())
 # HTTP / AI client libraries
 sys.modules.setdefault("aiohttp", MagicMock())
 sys.modules.setdefault("openai", MagicMock())
+sys.modules.setdefault("openai.types", MagicMock())
+sys.modules.setdefault("openai.types.chat", MagicMock())
 sys.modules.setdefault("requests", MagicMock())
 
 # parakeet_mlx is only available on Apple Silicon and may not be installed
@@ -34,6 +34,53 @@ async def test_update_encounter_label(client, auth_headers, seed_data):
     assert body["label"] == "Updated Label"
 
 
+@pytest.mark.asyncio
+async def test_update_transcript_labels_off_the_event_loop(
+    client, auth_headers, seed_data, db_session, monkeypatch
+):
+    import threading
+    from datetime import datetime, timezone
+
+    import app.routers.encounters as encounters
+    import app.schemas as sch
+    from app.config.db import Encounter
+
+    async def generate_transcript_label(database, model, transcript):
+        output = sch.GenerationOutput(
+            text="Follow-up visit",
+            generatedAt=datetime.now(timezone.utc),
+            service="Fake",
+            model=model,
+            completionTokens=1,
+            promptTokens=1,
+            timeToGenerate=1,
+        )
+        return (output, False)
+
+    logged_on = []
+    monkeypatch.setattr(
+        encounters, "generate_transcript_label", generate_transcript_label
+    )
+    monkeypatch.setattr(
+        encounters,
+        "log_generation",
+        lambda **kwargs: logged_on.append(threading.current_thread()),
+    )
+
+    response = await client.patch(
+        f"/encounters/{seed_data['encounter_id']}",
+        json={"transcript": "An edited transcript."},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+
+    db_session.expire_all()
+    assert db_session.get(Encounter, seed_data["encounter_id"]).autolabel == (
+        "Follow-up visit"
+    )
+    assert logged_on and logged_on[0] is not threading.main_thread()
+
+
 @pytest.mark.asyncio
 async def test_delete_encounter(client, auth_headers, seed_data):
     enc_id = seed_data["encounter_id"]
@@ -49,6 +96,112 @@ async def test_delete_encounter(client, auth_headers, seed_data):
     assert list_resp.json()["data"] == []
 
 
+@pytest.mark.asyncio
+async def test_delete_encounter_removes_transcription_audio(
+    client, auth_headers, seed_data, monkeypatch
+):
+    import app.config.db as db
+
+    deleted = []
+    monkeypatch.setattr(
+        db, "delete_recording", lambda username, filename: deleted.append(filename)
+    )
+
+    response = await client.delete(
+        f"/encounters/{seed_data['encounter_id']}",
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    assert deleted == [
+        f"{seed_data['recording_id']}.mp3",
+        f"{seed_data['recording_id']}.flac",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_delete_encounter_removes_cached_transcripts(
+    client, auth_headers, seed_data, db_session
+):
+    from datetime import datetime, timezone
+
+    from app.config.db import CachedTranscript, Recording
+
+    audio_hash = "a" * 64
+    db_session.get(Recording, seed_data["recording_id"]).audio_hash = audio_hash
+    db_session.add(
+        CachedTranscript(
+            audio_hash=audio_hash,
+            service="Parakeet MLX",
+            model="parakeet",
+            transcript="This is a test transcript.",
+            created=datetime.now(timezone.utc),
+        )
+    )
+    db_session.commit()
+
+    response = await client.delete(
+        f"/encounters/{seed_data['encounter_id']}",
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+
+    db_session.expire_all()
+    assert db_session.query(CachedTranscript).count() == 0
+    assert db_session.get(Recording, seed_data["recording_id"]).audio_hash is None
+
+
+@pytest.mark.asyncio
+async def test_delete_encounter_removes_cached_generations(
+    client, auth_headers, seed_data, db_session
+):
+    from datetime import datetime, timezone
+
+    from app.config.db import CachedGeneration, GenerationTask
+
+    now = datetime.now(timezone.utc)
+    for record_id, key in [
+        (seed_data["draft_note_id"], "a" * 64),
+        (seed_data["recording_id"], "b" * 64),
+        ("OTHERNOTE", "c" * 64),
+    ]:
+        db_session.add(
+            CachedGeneration(
+                key=key,
+                service="Ollama",
+                model="llama3.1:8b",
+                text="Generated.",
+                completion_tokens=1,
+                prompt_tokens=1,
+                created=now,
+                last_used=now,
+            )
+        )
+        db_session.add(
+            GenerationTask(
+                task_id=key[:36],
+                record_id=record_id,
+                task_type="GENERATE NOTE",
+                started=now,
+                time=1,
+                service="Ollama",
+                model="llama3.1:8b",
+                completion_tokens=1,
+                prompt_tokens=1,
+                cache_key=key,
+            )
+        )
+    db_session.commit()
+
+    response = await client.delete(
+        f"/encounters/{seed_data['encounter_id']}",
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+
+    db_session.expire_all()
+    assert [c.key for c in db_session.query(CachedGeneration)] == ["c" * 64]
+
+
 @pytest.mark.asyncio
 async def test_create_draft_note(client, auth_headers, seed_data):
     enc_id = seed_data["encounter_id"]
@@ -89,3 +242,117 @@ async def test_delete_draft_note(client, auth_headers, seed_data):
     enc = list_resp.json()["data"][0]
     active_ids = [n["id"] for n in enc["draftNotes"]]
     assert note_id not in active_ids
+
+
+@pytest.fixture()
+def accept_uploads(monkeypatch):
+    """Accept any uploaded audio, as file type detection is unavailable."""
+    from app.services.file_validation import file_validator
+
+    monkeypatch.setattr(
+        file_validator, "validate_audio_file", lambda file, filename: (True, "")
+    )
+
+
+@pytest.fixture()
+def saturated_audio_workers(monkeypatch, accept_uploads):
+    """Replace the audio worker pool with one whose workers and queue are
+    all taken by jobs that block until the test ends."""
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    import app.services.audio_workers as audio_workers
+
+    class ThreadedAudioWorkerPool(audio_workers.AudioWorkerPool):
+        def _create_executor(self):
+            return ThreadPoolExecutor(max_workers=self.workers)
+
+    pool = ThreadedAudioWorkerPool(workers=1, queue_limit=1)
+    release = threading.Event()
+    jobs = [pool._submit(release.wait) for _ in range(2)]
+    monkeypatch.setattr(audio_workers, "audio_worker_pool", pool)
+
+    yield pool
+
+    release.set()
+    for job in jobs:
+        job.result()
+    pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_create_encounter_when_audio_workers_busy(
+    client, auth_headers, saturated_audio_workers
+):
+    response = await client.post(
+        "/encounters",
+        files={"audio": ("recording.mp3", b"ID3" + bytes(1024), "audio/mpeg")},
+        headers=auth_headers,
+    )
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"]
+    assert response.json()["detail"]["name"] == "Service Busy"
+    assert saturated_audio_workers.metrics().rejected == 1
+
+
+@pytest.mark.asyncio
+async def test_append_recording_when_audio_workers_busy(
+    client, auth_headers, seed_data, saturated_audio_workers, monkeypatch, tmp_path
+):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "RECORDINGS_FOLDER", str(tmp_path))
+    recording_path = tmp_path / seed_data["user"] / f"{seed_data['recording_id']}.mp3"
+    recording_path.parent.mkdir()
+    recording_path.write_bytes(b"ID3" + bytes(1024))
+
+    response = await client.patch(
+        f"/encounters/{seed_data['encounter_id']}/append-recording",
+        files={"audio": ("recording.mp3", b"ID3" + bytes(1024), "audio/mpeg")},
+        headers=auth_headers,
+    )
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"]
+    assert recording_path.read_bytes() == b"ID3" + bytes(1024)
+
+
+@pytest.mark.asyncio
+async def test_append_recording_keeps_edited_transcript(
+    client, auth_headers, seed_data, db_session, accept_uploads, monkeypatch, tmp_path
+):
+    import io
+    import json
+
+    import app.config.db as db
+    import app.routers.encounters as encounters
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "RECORDINGS_FOLDER", str(tmp_path))
+    recording_path = tmp_path / seed_data["user"] / f"{seed_data['recording_id']}.mp3"
+    recording_path.parent.mkdir()
+    recording_path.write_bytes(b"ID3")
+
+    monkeypatch.setattr(
+        encounters,
+        "append_audio",
+        lambda *args, **kwargs: (io.BytesIO(b"ID3"), 90000),
+    )
+    monkeypatch.setattr(encounters, "append_peaks", lambda *args: ([0.5, 1.0], 4))
+    monkeypatch.setattr(encounters, "_append_transcription_audio", lambda *args: None)
+    monkeypatch.setattr(db, "save_recording", lambda file, username, filename: None)
+    monkeypatch.setattr(db, "delete_recording", lambda username, filename: None)
+
+    response = await client.patch(
+        f"/encounters/{seed_data['encounter_id']}/append-recording",
+        files={"audio": ("recording.mp3", b"ID3", "audio/mpeg")},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+
+    # The edited transcript is what the appended audio's transcript joins.
+    recording = db_session.get(db.Recording, seed_data["recording_id"])
+    assert recording.transcript is None
+    assert json.loads(recording.segments) == [0, 60000]
+    assert json.loads(recording.segment_transcripts) == ["This is a test transcript."]
@@ -0,0 +1,167 @@
+import asyncio
+import io
+import json
+import threading
+import time
+
+from app.services.amazon_transcribe import (
+    JOB_NAME_PREFIX,
+    UNWATCHED_EVENT_VISIBILITY,
+    AmazonTranscribeService,
+    TranscriptionJobNotifications,
+)
+from app.services.audio_pipeline import TRANSCRIPTION_MEDIA_TYPE
+
+
+class StubAWS:
+    "Stands in for the Transcribe, S3 and SQS clients, recording each call."
+
+    def __init__(self, statuses: list[str]):
+        self.statuses = statuses
+        self.calls: list[str] = []
+        self.threads: set[threading.Thread] = set()
+        self.messages: list[dict] = []
+        self.deleted: list[str] = []
+        self.released: dict[str, int] = {}
+
+    def _record(self, name: str) -> None:
+        self.calls.append(name)
+        self.threads.add(threading.current_thread())
+
+    def upload_fileobj(self, file, bucket, key, Config=None):
+        self._record("upload_fileobj")
+
+    def start_transcription_job(self, **kwargs):
+        self._record("start_transcription_job")
+
+    def get_transcription_job(self, TranscriptionJobName):
+        self._record("get_transcription_job")
+        status = self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+
+        return {
+            "TranscriptionJob": {
+                "TranscriptionJobName": TranscriptionJobName,
+                "TranscriptionJobStatus": status,
+                "Transcript": {"TranscriptFileUri": "https://transcripts.test/1"},
+            }
+        }
+
+    def delete_object(self, Bucket, Key):
+        self._record("delete_object")
+
+    def receive_message(self, **kwargs):
+        self._record("receive_message")
+        (messages, self.messages) = (self.messages, [])
+        return {"Messages": messages}
+
+    def delete_message(self, QueueUrl, ReceiptHandle):
+        self.deleted.append(ReceiptHandle)
+
+    def change_message_visibility(self, QueueUrl, ReceiptHandle, VisibilityTimeout):
+        self.released[ReceiptHandle] = VisibilityTimeout
+
+
+def job_event(job_name: str, status: str = "COMPLETED", age: float = 0) -> dict:
+    detail = {"TranscriptionJobName": job_name, "TranscriptionJobStatus": status}
+    return {
+        "Body": json.dumps({"detail": detail}),
+        "ReceiptHandle": job_name,
+        "Attributes": {"SentTimestamp": str(int((time.time() - age) * 1000))},
+    }
+
+
+def service(aws: StubAWS) -> AmazonTranscribeService:
+    service = AmazonTranscribeService(region_name="us-west-2")
+    service._client = aws
+    service._s3_client = aws
+    service._bucket_name = "berta"
+
+    async def download(transcript_uri: str) -> str:
+        return "Transcribed."
+
+    service._download_transcript = download
+    return service
+
+
+class TestAmazonTranscribeService:
+    async def test_runs_aws_calls_off_the_event_loop(self):
+        aws = StubAWS(statuses=["COMPLETED"])
+
+        output = await service(aws).transcribe(
+            io.BytesIO(b"audio"), "recording.flac", TRANSCRIPTION_MEDIA_TYPE
+        )
+
+        assert output.transcript == "Transcribed."
+        assert aws.calls == [
+            "upload_fileobj",
+            "start_transcription_job",
+            "get_transcription_job",
+            "delete_object",
+        ]
+        assert threading.current_thread() not in aws.threads
+
+    async def test_awaits_completion_notification_instead_of_polling(self):
+        aws = StubAWS(statuses=["IN_PROGRESS", "COMPLETED"])
+        transcribe = service(aws)
+        transcribe._notifications = TranscriptionJobNotifications(aws, "queue")
+
+        async def complete_job():
+            await asyncio.sleep(0.05)
+            aws.messages = [job_event("job-1")]
+
+        (transcript, _) = await asyncio.wait_for(
+            asyncio.gather(
+                transcribe._wait_for_transcription("job-1"), complete_job()
+            ),
+            timeout=2,
+        )
+
+        assert transcript == "Transcribed."
+        assert aws.calls.count("get_transcription_job") == 2
+        assert aws.deleted == ["job-1"]
+        await transcribe.aclose()
+
+
+class TestTranscriptionJobNotifications:
+    async def test_releases_events_of_jobs_watched_elsewhere(self):
+        aws = StubAWS(statuses=[])
+        other_job = f"{JOB_NAME_PREFIX}transcription-2"
+        aws.messages = [job_event(other_job), job_event("job-1", "FAILED")]
+        notifications = TranscriptionJobNotifications(aws, "queue")
+
+        changed = notifications.watch("job-1")
+        await notifications.wait(changed, timeout=1)
+        notifications.unwatch("job-1")
+
+        assert changed.result() == "FAILED"
+        assert aws.deleted == ["job-1"]
+        assert aws.released == {other_job: UNWATCHED_EVENT_VISIBILITY}
+        await notifications.aclose()
+
+    async def test_deletes_stale_events_and_other_messages(self):
+        aws = StubAWS(statuses=[])
+        stale_job = f"{JOB_NAME_PREFIX}segment-2"
+        aws.messages = [
+            job_event(stale_job, age=3600),
+            job_event("another-apps-job"),
+            {"Body": "not an event", "ReceiptHandle": "not-an-event"},
+            job_event("job-1"),
+        ]
+        notifications = TranscriptionJobNotifications(aws, "queue")
+
+        changed = notifications.watch("job-1")
+        await notifications.wait(changed, timeout=1)
+        notifications.unwatch("job-1")
+
+        assert aws.deleted == [stale_job, "another-apps-job", "not-an-event", "job-1"]
+        assert aws.released == {}
+        await notifications.aclose()
+
+    def test_parses_events_delivered_through_sns(self):
+        body = json.dumps({"Message": job_event("job-1")["Body"]})
+
+        assert TranscriptionJobNotifications._parse_event(body) == (
+            "job-1",
+            "COMPLETED",
+        )
+        assert TranscriptionJobNotifications._parse_event("not json") is None
@@ -0,0 +1,155 @@
+import io
+import struct
+
+from app.services.audio_headers import (
+    copy_mp3_frames,
+    parse_mp3_frame_header,
+    probe_duration,
+    scan_mp3,
+)
+
+# MPEG 1 Layer III, 96 kbps, 48 kHz, mono: 288 bytes per frame.
+MONO_HEADER = bytes([0xFF, 0xFB, 0x74, 0xC0])
+MONO_FRAME_SIZE = 288
+
+
+def frame(payload: bytes = b"") -> bytes:
+    return (MONO_HEADER + payload).ljust(MONO_FRAME_SIZE, b"\x00")
+
+
+def id3v2_tag(size: int) -> bytes:
+    synchsafe = bytes((size >> shift) & 0x7F for shift in (21, 14, 7, 0))
+    return b"ID3\x04\x00\x00" + synchsafe + bytes(size)
+
+
+class TestParseMp3FrameHeader:
+    def test_mpeg1_layer3(self):
+        header = parse_mp3_frame_header(MONO_HEADER)
+
+        assert header is not None
+        assert header.sample_rate == 48000
+        assert header.channels == 1
+        assert header.bitrate == 96
+        assert header.samples == 1152
+        assert header.size == MONO_FRAME_SIZE
+
+    def test_mpeg2_layer3_with_padding(self):
+        # MPEG 2 Layer III, 64 kbps, 16 kHz, joint stereo, padded.
+        header = parse_mp3_frame_header(bytes([0xFF, 0xF3, 0x8A, 0x40]))
+
+        assert header is not None
+        assert header.sample_rate == 16000
+        assert header.channels == 2
+        assert header.samples == 576
+        assert header.size == 289
+
+    def test_rejects_non_frames(self):
+        assert parse_mp3_frame_header(b"TAG\x00") is None
+        assert parse_mp3_frame_header(bytes([0xFF, 0xFB, 0xF4, 0xC0])) is None
+
+
+class TestScanMp3:
+    def test_skips_tags_and_info_frame(self):
+        info_frame = frame(bytes(17) + b"Info")
+        audio = io.BytesIO(
+            id3v2_tag(20) + info_frame + frame() * 3 + b"TAG" + bytes(125)
+        )
+
+        stream = scan_mp3(audio)
+
+        assert stream is not None
+        assert stream.start == 30 + MONO_FRAME_SIZE
+        assert stream.end == stream.start + 3 * MONO_FRAME_SIZE
+        assert stream.frame_count == 3
+        assert stream.duration == 3 * 1152 * 1000 // 48000
+
+        copied = io.BytesIO()
+        copy_mp3_frames(audio, stream, copied)
+
+        assert copied.getvalue() == frame() * 3
+
+    def test_not_mp3(self):
+        assert scan_mp3(io.BytesIO(b"RIFF" + bytes(100))) is None
+
+
+# A Matroska segment of unknown size, as written by live recorders.
+LIVE_SEGMENT_HEADER = bytes.fromhex("18538067 01FFFFFFFFFFFFFF")
+
+
+def ebml_element(element_id: int, content: bytes) -> bytes:
+    id_bytes = element_id.to_bytes((element_id.bit_length() + 7) // 8, "big")
+    return id_bytes + bytes([0x80 | len(content)]) + content
+
+
+class TestProbeDuration:
+    def test_mp3_xing_frame_count(self):
+        xing = b"Xing" + struct.pack(">II", 0x1, 1000)
+        audio = io.BytesIO(id3v2_tag(20) + frame(bytes(17) + xing) + frame())
+
+        assert probe_duration(audio) == 1000 * 1152 * 1000 // 48000
+        assert audio.tell() == 0
+
+    def test_mp3_frame_scan(self):
+        audio = io.BytesIO(frame() * 50)
+
+        assert probe_duration(audio) == 50 * 1152 * 1000 // 48000
+
+    def test_wav(self):
+        fmt = struct.pack("<HHIIHH", 1, 1, 16000, 32000, 2, 16)
+        audio = io.BytesIO(
+            b"RIFF\x00\x00\x00\x00WAVE"
+            + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+            + b"LIST" + struct.pack("<I", 3) + bytes(4)
+            + b"data" + struct.pack("<I", 48000) + bytes(48000)
+        )
+
+        assert probe_duration(audio) == 1500
+
+    def test_streamed_wav_without_data_size(self):
+        fmt = struct.pack("<HHIIHH", 1, 1, 16000, 32000, 2, 16)
+        audio = io.BytesIO(
+            b"RIFF\xff\xff\xff\xffWAVE"
+            + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+            + b"data" + struct.pack("<I", 0xFFFFFFFF) + bytes(16000)
+        )
+
+        assert probe_duration(audio) == 500
+
+    def test_webm(self):
+        info = ebml_element(0x2AD7B1, (1_000_000).to_bytes(3, "big")) + ebml_element(
+            0x4489, struct.pack(">d", 2500.0)
+        )
+        audio = io.BytesIO(
+            ebml_element(0x1A45DFA3, ebml_element(0x4282, b"webm"))
+            + LIVE_SEGMENT_HEADER
+            + ebml_element(0xEC, bytes(10))
+            + ebml_element(0x1549A966, info)
+        )
+
+        assert probe_duration(audio) == 2500
+
+    def test_webm_without_duration(self):
+        audio = io.BytesIO(
+            ebml_element(0x1A45DFA3, ebml_element(0x4282, b"webm"))
+            + LIVE_SEGMENT_HEADER
+            + ebml_element(0x1549A966, ebml_element(0x2AD7B1, b"\x0f\x42\x40"))
+            + bytes([0x1F, 0x43, 0xB6, 0x75, 0xFF])
+        )
+
+        assert probe_duration(audio) is None
+
+    def test_mp4_with_trailing_movie_box(self):
+        def box(box_type: bytes, content: bytes) -> bytes:
+            return struct.pack(">I", 8 + len(content)) + box_type + content
+
+        mvhd = box(b"mvhd", bytes(4) + struct.pack(">IIII", 0, 0, 44100, 44100 * 3))
+        audio = io.BytesIO(
+            box(b"ftyp", b"M4A " + bytes(4))
+            + box(b"mdat", bytes(1000))
+            + box(b"moov", mvhd + box(b"trak", bytes(16)))
+        )
+
+        assert probe_duration(audio) == 3000
+
+    def test_unknown_format(self):
+        assert probe_duration(io.BytesIO(b"fLaC" + bytes(100))) is None
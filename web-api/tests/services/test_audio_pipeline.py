@@ -0,0 +1,143 @@
+import io
+import shutil
+import struct
+import subprocess
+
+import pytest
+
+import app.services.audio_pipeline as audio_pipeline
+from app.errors import AudioProcessingError
+from app.services.audio_pipeline import (
+    AudioConsumer,
+    ContentHasher,
+    DurationCounter,
+    Encoder,
+    PcmFormat,
+    PeakAccumulator,
+    extract_peaks,
+    output_duration,
+)
+from tests.services.test_audio_processing import tone_wav
+
+requires_ffmpeg = pytest.mark.skipif(
+    shutil.which("ffmpeg") is None, reason="ffmpeg is not installed"
+)
+
+
+def pcm(*samples: int) -> bytes:
+    return struct.pack(f"<{len(samples)}h", *samples)
+
+
+class TestDurationCounter:
+    def test_counts_frames_across_chunks(self):
+        counter = DurationCounter()
+        counter.start(PcmFormat(sample_rate=8000, channels=2))
+
+        counter.consume(bytes(8000 * 4 // 2))
+        counter.consume(bytes(8000 * 4 // 2 + 3))  # Trailing partial frame.
+
+        assert counter.duration == 1000
+
+
+class TestPeakAccumulator:
+    def test_min_max_per_pixel_across_chunk_boundaries(self):
+        accumulator = PeakAccumulator(pixels_per_second=2)
+        accumulator.start(PcmFormat(sample_rate=8, channels=1))
+
+        accumulator.consume(pcm(0, 512, -1024, 0, 256))
+        accumulator.consume(pcm(0, 0, 0, 1024, -256))
+        accumulator.finish()
+
+        assert accumulator.peaks.tolist() == [-4, 2, 0, 1, -1, 4]
+
+    def test_mixes_stereo_to_mono(self):
+        accumulator = PeakAccumulator(pixels_per_second=1)
+        accumulator.start(PcmFormat(sample_rate=2, channels=2))
+
+        accumulator.consume(pcm(1024, 0, -2048, -2048))
+        accumulator.finish()
+
+        assert accumulator.peaks.tolist() == [-8, 2]
+
+
+class TestExtractPeaks:
+    def test_trailing_partial_pixel(self):
+        peaks = extract_peaks(
+            pcm(-512, 512, 0, 0, 768, 256, 512),
+            PcmFormat(sample_rate=4, channels=1),
+            pixels_per_second=1,
+        )
+
+        assert peaks.tolist() == [-2, 2, 1, 3]
+
+    def test_empty(self):
+        peaks = extract_peaks(b"", PcmFormat(sample_rate=4, channels=2))
+
+        assert peaks.tolist() == []
+
+
+class TestContentHasher:
+    def test_hashes_written_content(self):
+        written = []
+        hasher = ContentHasher(type("Sink", (), {"write": lambda _, d: written.append(d)})())
+
+        hasher.write(b"abc")
+
+        assert written == [b"abc"]
+        assert hasher.hexdigest() == (
+            "ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad"
+        )
+
+
+class TestOutputDuration:
+    def test_last_reported_time(self):
+        diagnostics = (
+            b"size=     256kB time=00:00:01.50 bitrate= 128.0kbits/s\r"
+            b"size=     512kB time=01:02:04.017 bitrate= 128.0kbits/s\n"
+        )
+
+        assert output_duration(diagnostics) == 3724017
+
+    def test_no_reported_time(self):
+        with pytest.raises(AudioProcessingError):
+            output_duration(b"Invalid data found when processing input")
+
+
+def assert_reaped(process: subprocess.Popen):
+    assert process.returncode is not None
+    assert process.stdout.closed and process.stderr.closed
+    assert process.stdin is None or process.stdin.closed
+
+
+@requires_ffmpeg
+class TestAbort:
+    def test_encoder_is_reaped(self):
+        encoder = Encoder(io.BytesIO(), "mp3", "64k")
+        encoder.start(PcmFormat(sample_rate=16000, channels=1))
+        encoder.consume(pcm(*range(1000)))
+
+        encoder.abort()
+
+        assert_reaped(encoder._process)
+        assert not encoder._output_thread.is_alive()
+
+    def test_decoder_is_reaped_when_a_consumer_fails(self, monkeypatch, tmp_path):
+        processes = []
+        Popen = subprocess.Popen
+
+        def popen(*args, **kwargs):
+            processes.append(Popen(*args, **kwargs))
+            return processes[-1]
+
+        class FailingConsumer(AudioConsumer):
+            def consume(self, pcm: bytes) -> None:
+                raise RuntimeError("Consumer failed")
+
+        monkeypatch.setattr(audio_pipeline.subprocess, "Popen", popen)
+        audio_path = tmp_path / "tone.wav"
+        audio_path.write_bytes(tone_wav(3000).read())
+
+        with pytest.raises(RuntimeError, match="Consumer failed"):
+            audio_pipeline.decode(str(audio_path), [FailingConsumer()])
+
+        assert_reaped(processes[-1])
@@ -0,0 +1,178 @@
+import io
+import shutil
+import wave
+
+import numpy as np
+import pytest
+
+import app.services.audio_processing as audio_processing
+from app.errors import AudioProcessingError
+from app.services.audio_processing import (
+    append_peaks,
+    find_silence_cut_points,
+    normalize_peaks,
+    plan_segments,
+)
+
+requires_ffmpeg = pytest.mark.skipif(
+    shutil.which("ffmpeg") is None, reason="ffmpeg is not installed"
+)
+
+
+def tone_wav(
+    duration: int, sample_rate: int = 44100, channels: int = 1
+) -> io.BytesIO:
+    "Returns a WAV file of a 220 Hz tone lasting the given duration (in ms)."
+    t = np.arange(sample_rate * duration // 1000) / sample_rate
+    tone = (8000 * np.sin(2 * np.pi * 220 * t)).astype(np.int16)
+    wav = io.BytesIO()
+
+    with wave.open(wav, "wb") as file:
+        file.setnchannels(channels)
+        file.setsampwidth(2)
+        file.setframerate(sample_rate)
+        file.writeframes(np.repeat(tone, channels).tobytes())
+
+    wav.seek(0)
+    return wav
+
+
+def corrupt_audio() -> io.BytesIO:
+    "Returns a file of random bytes that no decoder recognizes as audio."
+    return io.BytesIO(np.random.default_rng(0).bytes(20000))
+
+
+class TestNormalizePeaks:
+    def test_scales_to_largest_peak(self):
+        assert normalize_peaks([-2, 4, 0, 1]) == [-0.5, 1.0, 0.0, 0.25]
+
+    def test_empty(self):
+        assert normalize_peaks([]) == []
+
+
+class TestAppendPeaks:
+    def test_decodes_only_after_the_last_whole_pixel(self, monkeypatch):
+        starts = []
+
+        def compute_raw_peaks(audio, start=0):
+            starts.append(start)
+            return np.array([-2, 2, -1, 1])
+
+        monkeypatch.setattr(audio_processing, "compute_raw_peaks", compute_raw_peaks)
+
+        (peaks, peak_max) = append_peaks(None, [-0.5, 1.0, -0.5, 0.5, 0.0, 0.0], 4, 120)
+
+        assert starts == [100]
+        assert peaks == [-0.5, 1.0, -0.5, 0.5, -0.5, 0.5, -0.25, 0.25]
+        assert peak_max == 4
+
+    def test_rescales_original_peaks_to_a_louder_max(self, monkeypatch):
+        monkeypatch.setattr(
+            audio_processing,
+            "compute_raw_peaks",
+            lambda audio, start=0: np.array([-8, 8]),
+        )
+
+        (peaks, peak_max) = append_peaks(None, [-0.5, 1.0], 4, 50)
+
+        assert peaks == [-0.25, 0.5, -1.0, 1.0]
+        assert peak_max == 8
+
+    def test_recomputes_when_the_original_max_is_unknown(self, monkeypatch):
+        starts = []
+
+        def compute_raw_peaks(audio, start=0):
+            starts.append(start)
+            return np.array([-2, 4, -1, 1])
+
+        monkeypatch.setattr(audio_processing, "compute_raw_peaks", compute_raw_peaks)
+
+        (peaks, peak_max) = append_peaks(None, [-0.5, 1.0], None, 50)
+
+        assert starts == [0]
+        assert peaks == [-0.5, 1.0, -0.25, 0.25]
+        assert peak_max == 4
+
+
+class TestFindSilenceCutPoints:
+    def test_cuts_in_the_middle_of_long_silences(self):
+        sample_rate = 1000
+        tone = np.tile(np.array([8000, -8000], dtype=np.int16), 500)
+        samples = np.concatenate(
+            [tone, np.zeros(600, np.int16), tone, np.zeros(200, np.int16), tone]
+        ).reshape(-1, 1)
+
+        cut_points = find_silence_cut_points(samples, sample_rate)
+
+        assert cut_points.tolist() == [1300]
+
+    def test_no_cut_points_in_digital_silence(self):
+        samples = np.zeros((5000, 2), dtype=np.int16)
+
+        assert find_silence_cut_points(samples, 1000).tolist() == []
+
+    def test_no_cut_points_in_audio_shorter_than_a_window(self):
+        samples = np.zeros((5, 2), dtype=np.int16)
+
+        assert find_silence_cut_points(samples, 1000).tolist() == []
+
+
+class TestPlanSegments:
+    def test_ends_segments_at_the_last_cut_point_that_fits(self):
+        assert plan_segments([30, 60, 90, 130], 150, 100) == [(0, 90), (90, 150)]
+
+    def test_hard_splits_without_cut_points(self):
+        assert plan_segments([], 250, 100) == [(0, 100), (100, 200), (200, 250)]
+
+    def test_hard_splits_between_distant_cut_points(self):
+        assert plan_segments([50, 300], 320, 100) == [
+            (0, 50),
+            (50, 150),
+            (150, 250),
+            (250, 320),
+        ]
+
+
+@requires_ffmpeg
+class TestReformatAudio:
+    def test_converts_to_format_with_duration(self):
+        (audio, duration) = audio_processing.reformat_audio(tone_wav(3000), "mp3")
+
+        assert audio.read(3) == b"ID3"
+        assert duration == 3000
+
+    def test_corrupt_audio(self):
+        with pytest.raises(AudioProcessingError):
+            audio_processing.reformat_audio(corrupt_audio(), "mp3")
+
+
+@requires_ffmpeg
+class TestIngestAudio:
+    def test_produces_audio_duration_peaks_and_transcription_audio(self):
+        ingested = audio_processing.ingest_audio(
+            tone_wav(3000, sample_rate=48000, channels=2),
+            "mp3",
+            transcription_output=io.BytesIO(),
+        )
+
+        assert ingested.audio.read(3) == b"ID3"
+        assert ingested.duration == 3000
+        assert len(ingested.peaks) == 3 * 20 * 2
+        assert max(ingested.peaks) == 1.0
+        assert len(ingested.content_hash) == 64
+        assert ingested.transcription_audio.read(4) == b"fLaC"
+
+    def test_corrupt_audio(self):
+        with pytest.raises(AudioProcessingError):
+            audio_processing.ingest_audio(corrupt_audio(), "mp3")
+
+
+@requires_ffmpeg
+class TestCreateTranscriptionAudio:
+    def test_encodes_a_range_as_16khz_mono_flac(self):
+        flac = audio_processing.create_transcription_audio(
+            tone_wav(3000), start=1000, duration=1500
+        )
+
+        assert flac.read(4) == b"fLaC"
+        assert abs(audio_processing.get_duration(flac) - 1500) < 50
@@ -0,0 +1,47 @@
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+import pytest
+
+from app.errors import ServiceBusy
+from app.services.audio_workers import AudioWorkerPool
+
+
+class ThreadedAudioWorkerPool(AudioWorkerPool):
+    def _create_executor(self) -> Executor:
+        return ThreadPoolExecutor(max_workers=self.workers)
+
+
+class TestAudioWorkerPool:
+    def test_runs_jobs(self):
+        pool = ThreadedAudioWorkerPool(workers=1, queue_limit=0)
+
+        assert pool.run(sum, [1, 2, 3]) == 6
+        assert pool.metrics().completed == 1
+
+        pool.shutdown()
+
+    def test_rejects_jobs_when_saturated(self):
+        pool = ThreadedAudioWorkerPool(workers=1, queue_limit=1)
+        release = threading.Event()
+
+        running = pool._submit(release.wait)
+        queued = pool._submit(release.wait)
+
+        with pytest.raises(ServiceBusy) as exc_info:
+            pool.run(sum, [1])
+
+        assert exc_info.value.status_code == 503
+        assert exc_info.value.headers["Retry-After"]
+
+        metrics = pool.metrics()
+        assert (metrics.running, metrics.queued, metrics.rejected) == (1, 1, 1)
+
+        release.set()
+        running.result()
+        queued.result()
+
+        assert pool.run(sum, [1]) == 1
+        assert pool.metrics().completed == 3
+
+        pool.shutdown()
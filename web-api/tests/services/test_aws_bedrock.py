@@ -0,0 +1,47 @@
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+import app.schemas as sch
+from app.services.aws_bedrock import BedrockGenerativeAIService
+
+MODEL = "us.meta.llama3-3-70b-instruct-v1:0"
+
+
+def bedrock_with_chunks(chunks: list[str]) -> BedrockGenerativeAIService:
+    service = BedrockGenerativeAIService()
+    service.runtime = MagicMock()
+    service.runtime.invoke_model_with_response_stream.return_value = {
+        "body": [
+            {"chunk": {"bytes": json.dumps({"generation": chunk}).encode()}}
+            for chunk in chunks
+        ]
+    }
+
+    return service
+
+
+class TestStream:
+    @pytest.mark.parametrize(
+        ("chunks", "text"),
+        [
+            (["```Note", " text.```"], "Note text."),
+            (["`", "`", "`Note text.", "`", "``"], "Note text."),
+            (["```", "Note text.", "```"], "Note text."),
+            (["Note `code`."], "Note `code`."),
+            (["``"], "``"),
+            (["``````"], ""),
+        ],
+    )
+    async def test_streams_text_with_fences_stripped(self, chunks, text):
+        service = bedrock_with_chunks(chunks)
+        streamed = ""
+
+        async for item in service.stream(MODEL, [{"role": "user", "content": "Hi"}]):
+            if isinstance(item, sch.GenerationOutput):
+                output = item
+            else:
+                streamed += item
+
+        assert streamed == output.text == text
@@ -0,0 +1,141 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.config import settings
+from app.errors import ExternalServiceError, ExternalServiceInterruption
+from app.services.backend_pool import BackendPool, endpoint_urls
+
+URLS = ["http://a", "http://b", "http://c"]
+
+
+async def close(_):
+    pass
+
+
+def pool(urls: list[str] = URLS, transport=None) -> BackendPool[str]:
+    "A pool whose clients are simply the replicas' URLs."
+    return BackendPool(
+        urls,
+        lambda url: url,
+        health_path="/health",
+        close_client=close,
+        transport=transport,
+    )
+
+
+async def fail(backends: BackendPool, error: Exception) -> str:
+    "Fails a request with the error, returning the replica it was routed to."
+    with pytest.raises(type(error)):
+        async with backends.use() as client:
+            raise error
+
+    return client
+
+
+class TestEndpointURLs:
+    def test_split_comma_separated_urls(self):
+        assert endpoint_urls(" http://a/, http://b ,,") == ["http://a", "http://b"]
+
+
+class TestRouting:
+    async def test_take_turns_when_idle(self):
+        backends = pool()
+        clients = []
+        for _ in range(6):
+            async with backends.use() as client:
+                clients.append(client)
+
+        assert clients == URLS + URLS
+
+    async def test_route_to_fewest_outstanding(self):
+        backends = pool(URLS[:2])
+
+        async with backends.use() as first:
+            async with backends.use() as second:
+                async with backends.use() as third:
+                    assert second != first
+                    assert third in URLS[:2]
+
+            # Only the first is still busy.
+            async with backends.use() as fourth:
+                assert fourth != first
+
+    async def test_hold_replica_while_streaming(self):
+        backends = pool(URLS[:2])
+
+        async def start(client):
+            yield client
+
+        stream = backends.stream(start)
+        streaming_from = await anext(stream)
+
+        async with backends.use() as client:
+            assert client != streaming_from
+
+        await stream.aclose()
+        assert all(r.outstanding == 0 for r in backends.replicas)
+
+
+class TestEjection:
+    async def test_eject_failing_replica(self):
+        backends = pool()
+        failed = await fail(backends, ExternalServiceInterruption("Fake", "Down"))
+
+        for _ in range(4):
+            async with backends.use() as client:
+                assert client != failed
+
+    async def test_keep_replica_failing_request(self):
+        backends = pool()
+        await fail(backends, ExternalServiceError("Fake", "Unknown model"))
+
+        assert not any(r.ejected for r in backends.replicas)
+
+    async def test_double_ejection_for_repeated_failures(self):
+        backends = pool(URLS[:1])
+        replica = backends.replicas[0]
+
+        await fail(backends, ExternalServiceInterruption("Fake", "Down"))
+        first_ejection = replica.ejected_until
+        await fail(backends, ExternalServiceInterruption("Fake", "Down"))
+
+        assert replica.failures == 2
+        extended = replica.ejected_until - first_ejection
+        assert extended > settings.GENERATION_EJECTION_TIME
+
+    async def test_try_soonest_back_when_all_ejected(self):
+        backends = pool(URLS[:2])
+        await fail(backends, ExternalServiceInterruption("Fake", "Down"))
+        await fail(backends, ExternalServiceInterruption("Fake", "Down"))
+
+        async with backends.use() as client:
+            assert client == URLS[0]
+
+        # Succeeding restores the replica.
+        assert not backends.replicas[0].ejected
+
+
+class TestHealthChecks:
+    async def test_eject_unhealthy_replicas(self, monkeypatch):
+        monkeypatch.setattr(settings, "GENERATION_HEALTH_CHECK_INTERVAL", 0.01)
+        transport = httpx.MockTransport(
+            lambda request: httpx.Response(503 if request.url.host == "b" else 200)
+        )
+        backends = pool(transport=transport)
+
+        async with backends.use():
+            pass
+        await asyncio.sleep(0.05)
+
+        assert [r.ejected for r in backends.replicas] == [False, True, False]
+        await backends.aclose()
+
+    async def test_no_health_checks_for_one_replica(self):
+        backends = pool(URLS[:1])
+
+        async with backends.use():
+            pass
+
+        assert backends._health_checks is None
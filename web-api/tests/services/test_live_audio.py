@@ -0,0 +1,68 @@
+import wave
+
+import numpy as np
+
+from app.services.live_audio import SpeechWindower, pcm_to_wav
+
+SAMPLE_RATE = 16000
+
+
+def tone(ms: int) -> np.ndarray:
+    t = np.arange(SAMPLE_RATE * ms // 1000) / SAMPLE_RATE
+    return (8000 * np.sin(2 * np.pi * 220 * t)).astype(np.int16)
+
+
+def silence(ms: int) -> np.ndarray:
+    return np.zeros(SAMPLE_RATE * ms // 1000, dtype=np.int16)
+
+
+def stream(windower: SpeechWindower, audio: np.ndarray, chunk: int = 4000):
+    "Adds the audio in uneven chunks, returning the windows completed."
+    data = audio.tobytes()
+    windows = []
+
+    for offset in range(0, len(data), chunk + 1):
+        windows.extend(windower.add(data[offset : offset + chunk + 1]))
+
+    return windows
+
+
+class TestSpeechWindower:
+    def test_windows_end_at_pauses(self):
+        windower = SpeechWindower(SAMPLE_RATE)
+        audio = np.concatenate(
+            [tone(5000), silence(1000), tone(2000), silence(300), tone(3000)]
+        )
+
+        windows = stream(windower, audio)
+
+        # The short pause is not long enough to end a window.
+        assert len(windows) == 1
+        assert SAMPLE_RATE * 5 < len(windows[0]) < SAMPLE_RATE * 6
+
+        final = windower.flush()
+
+        assert final is not None
+        assert len(windows[0]) + len(final) == len(audio)
+
+    def test_long_speech_is_split_at_the_maximum(self):
+        windower = SpeechWindower(SAMPLE_RATE, max_window_ms=6000)
+
+        windows = stream(windower, tone(13000))
+
+        assert [len(w) for w in windows] == [SAMPLE_RATE * 6000 // 1000] * 2
+
+    def test_silence_is_dropped(self):
+        windower = SpeechWindower(SAMPLE_RATE)
+
+        windows = stream(windower, silence(10000))
+
+        assert windows == []
+        assert windower.flush() is None
+
+
+def test_pcm_to_wav():
+    with wave.open(pcm_to_wav(tone(500))) as wav:
+        assert wav.getframerate() == SAMPLE_RATE
+        assert wav.getnchannels() == 1
+        assert wav.getnframes() == SAMPLE_RATE // 2
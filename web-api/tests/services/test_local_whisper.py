@@ -0,0 +1,97 @@
+import io
+
+import httpx
+import pytest
+
+from app.errors import ExternalServiceError, ExternalServiceInterruption
+from app.services.local_whisper import LocalWhisperTranscriptionService
+
+
+def stub_server(status_code: int = 200, text: str = " Hello there. "):
+    "Returns a transport standing in for the ASR server, and its requests."
+    requests: list[httpx.Request] = []
+
+    async def handle(request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        requests.append(request)
+
+        if status_code != 200:
+            return httpx.Response(status_code, text="unavailable")
+
+        return httpx.Response(200, json={"text": text})
+
+    return (httpx.MockTransport(handle), requests)
+
+
+def service(transport: httpx.MockTransport) -> LocalWhisperTranscriptionService:
+    return LocalWhisperTranscriptionService(
+        api_url="http://asr.test", model="large-v3", transport=transport
+    )
+
+
+class TestLocalWhisperTranscriptionService:
+    async def test_posts_audio_to_transcriptions_endpoint(self):
+        (transport, requests) = stub_server()
+        audio = io.BytesIO(b"RIFF" + b"\0" * 1000)
+
+        output = await service(transport).transcribe(
+            audio, "recording.wav", "audio/wav", prompt="Earlier words"
+        )
+
+        assert output.transcript == "Hello there."
+        assert output.service == "Local Whisper"
+
+        [request] = requests
+        assert request.url == "http://asr.test/v1/audio/transcriptions"
+        body = request.content
+        assert b'name="model"\r\n\r\nlarge-v3' in body
+        assert b'name="prompt"\r\n\r\nEarlier words' in body
+        assert b'filename="recording.wav"' in body
+        assert b"RIFF" + b"\0" * 1000 in body
+
+    async def test_streams_the_upload(self):
+        (transport, requests) = stub_server()
+
+        await service(transport).transcribe(
+            io.BytesIO(b"audio"), "recording.mp3", "audio/mpeg"
+        )
+
+        # The multipart body is produced in chunks, not built up front.
+        assert isinstance(requests[0].stream, httpx.AsyncByteStream)
+        assert "Content-Length" in requests[0].headers
+
+    async def test_reuses_and_closes_connection_pool(self):
+        (transport, _) = stub_server()
+        whisper = service(transport)
+
+        client = whisper._client
+        for _ in range(2):
+            await whisper.transcribe(io.BytesIO(b"audio"), "a.mp3", "audio/mpeg")
+
+        assert whisper._client is client
+        await whisper.aclose()
+        assert client.is_closed
+
+    async def test_reports_unavailable_server_as_interruption(self):
+        (transport, _) = stub_server(status_code=503)
+
+        with pytest.raises(ExternalServiceInterruption):
+            await service(transport).transcribe(
+                io.BytesIO(b"audio"), "a.mp3", "audio/mpeg"
+            )
+
+    async def test_reports_rejected_request_as_error(self):
+        (transport, _) = stub_server(status_code=400)
+
+        with pytest.raises(ExternalServiceError) as e:
+            await service(transport).transcribe(
+                io.BytesIO(b"audio"), "a.mp3", "audio/mpeg"
+            )
+
+        assert not isinstance(e.value, ExternalServiceInterruption)
+
+    def test_requires_server_url(self, monkeypatch):
+        monkeypatch.setattr("app.config.settings.LOCAL_WHISPER_SERVICE_URL", None)
+
+        with pytest.raises(ValueError, match="LOCAL_WHISPER_SERVICE_URL"):
+            LocalWhisperTranscriptionService()
@@ -0,0 +1,196 @@
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+import app.schemas as sch
+from app.errors import ExternalServiceError
+from app.services.adapters import GenerativeAIService
+from app.services.streaming import (
+    complete_stream,
+    sse_data,
+    start_stream,
+    stream_chat_completions_api,
+    stream_openai_chat,
+)
+
+
+def generation_output(text: str) -> sch.GenerationOutput:
+    return sch.GenerationOutput(
+        text=text,
+        generatedAt=datetime.now(timezone.utc),
+        service="Fake",
+        model="fake-model",
+        completionTokens=0,
+        promptTokens=0,
+        timeToGenerate=0,
+    )
+
+
+def chunk(content: str | None = None, usage: tuple[int, int] | None = None):
+    return SimpleNamespace(
+        choices=[] if content is None else [
+            SimpleNamespace(delta=SimpleNamespace(content=content))
+        ],
+        usage=None if usage is None else SimpleNamespace(
+            prompt_tokens=usage[0], completion_tokens=usage[1]
+        ),
+    )
+
+
+class FakeChunkStream:
+    def __init__(self, chunks: list):
+        self.chunks = chunks
+        self.closed = False
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            yield chunk
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeAsyncOpenAI:
+    "Streams the given chunks, recording the arguments of each request."
+
+    def __init__(self, chunks: list):
+        self.stream = FakeChunkStream(chunks)
+        self.requests: list[dict] = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        self.requests.append(kwargs)
+        return self.stream
+
+
+class FakeGenerativeAIService(GenerativeAIService):
+    service_name = "Fake"
+    models = []
+
+    async def complete(self, model, messages, temperature=0):
+        return generation_output("The whole note.")
+
+
+async def stream_of(items: list):
+    for item in items:
+        yield item
+
+
+async def lines_of(lines: list[str]):
+    for line in lines:
+        yield line
+
+
+async def collect(stream) -> list:
+    return [item async for item in stream]
+
+
+def chat_completions_server(events: list[dict], requests: list[dict]):
+    "A transport answering chat completions with the given events."
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        requests.append(json.loads(request.content))
+        body = "".join(f"data: {json.dumps(e)}\n\n" for e in events)
+        return httpx.Response(
+            200,
+            content=(body + "data: [DONE]\n\n").encode(),
+            headers={"Content-Type": "text/event-stream"},
+        )
+
+    return httpx.MockTransport(handle)
+
+
+class TestSSEData:
+    async def test_parse_data_until_done(self):
+        lines = [
+            ": keep-alive",
+            'data: {"n": 1}',
+            "",
+            'data:{"n": 2}',
+            "data: [DONE]",
+            'data: {"n": 3}',
+        ]
+
+        assert await collect(sse_data(lines_of(lines))) == [{"n": 1}, {"n": 2}]
+
+
+class TestStreamOpenAIChat:
+    async def test_yield_content_then_output(self):
+        client = FakeAsyncOpenAI(
+            [chunk("Hello"), chunk(""), chunk(" world"), chunk(usage=(12, 2))]
+        )
+
+        items = await collect(stream_openai_chat(client, "Fake", "fake-model", []))
+
+        assert items[:-1] == ["Hello", " world"]
+        assert items[-1].text == "Hello world"
+        assert (items[-1].service, items[-1].model) == ("Fake", "fake-model")
+        assert (items[-1].promptTokens, items[-1].completionTokens) == (12, 2)
+        assert client.stream.closed
+        assert client.requests[0]["stream"] is True
+        assert client.requests[0]["stream_options"] == {"include_usage": True}
+
+
+class TestStreamChatCompletionsAPI:
+    async def test_yield_content_then_output(self):
+        requests: list[dict] = []
+        events = [
+            {"choices": [{"delta": {"role": "assistant"}}]},
+            {"choices": [{"delta": {"content": "Hello"}}]},
+            {"choices": [{"delta": {"content": " world"}}]},
+            {"choices": [], "usage": {"prompt_tokens": 12, "completion_tokens": 2}},
+        ]
+        transport = chat_completions_server(events, requests)
+
+        async with httpx.AsyncClient(
+            base_url="http://llm", transport=transport
+        ) as client:
+            data = {"model": "fake-model", "messages": []}
+            items = await collect(stream_chat_completions_api(client, "Fake", data))
+
+        assert items[:-1] == ["Hello", " world"]
+        assert items[-1].text == "Hello world"
+        assert (items[-1].promptTokens, items[-1].completionTokens) == (12, 2)
+        assert requests[0]["stream"] is True
+
+    async def test_raise_error_status(self):
+        transport = httpx.MockTransport(lambda _: httpx.Response(503, text="Busy"))
+
+        async with httpx.AsyncClient(
+            base_url="http://llm", transport=transport
+        ) as client:
+            data = {"model": "fake-model", "messages": []}
+            with pytest.raises(ExternalServiceError, match="503 - Busy"):
+                await collect(stream_chat_completions_api(client, "Fake", data))
+
+
+class TestStartStream:
+    async def test_continue_from_first_text(self):
+        output = generation_output("ab")
+        stream = await start_stream(stream_of(["a", "b", output]))
+
+        assert await collect(stream) == ["a", "b", output]
+
+    async def test_complete_output_without_text(self):
+        output = generation_output("")
+
+        assert await complete_stream(await start_stream(stream_of([output]))) is output
+
+    async def test_raise_errors_before_first_text(self):
+        async def failing():
+            raise ExternalServiceError("Fake", "Unavailable")
+            yield
+
+        with pytest.raises(ExternalServiceError):
+            await start_stream(failing())
+
+
+class TestDefaultStream:
+    async def test_yield_whole_completion(self):
+        items = await collect(FakeGenerativeAIService().stream("fake-model", []))
+
+        assert items[0] == "The whole note."
+        assert items[1].text == "The whole note."
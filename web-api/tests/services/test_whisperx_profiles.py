@@ -0,0 +1,82 @@
+import pytest
+
+from app.services.whisperx_profiles import (
+    MAX_BATCH_SIZE,
+    PROFILES,
+    calibrate,
+    cpu_thread_count,
+    get_profile,
+    profile_models,
+)
+
+GB = 1024 * 1024 * 1024
+
+
+class TestWhisperXProfile:
+    def test_meets_tiers_at_or_below_its_accuracy(self):
+        profile = get_profile("medium-int8")
+
+        assert profile.meets("low")
+        assert profile.meets("medium")
+        assert not profile.meets("high")
+
+    def test_batch_size_fits_half_the_available_memory(self):
+        profile = get_profile("large-v3-int8")
+
+        assert profile.batch_size(4 * GB) == 4
+        assert profile.batch_size(0) == 1
+        assert profile.batch_size(1024 * GB) == MAX_BATCH_SIZE
+
+    def test_rejects_unknown_profile(self):
+        with pytest.raises(ValueError, match="Unknown WhisperX profile"):
+            get_profile("huge-int4")
+
+
+class TestProfileModels:
+    def test_model_of_named_profile(self):
+        assert profile_models("medium-int8", "high") == ["medium"]
+
+    def test_models_calibrated_between(self):
+        assert profile_models("auto", "medium") == [
+            "large-v3",
+            "large-v3-turbo",
+            "medium",
+        ]
+
+
+class TestCpuThreadCount:
+    def test_prefers_configured_count(self):
+        assert cpu_thread_count(3) == 3
+
+    def test_defaults_to_available_cores(self):
+        assert cpu_thread_count(0) >= 1
+
+
+class TestCalibrate:
+    def test_picks_fastest_profile_meeting_tier(self):
+        timings = {p.name: float(i) for i, p in enumerate(reversed(PROFILES))}
+        benchmarked = []
+
+        def benchmark(profile):
+            benchmarked.append(profile.name)
+            return timings[profile.name]
+
+        profile = calibrate("high", benchmark)
+
+        assert profile.name == "large-v3-int8"
+        assert benchmarked == ["large-v3-float32", "large-v3-int8"]
+
+    def test_skips_profiles_that_fail(self):
+        def benchmark(profile):
+            if profile.compute_type == "int8":
+                raise RuntimeError("model unavailable")
+            return 1.0
+
+        assert calibrate("low", benchmark).name == "large-v3-float32"
+
+    def test_fails_when_no_profile_runs(self):
+        def benchmark(profile):
+            raise RuntimeError("model unavailable")
+
+        with pytest.raises(RuntimeError, match="No WhisperX profile"):
+            calibrate("high", benchmark)
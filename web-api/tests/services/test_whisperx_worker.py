@@ -0,0 +1,137 @@
+import asyncio
+import threading
+import warnings
+
+import numpy as np
+import pytest
+
+from app.services.whisperx_worker import SAMPLE_RATE, WhisperXInferenceWorker
+
+
+class FakeVadModel:
+    "Finds one speech segment in each second of audio."
+
+    def preprocess_audio(self, audio):
+        return audio
+
+    def __call__(self, inputs):
+        return inputs["waveform"]
+
+    def merge_chunks(self, waveform, chunk_size, onset, offset):
+        seconds = len(waveform) // SAMPLE_RATE
+        return [{"start": s, "end": s + 1} for s in range(seconds)]
+
+
+class FakePipeline:
+    "Transcribes each segment as the value of its first sample."
+
+    def __init__(
+        self,
+        fail_with: Exception | None = None,
+        max_batch: int = 16,
+        warn: bool = False,
+    ):
+        self.vad_model = FakeVadModel()
+        self._vad_params = {"vad_onset": 0.5, "vad_offset": 0.363}
+        self.batch_sizes: list[int] = []
+        self.fail_with = fail_with
+        self.max_batch = max_batch
+        self.warn = warn
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, inputs, batch_size):
+        self.release.wait()
+        inputs = list(inputs)
+        self.batch_sizes.append(len(inputs))
+
+        if self.warn:
+            warnings.warn("Model was trained with an older version")
+
+        if self.fail_with is not None:
+            raise self.fail_with
+        if len(inputs) > self.max_batch:
+            raise RuntimeError("CUDA out of memory")
+
+        for item in inputs:
+            yield {"text": f" {int(item['inputs'][0])} "}
+
+
+def audio_of(*values: int) -> np.ndarray:
+    return np.concatenate(
+        [np.full(SAMPLE_RATE, value, dtype=np.float32) for value in values]
+    )
+
+
+class TestWhisperXInferenceWorker:
+    async def test_returns_segment_texts_in_order(self):
+        worker = WhisperXInferenceWorker(FakePipeline(), batch_size=2)
+
+        texts = await worker.transcribe(audio_of(1, 2, 3))
+
+        assert texts == [" 1 ", " 2 ", " 3 "]
+
+    async def test_returns_nothing_for_audio_without_speech(self):
+        worker = WhisperXInferenceWorker(FakePipeline(), batch_size=2)
+
+        assert await worker.transcribe(np.zeros(100, dtype=np.float32)) == []
+
+    async def test_batches_segments_of_concurrent_requests(self):
+        model = FakePipeline()
+        worker = WhisperXInferenceWorker(model, batch_size=4)
+
+        # Hold the worker on a first request until the others are queued.
+        model.release.clear()
+        first = asyncio.create_task(worker.transcribe(audio_of(9)))
+        await asyncio.sleep(0.05)
+        others = [
+            asyncio.create_task(worker.transcribe(audio_of(1, 2))),
+            asyncio.create_task(worker.transcribe(audio_of(3, 4))),
+        ]
+        await asyncio.sleep(0.05)
+        model.release.set()
+
+        results = await asyncio.gather(first, *others)
+
+        assert results == [[" 9 "], [" 1 ", " 2 "], [" 3 ", " 4 "]]
+        assert model.batch_sizes == [1, 4]
+
+    async def test_sizes_each_batch_as_it_is_formed(self):
+        model = FakePipeline()
+        batch_sizes = iter([2, 1, 8])
+        worker = WhisperXInferenceWorker(model, batch_size=lambda: next(batch_sizes))
+
+        texts = await worker.transcribe(audio_of(1, 2, 3, 4, 5))
+
+        assert texts == [" 1 ", " 2 ", " 3 ", " 4 ", " 5 "]
+        assert model.batch_sizes == [2, 1, 2]
+
+    async def test_halves_batch_on_memory_error(self):
+        model = FakePipeline(max_batch=1)
+        worker = WhisperXInferenceWorker(model, batch_size=4)
+
+        texts = await worker.transcribe(audio_of(1, 2, 3))
+
+        assert texts == [" 1 ", " 2 ", " 3 "]
+        assert model.batch_sizes == [3, 1, 2, 1, 1]
+
+    async def test_silences_pipeline_warnings(self):
+        worker = WhisperXInferenceWorker(FakePipeline(warn=True), batch_size=2)
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            await worker.transcribe(audio_of(1, 2))
+
+        assert caught == []
+
+    async def test_fails_requests_when_inference_fails(self):
+        worker = WhisperXInferenceWorker(
+            FakePipeline(fail_with=RuntimeError("device lost")), batch_size=2
+        )
+
+        with pytest.raises(RuntimeError, match="device lost"):
+            await worker.transcribe(audio_of(1, 2, 3))
+
+        # The worker keeps serving later requests.
+        worker.model.fail_with = None
+        assert await worker.transcribe(audio_of(5)) == [" 5 "]
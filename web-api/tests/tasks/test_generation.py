@@ -0,0 +1,291 @@
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select
+
+import app.config.db as db
+import app.errors as errors
+import app.schemas as sch
+from app.config import settings
+from app.logging import log_generation
+from app.services.adapters import GenerativeAIService
+from app.tasks import generation
+from app.utility.caching import LRUCache
+from tests.conftest import TEST_SESSION, TestSessionMaker
+
+
+class FakeGenerativeAIService(GenerativeAIService):
+    "Generates the prompt back, counting its calls."
+
+    service_name = "Fake"
+    models = [sch.LanguageModel(name="fake-model", size="Large")]
+
+    def __init__(self):
+        self.calls = 0
+
+    async def complete(self, model, messages, temperature=0):
+        self.calls += 1
+        prompt = "\n".join(message["content"] for message in messages[1:])
+        if "Fail." in prompt:
+            raise errors.ExternalServiceError(self.service_name, "Failed.")
+
+        return sch.GenerationOutput(
+            text=prompt,
+            generatedAt=datetime.now(timezone.utc),
+            service=self.service_name,
+            model=model,
+            completionTokens=7,
+            promptTokens=42,
+            timeToGenerate=1000,
+        )
+
+
+@pytest.fixture(autouse=True)
+def use_test_database(monkeypatch):
+    monkeypatch.setattr(db, "DatabaseSessionMaker", TestSessionMaker)
+    monkeypatch.setattr(generation, "_generation_cache", LRUCache(8))
+
+
+@pytest.fixture
+def service(monkeypatch) -> FakeGenerativeAIService:
+    service = FakeGenerativeAIService()
+    monkeypatch.setattr(generation, "generative_ai_services", [service])
+
+    return service
+
+
+async def generate(db_session, transcript: str = "The transcript."):
+    return await generation.generate_note(
+        db_session, "fake-model", "Instructions.", None, transcript
+    )
+
+
+async def stream_of(texts: list[str], error: Exception | None = None):
+    for text in texts:
+        yield text
+
+    if error is not None:
+        raise error
+
+    yield sch.GenerationOutput(
+        text="".join(texts),
+        generatedAt=datetime.now(timezone.utc),
+        service="Fake",
+        model="fake-model",
+        completionTokens=len(texts),
+        promptTokens=10,
+        timeToGenerate=5,
+    )
+
+
+async def parse_events(events) -> list[tuple[str, dict]]:
+    parsed = []
+    async for event in events:
+        (name, data) = event.strip().split("\n")
+        parsed.append((name.removeprefix("event: "), json.loads(data[len("data: ") :])))
+
+    return parsed
+
+
+class TestDraftNoteEvents:
+    async def test_tokens_then_completed(self, db_session):
+        stream = stream_of(["A", "B"])
+        events = await parse_events(
+            generation.draft_note_events("NOTE01", stream, False, TEST_SESSION)
+        )
+
+        assert events == [
+            ("token", {"text": "A"}),
+            ("token", {"text": "B"}),
+            ("completed", {"text": "AB", "noteId": "NOTE01"}),
+        ]
+
+        task = db_session.scalars(
+            select(db.GenerationTask).where(db.GenerationTask.record_id == "NOTE01")
+        ).one()
+        assert (task.task_type, task.completion_tokens) == ("GENERATE NOTE", 2)
+        assert task.cached is False
+
+    async def test_failed_after_tokens(self, db_session):
+        error = errors.ExternalServiceInterruption("Fake", "Connection lost")
+        stream = stream_of(["A"], error)
+        events = await parse_events(
+            generation.draft_note_events("NOTE02", stream, False, TEST_SESSION)
+        )
+
+        assert [name for (name, _) in events] == ["token", "failed"]
+        assert events[1][1]["errorId"] == error.uuid
+        assert db_session.get(db.ErrorRecord, error.uuid) is not None
+
+
+class TestGenerationCache:
+    async def test_serve_repeated_generation_from_cache(self, db_session, service):
+        (first, first_cached) = await generate(db_session)
+        (second, second_cached) = await generate(db_session)
+
+        assert (first_cached, second_cached) == (False, True)
+        assert second.text == first.text
+        assert (second.completionTokens, second.promptTokens) == (7, 42)
+        assert second.timeToGenerate < first.timeToGenerate
+        assert service.calls == 1
+
+    async def test_generate_different_inputs(self, db_session, service):
+        await generate(db_session, "One transcript.")
+        (_, cached) = await generate(db_session, "Another transcript.")
+
+        assert not cached
+        assert service.calls == 2
+
+    async def test_serve_from_database_after_memory(
+        self, monkeypatch, db_session, service
+    ):
+        await generate(db_session)
+        monkeypatch.setattr(generation, "_generation_cache", LRUCache(8))
+
+        (output, cached) = await generate(db_session)
+
+        assert cached
+        assert "The transcript." in output.text
+        assert service.calls == 1
+
+    async def test_evict_least_recently_used(self, monkeypatch, db_session, service):
+        monkeypatch.setattr(settings, "GENERATION_CACHE_DB_SIZE", 2)
+        monkeypatch.setattr(generation, "_generation_cache", LRUCache(0))
+
+        await generate(db_session, "First.")
+        await generate(db_session, "Second.")
+        await generate(db_session, "First.")  # Used more recently than the second.
+        await generate(db_session, "Third.")
+
+        assert db_session.scalar(select(func.count(db.CachedGeneration.key))) == 2
+        assert (await generate(db_session, "First."))[1]
+        assert not (await generate(db_session, "Second."))[1]
+
+    async def test_memory_hits_count_as_uses(self, monkeypatch, db_session, service):
+        monkeypatch.setattr(settings, "GENERATION_CACHE_DB_SIZE", 2)
+        monkeypatch.setattr(generation, "LAST_USED_SAVE_INTERVAL", timedelta(0))
+
+        (first, _) = await generate(db_session, "First.")
+        (second, _) = await generate(db_session, "Second.")
+        (_, cached) = await generate(db_session, "First.")
+        await generate(db_session, "Third.")
+
+        assert cached
+        assert db_session.get(db.CachedGeneration, first.cacheKey) is not None
+        assert db_session.get(db.CachedGeneration, second.cacheKey) is None
+
+    async def test_replay_cached_stream(self, db_session, service):
+        await generate(db_session)
+
+        (stream, cached) = await generation.stream_note(
+            db_session, "fake-model", "Instructions.", None, "The transcript."
+        )
+        events = await parse_events(
+            generation.draft_note_events("NOTE03", stream, cached, TEST_SESSION)
+        )
+
+        assert cached
+        assert [name for (name, _) in events] == ["token", "completed"]
+        assert service.calls == 1
+
+        task = db_session.scalars(
+            select(db.GenerationTask).where(db.GenerationTask.record_id == "NOTE03")
+        ).one()
+        assert task.cached is True
+
+    async def test_purge_generations_of_records(self, db_session, service):
+        (note, _) = await generate(db_session, "One transcript.")
+        (other_note, _) = await generate(db_session, "Another transcript.")
+        for record_id, output in [("NOTE04", note), ("NOTE05", other_note)]:
+            log_generation(
+                database=db_session,
+                record_id=record_id,
+                task_type="GENERATE NOTE",
+                generation_output=output,
+            )
+
+        generation.invalidate_cached_generations(db_session, ["NOTE04"])
+        db_session.commit()
+
+        assert db_session.get(db.CachedGeneration, note.cacheKey) is None
+        assert generation._generation_cache.get(note.cacheKey) is None
+        assert not (await generate(db_session, "One transcript."))[1]
+        assert (await generate(db_session, "Another transcript."))[1]
+
+
+class TestGenerateNotes:
+    async def test_transcript_precedes_instructions(self, db_session, service):
+        (output, _) = await generation.generate_note(
+            db_session, "fake-model", "Instructions.", "Details.", "The transcript."
+        )
+
+        transcript = output.text.index("The transcript.")
+        assert transcript < output.text.index("Details.")
+        assert transcript < output.text.index("Instructions.")
+
+    @pytest.mark.parametrize("output_type", ["Markdown", "Plain Text"])
+    def test_prompts_share_transcript_prefix(self, output_type):
+        prompts = [
+            generation._note_messages(
+                instructions, "Details.", "The transcript.", output_type
+            )
+            for instructions in ["Write a full visit note.", "List the medications."]
+        ]
+
+        rendered = ["".join(m["content"] for m in messages) for messages in prompts]
+        shared = os.path.commonprefix(rendered)
+
+        assert shared.index("The transcript.") < shared.index("Details.")
+        assert rendered[0].removeprefix(shared).startswith("Write a full visit note.")
+
+    async def test_generate_in_order(self, db_session, service):
+        notes = [
+            sch.DraftNoteRequest(instructions=f"Note {n}.", outputType="Markdown")
+            for n in range(3)
+        ]
+
+        results = await generation.generate_notes(
+            db_session, "fake-model", notes, None, "The transcript."
+        )
+
+        for n, (output, cached) in enumerate(results):
+            assert output.text.endswith(f'Instructions:\n"""Note {n}.\n"""')
+            assert not cached
+        assert service.calls == 3
+
+    async def test_return_errors_per_note(self, db_session, service):
+        notes = [
+            sch.DraftNoteRequest(instructions=instructions, outputType="Markdown")
+            for instructions in ["Fail.", "Succeed.", "Fail."]
+        ]
+
+        results = await generation.generate_notes(
+            db_session, "fake-model", notes, None, "The transcript."
+        )
+
+        assert isinstance(results[0], errors.ExternalServiceError)
+        assert isinstance(results[1], tuple)
+        assert isinstance(results[2], errors.ExternalServiceError)
+
+    async def test_serve_generated_notes_from_cache(self, db_session, service):
+        notes = [
+            sch.DraftNoteRequest(instructions=f"Note {n}.", outputType="Plain Text")
+            for n in range(2)
+        ]
+        await generation.generate_notes(
+            db_session, "fake-model", notes, None, "The transcript."
+        )
+
+        results = await generation.generate_notes(
+            db_session, "fake-model", notes, None, "The transcript."
+        )
+
+        assert [cached for (_, cached) in results] == [True, True]
+        assert service.calls == 2
+
+    async def test_no_notes(self, db_session, service):
+        assert await generation.generate_notes(
+            db_session, "fake-model", [], None, "The transcript."
+        ) == []
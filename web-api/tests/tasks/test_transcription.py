@@ -0,0 +1,319 @@
+import asyncio
+import io
+import json
+import threading
+from datetime import datetime, timezone
+
+import pytest
+
+import app.config.db as db
+import app.schemas as sch
+from app.tasks import transcription
+from app.utility.caching import LRUCache
+from tests.conftest import TEST_SESSION
+
+HASH = "0" * 64
+
+
+class FakeTranscriptionService:
+    "Transcribes each segment as its index, recording the prompts received."
+
+    def __init__(self, delays: list[float] | None = None):
+        self.delays = delays
+        self.prompts: dict[int, str | None] = {}
+        self.running = 0
+        self.max_running = 0
+
+    async def transcribe(self, audio_file, filename, content_type, prompt=None):
+        index = int(filename.rsplit("-", 1)[1].split(".")[0])
+        self.prompts[index] = prompt
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+
+        try:
+            await asyncio.sleep(self.delays[index] if self.delays else 0)
+        finally:
+            self.running -= 1
+
+        return sch.TranscriptionOutput(transcript=f"segment {index}.", service="Fake")
+
+
+@pytest.fixture
+def segments() -> list:
+    return [(io.BytesIO(), "mp3") for _ in range(6)]
+
+
+def use_service(monkeypatch, service: FakeTranscriptionService):
+    monkeypatch.setattr(transcription, "transcription_service", service)
+
+
+class TestTranscribeSegments:
+    async def test_chain_prompts_with_previous_transcript(self, monkeypatch, segments):
+        service = FakeTranscriptionService()
+        use_service(monkeypatch, service)
+
+        outputs = await transcription.transcribe_segments(
+            segments, "recording.mp3", prompts="chain", concurrency=4
+        )
+
+        assert [o.transcript for o in outputs] == [f"segment {i}." for i in range(6)]
+        assert service.prompts == {
+            0: None,
+            **{i: f"segment {i - 1}." for i in range(1, 6)},
+        }
+        assert service.max_running == 1
+
+    async def test_none_is_concurrent_and_ordered(self, monkeypatch, segments):
+        service = FakeTranscriptionService(delays=[0.05, 0.01, 0.04, 0.0, 0.03, 0.02])
+        use_service(monkeypatch, service)
+
+        outputs = await transcription.transcribe_segments(
+            segments, "recording.mp3", prompts="none", concurrency=3
+        )
+
+        assert [o.transcript for o in outputs] == [f"segment {i}." for i in range(6)]
+        assert set(service.prompts.values()) == {None}
+        assert service.max_running == 3
+
+    async def test_tail_prompts_odd_segments(self, monkeypatch, segments):
+        service = FakeTranscriptionService()
+        use_service(monkeypatch, service)
+
+        await transcription.transcribe_segments(
+            segments, "recording.mp3", prompts="tail", concurrency=4
+        )
+
+        assert service.prompts == {
+            0: None,
+            1: "segment 0.",
+            2: None,
+            3: "segment 2.",
+            4: None,
+            5: "segment 4.",
+        }
+
+    async def test_reports_progress(self, monkeypatch, segments):
+        use_service(monkeypatch, FakeTranscriptionService())
+        progress = []
+
+        await transcription.transcribe_segments(
+            segments,
+            "recording.mp3",
+            prompts="tail",
+            concurrency=4,
+            on_progress=lambda completed, total: progress.append((completed, total)),
+        )
+
+        assert progress == [(i, 6) for i in range(7)]
+
+    async def test_failure_cancels_remaining_segments(self, monkeypatch, segments):
+        class FailingService(FakeTranscriptionService):
+            async def transcribe(self, audio_file, filename, content_type, prompt=None):
+                if filename.endswith("-001.mp3"):
+                    raise RuntimeError("Service unavailable")
+                return await super().transcribe(
+                    audio_file, filename, content_type, prompt
+                )
+
+        service = FailingService(delays=[1.0] * 6)
+        use_service(monkeypatch, service)
+
+        with pytest.raises(RuntimeError):
+            await transcription.transcribe_segments(
+                segments, "recording.mp3", prompts="none", concurrency=6
+            )
+
+        await asyncio.sleep(0)
+        assert service.running == 0
+
+
+def test_prompt_tail_starts_at_a_word():
+    transcript = " ".join(["word"] * 200)
+    tail = transcription.prompt_tail(transcript)
+
+    assert tail is not None
+    assert len(tail) <= transcription.PROMPT_TAIL_LENGTH
+    assert tail.startswith("word") and transcript.endswith(tail)
+
+
+class TestTranscriptCache:
+    @pytest.fixture(autouse=True)
+    def service(self, monkeypatch):
+        service = FakeTranscriptionService()
+        service.service_name = "Fake"
+        service.model_name = "fake-1"
+        use_service(monkeypatch, service)
+        monkeypatch.setattr(transcription, "_transcript_cache", LRUCache(max_size=8))
+        return service
+
+    def test_round_trip(self, db_session):
+        assert transcription.get_cached_transcript(db_session, HASH) is None
+
+        output = sch.TranscriptionOutput(transcript="Hello.", service="Fake")
+        transcription.cache_transcript(db_session, HASH, output)
+
+        # Served from the database once evicted from memory.
+        transcription._transcript_cache.discard((HASH, "Fake", "fake-1"))
+        cached = transcription.get_cached_transcript(db_session, HASH)
+
+        assert cached is not None and cached.transcript == "Hello."
+        assert len(transcription._transcript_cache) == 1
+
+    def test_keyed_by_model(self, db_session, service):
+        output = sch.TranscriptionOutput(transcript="Hello.", service="Fake")
+        transcription.cache_transcript(db_session, HASH, output)
+
+        service.model_name = "fake-2"
+
+        assert transcription.get_cached_transcript(db_session, HASH) is None
+
+    def test_invalidate(self, db_session):
+        output = sch.TranscriptionOutput(transcript="Hello.", service="Fake")
+        transcription.cache_transcript(db_session, HASH, output)
+
+        transcription.invalidate_cached_transcripts(db_session, HASH)
+        db_session.commit()
+
+        assert len(transcription._transcript_cache) == 0
+        assert transcription.get_cached_transcript(db_session, HASH) is None
+
+
+class TestTranscribeRecording:
+    @pytest.fixture
+    def recording(self, db_session) -> db.Recording:
+        now = datetime.now(timezone.utc)
+        db_session.add(
+            db.User(username=TEST_SESSION.username, registered=now, updated=now)
+        )
+        db_session.add(
+            db.Encounter(
+                id="ENC001", username=TEST_SESSION.username, created=now, modified=now
+            )
+        )
+        recording = db.Recording(
+            id="REC001",
+            encounter_id="ENC001",
+            duration=90000,
+            segments=json.dumps([0, 60000]),
+        )
+        db_session.add(recording)
+        db_session.commit()
+        return recording
+
+    @pytest.fixture(autouse=True)
+    def service(self, monkeypatch):
+        class Service:
+            service_name = "Fake"
+            model_name = "fake-1"
+            filenames: list[str] = []
+
+            async def transcribe(self, audio_file, filename, content_type, prompt=None):
+                self.filenames.append(filename)
+                return sch.TranscriptionOutput(transcript="Appended.", service="Fake")
+
+        service = Service()
+        use_service(monkeypatch, service)
+        monkeypatch.setattr(transcription, "_transcript_cache", LRUCache(max_size=8))
+        monkeypatch.setattr(
+            transcription.storage, "recording_exists", lambda username, filename: False
+        )
+        monkeypatch.setattr(
+            transcription.storage,
+            "open_recording",
+            lambda username, filename: io.BytesIO(b"audio"),
+        )
+        return service
+
+    async def test_transcribes_only_appended_audio(
+        self, monkeypatch, db_session, recording, service
+    ):
+        starts = []
+
+        async def create_transcription_audio(audio, start=0):
+            starts.append(start)
+            return io.BytesIO(b"flac")
+
+        monkeypatch.setattr(
+            transcription, "create_transcription_audio", create_transcription_audio
+        )
+        recording.segment_transcripts = json.dumps(["Original."])
+        db_session.commit()
+
+        (output, cached) = await transcription.transcribe_recording(
+            db_session, TEST_SESSION.username, "REC001"
+        )
+
+        assert (output.transcript, cached) == ("Original. Appended.", False)
+        assert starts == [60000]
+        assert service.filenames == ["REC001-60000.flac"]
+        assert json.loads(recording.segment_transcripts) == ["Original.", "Appended."]
+
+    async def test_joined_transcripts_are_not_cached(
+        self, monkeypatch, db_session, recording
+    ):
+        async def create_transcription_audio(audio, start=0):
+            return io.BytesIO(b"flac")
+
+        monkeypatch.setattr(
+            transcription, "create_transcription_audio", create_transcription_audio
+        )
+        recording.audio_hash = HASH
+        recording.segment_transcripts = json.dumps(["Edited."])
+        db_session.commit()
+
+        await transcription.transcribe_recording(
+            db_session, TEST_SESSION.username, "REC001"
+        )
+
+        assert transcription.get_cached_transcript(db_session, HASH) is None
+
+    async def test_first_transcription_spans_all_segments(
+        self, db_session, recording, service
+    ):
+        (output, _) = await transcription.transcribe_recording(
+            db_session, TEST_SESSION.username, "REC001"
+        )
+
+        assert output.transcript == "Appended."
+        assert service.filenames == ["REC001.mp3"]
+        assert json.loads(recording.segment_transcripts) == ["Appended.", ""]
+
+    async def test_hashes_unhashed_audio_off_the_event_loop(
+        self, monkeypatch, db_session, recording
+    ):
+        hashed_on = []
+
+        def calculate_file_hash(audio):
+            hashed_on.append(threading.current_thread())
+            return HASH
+
+        monkeypatch.setattr(
+            transcription.file_validator, "calculate_file_hash", calculate_file_hash
+        )
+
+        await transcription.transcribe_recording(
+            db_session, TEST_SESSION.username, "REC001"
+        )
+
+        assert recording.audio_hash == HASH
+        assert hashed_on and hashed_on[0] is not threading.main_thread()
+
+    async def test_cache_hit_refreshes_segment_transcripts(
+        self, db_session, recording, service
+    ):
+        recording.audio_hash = HASH
+        recording.segment_transcripts = json.dumps(["Stale."])
+        db_session.commit()
+        transcription.cache_transcript(
+            db_session,
+            HASH,
+            sch.TranscriptionOutput(transcript="Cached.", service="Fake"),
+        )
+
+        (output, cached) = await transcription.transcribe_recording(
+            db_session, TEST_SESSION.username, "REC001"
+        )
+
+        assert (output.transcript, cached) == ("Cached.", True)
+        assert service.filenames == []
+        assert json.loads(recording.segment_transcripts) == ["Cached.", ""]
@@ -0,0 +1,150 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import app.config.db as db
+import app.errors as errors
+import app.schemas as sch
+from app.tasks import transcription_jobs
+from tests.conftest import TEST_SESSION, TestSessionMaker
+
+
+@pytest.fixture(autouse=True)
+def use_test_database(monkeypatch):
+    monkeypatch.setattr(db, "DatabaseSessionMaker", TestSessionMaker)
+    monkeypatch.setattr(transcription_jobs, "EVENT_POLL_INTERVAL", 0.01)
+
+
+def use_transcription(monkeypatch, transcribe):
+    monkeypatch.setattr(transcription_jobs, "transcribe_recording", transcribe)
+
+
+async def run_job(db_session, recording_id: str = "REC001") -> db.TranscriptionJob:
+    job = transcription_jobs.start_transcription_job(
+        db_session, TEST_SESSION, recording_id
+    )
+    await asyncio.gather(*transcription_jobs._running_jobs)
+
+    db_session.expire_all()
+    return transcription_jobs.get_transcription_job(
+        db_session, TEST_SESSION.username, job.id
+    )
+
+
+class TestTranscriptionJobs:
+    async def test_completed_job(self, monkeypatch, db_session):
+        async def transcribe(database, username, recording_id, on_progress):
+            on_progress(0, 2)
+            on_progress(1, 2)
+            on_progress(2, 2)
+            return (sch.TranscriptionOutput(transcript="Hello.", service="Fake"), False)
+
+        use_transcription(monkeypatch, transcribe)
+
+        job = await run_job(db_session)
+
+        assert job.status == "COMPLETED"
+        assert job.transcript == "Hello."
+        assert (job.segments_completed, job.segments_total) == (2, 2)
+        assert db_session.query(db.TranscriptionTask).count() == 1
+
+    async def test_failed_job(self, monkeypatch, db_session):
+        async def transcribe(database, username, recording_id, on_progress):
+            raise errors.ExternalServiceError("Fake", "Service unavailable")
+
+        use_transcription(monkeypatch, transcribe)
+
+        job = await run_job(db_session)
+
+        assert job.status == "FAILED"
+        assert job.error_message == "Service unavailable"
+        assert db_session.get(db.ErrorRecord, job.error_id) is not None
+
+    async def test_events_end_with_the_outcome(self, monkeypatch, db_session):
+        started = asyncio.Event()
+        finish = asyncio.Event()
+
+        async def transcribe(database, username, recording_id, on_progress):
+            on_progress(0, 1)
+            started.set()
+            await finish.wait()
+            on_progress(1, 1)
+            return (sch.TranscriptionOutput(transcript="Hello.", service="Fake"), False)
+
+        use_transcription(monkeypatch, transcribe)
+
+        job = transcription_jobs.start_transcription_job(
+            db_session, TEST_SESSION, "REC001"
+        )
+        await started.wait()
+
+        events = transcription_jobs.transcription_job_events(
+            TEST_SESSION.username, job.id
+        )
+        first = await anext(events)
+        finish.set()
+        remaining = [event async for event in events]
+
+        assert first.startswith("event: progress\n")
+        assert remaining[-1].startswith("event: completed\n")
+        assert '"transcript":"Hello."' in remaining[-1]
+
+    async def test_stale_job_fails_and_ends_events(self, db_session):
+        stopped = datetime.now(timezone.utc).astimezone() - timedelta(
+            seconds=transcription_jobs.JOB_STALE_AFTER + 1
+        )
+        db_session.add(
+            db.TranscriptionJob(
+                id="JOB001",
+                username=TEST_SESSION.username,
+                recording_id="REC001",
+                status="RUNNING",
+                segments_completed=0,
+                created=stopped,
+                modified=stopped,
+            )
+        )
+        db_session.commit()
+
+        events = [
+            event
+            async for event in transcription_jobs.transcription_job_events(
+                TEST_SESSION.username, "JOB001"
+            )
+        ]
+
+        assert len(events) == 1
+        assert events[0].startswith("event: failed\n")
+
+    async def test_heartbeat_keeps_job_running(self, monkeypatch, db_session):
+        monkeypatch.setattr(transcription_jobs, "JOB_HEARTBEAT_INTERVAL", 0.01)
+        monkeypatch.setattr(transcription_jobs, "JOB_STALE_AFTER", 0.05)
+        finish = asyncio.Event()
+
+        async def transcribe(database, username, recording_id, on_progress):
+            await finish.wait()
+            return (sch.TranscriptionOutput(transcript="Hello.", service="Fake"), False)
+
+        use_transcription(monkeypatch, transcribe)
+
+        job = transcription_jobs.start_transcription_job(
+            db_session, TEST_SESSION, "REC001"
+        )
+        await asyncio.sleep(0.2)
+
+        with TestSessionMaker() as database:
+            status = transcription_jobs.get_transcription_job(
+                database, TEST_SESSION.username, job.id
+            ).status
+
+        finish.set()
+        await asyncio.gather(*transcription_jobs._running_jobs)
+
+        assert status == "RUNNING"
+
+    async def test_unknown_job(self, db_session):
+        with pytest.raises(errors.NotFound):
+            transcription_jobs.get_transcription_job(
+                db_session, TEST_SESSION.username, "UNKNOWN"
+            )
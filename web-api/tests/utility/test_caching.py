@@ -0,0 +1,51 @@
+import time
+
+import pytest
+
+from app.utility.caching import LRUCache
+
+
+class TestLRUCache:
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache[str, int](max_size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+
+        assert cache.get("a") == 1
+
+        cache.put("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert len(cache) == 2
+
+    def test_discard_where(self):
+        cache = LRUCache[tuple[str, str], int](max_size=4)
+        cache.put(("x", "1"), 1)
+        cache.put(("x", "2"), 2)
+        cache.put(("y", "1"), 3)
+
+        cache.discard_where(lambda key: key[0] == "x")
+
+        assert len(cache) == 1
+        assert cache.get(("y", "1")) == 3
+
+    def test_entries_expire(self):
+        cache = LRUCache[str, int](max_size=2, ttl=0.05)
+        cache.put("a", 1)
+
+        assert cache.get("a") == 1
+
+        time.sleep(0.06)
+
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    @pytest.mark.parametrize("max_size", [0, -1])
+    def test_disabled(self, max_size):
+        cache = LRUCache[str, int](max_size=max_size)
+        cache.put("a", 1)
+
+        assert cache.get("a") is None
+        assert len(cache) == 0